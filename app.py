@@ -169,33 +169,49 @@ def main():
         
         # Process query
         if search_button and query:
-            with st.spinner("🤔 Thinking..."):
-                # Map filter selection
-                filter_map = {
-                    "All": None,
-                    "Products": "product",
-                    "Reviews": "review",
-                    "Policies": "policy"
-                }
+            # Map filter selection
+            filter_map = {
+                "All": None,
+                "Products": "product",
+                "Reviews": "review",
+                "Policies": "policy"
+            }
+            
+            # Stream the RAG pipeline: sources arrive first, then answer tokens
+            events = pipeline.stream_query(
+                query=query,
+                return_sources=return_sources,
+                filter_type=filter_map[filter_type]
+            )
+            with st.spinner("🔎 Searching..."):
+                sources = next(events)['data']
+            
+            # Answer placeholder above the sources, filled in as tokens arrive
+            st.markdown("### 💬 Answer")
+            answer_placeholder = st.empty()
+            timing_placeholder = st.empty()
+            answer_placeholder.markdown('<div class="answer-box">🤔 Thinking...</div>', unsafe_allow_html=True)
+            
+            # Display sources
+            if return_sources and sources.get('sources'):
+                st.markdown("---")
+                st.markdown(f"### 📚 Sources ({sources['num_sources']} documents)")
                 
-                # Query RAG pipeline
-                result = pipeline.query(
-                    query=query,
-                    return_sources=return_sources,
-                    filter_type=filter_map[filter_type]
-                )
-                
-                # Display answer
-                st.markdown("### 💬 Answer")
-                st.markdown(f'<div class="answer-box">{result["answer"]}</div>', unsafe_allow_html=True)
-                
-                # Display sources
-                if return_sources and result.get('sources'):
-                    st.markdown("---")
-                    st.markdown(f"### 📚 Sources ({result['num_sources']} documents)")
-                    
-                    for i, source in enumerate(result['sources']):
-                        display_source(source, i)
+                for i, source in enumerate(sources['sources']):
+                    display_source(source, i)
+            
+            answer = ""
+            for event in events:
+                if event['event'] == 'token':
+                    answer += event['data']['text']
+                    answer_placeholder.markdown(f'<div class="answer-box">{answer}▌</div>', unsafe_allow_html=True)
+                elif event['event'] == 'done':
+                    answer_placeholder.markdown(f'<div class="answer-box">{answer}</div>', unsafe_allow_html=True)
+                    timings = event['data']
+                    timing_placeholder.caption(
+                        f"Sources in {timings['ttfb_ms']:.0f} ms · first token in "
+                        f"{timings['ttft_ms'] or 0:.0f} ms · total {timings['total_ms']:.0f} ms"
+                    )
         
         elif not query and search_button:
             st.warning("⚠️ Please enter a question first!")
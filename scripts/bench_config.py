@@ -0,0 +1,30 @@
+"""
+Temporary config files for benchmarks that override parts of config.yaml
+"""
+import os
+import tempfile
+from typing import Any, Dict
+
+import yaml
+
+
+def merge(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively merge ``overrides`` into a copy of ``base``"""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def write_temp_config(overrides: Dict[str, Any], base_config: str = "config/config.yaml") -> str:
+    """Write config.yaml with overrides applied to a temp file; caller removes it"""
+    with open(base_config, 'r') as f:
+        config = yaml.safe_load(f)
+
+    fd, path = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(fd, 'w') as f:
+        yaml.safe_dump(merge(config, overrides), f)
+    return path
@@ -0,0 +1,115 @@
+"""
+Benchmark chunking strategies: chunk counts, tokens per chunk and retrieval quality
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from scripts.bench_config import write_temp_config
+from src.chunker import TokenCounter
+from src.data_processor import DataProcessor
+from src.numpy_vector_store import NumpyVectorStore
+from tests.test_queries import TEST_QUERIES
+
+SENTENCE_OR_LINE_END = re.compile(r"[.!?:)\]\"']\s*$|\n\s*$")
+
+
+def build_documents(overrides: dict, workers: int):
+    config_path = write_temp_config(overrides)
+    try:
+        processor = DataProcessor(config_path)
+        start_time = time.time()
+        documents = list(processor.iter_documents("data/raw", workers=workers))
+        return documents, time.time() - start_time
+    finally:
+        os.remove(config_path)
+
+
+def evaluate_retrieval(overrides: dict, documents: list, counter: TokenCounter, top_k: int):
+    """Expected-type hit rate in the top-k (as in tests/test_queries.py) and retrieved tokens"""
+    workdir = tempfile.mkdtemp(prefix="chunk_bench_")
+    config_path = write_temp_config({
+        **overrides,
+        'vector_db': {'persist_directory': workdir, 'collection_name': 'chunks', 'index': 'flat',
+                      'quantization': 'none'}
+    })
+    try:
+        store = NumpyVectorStore(config_path)
+        store.add_documents(documents)
+
+        hits, top_scores, context_tokens = [], [], []
+        for queries in TEST_QUERIES.values():
+            for query_data in queries:
+                results = store.search(query_data['query'], top_k=top_k)
+                hits.append(query_data['expected_type'] in [doc.doc_type for doc in results])
+                top_scores.append(results[0].score if results else 0.0)
+                context_tokens.append(sum(counter.count(doc.content) for doc in results))
+        return float(np.mean(hits)), float(np.mean(top_scores)), float(np.mean(context_tokens))
+    finally:
+        os.remove(config_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed-window and semantic chunking")
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[128, 256],
+                        help="Token budgets to try for the semantic chunker")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--reviews", type=int, default=10000)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--embeddings", default="hashing", choices=["hashing", "openai"])
+    args = parser.parse_args()
+
+    counter = TokenCounter()
+    base = {
+        'data': {'products_limit': args.products, 'reviews_limit': args.reviews},
+        'embeddings': {'backend': args.embeddings}
+    }
+    variants = [('fixed 500ch', {'strategy': 'fixed'})] + [
+        (f"semantic {max_tokens}t", {'strategy': 'semantic', 'max_tokens': max_tokens})
+        for max_tokens in args.max_tokens
+    ]
+
+    rows = []
+    for label, chunking in variants:
+        print(f"\n{label}: chunking...")
+        overrides = {**base, 'data': {**base['data'], 'chunking': chunking}}
+        documents, elapsed = build_documents(overrides, args.workers)
+        tokens = np.array([counter.count(doc.content) for doc in documents])
+        chunks = [doc for doc in documents if doc.metadata.get('is_chunk')]
+        # A chunk that does not end at a sentence or line boundary was cut mid-sentence
+        cut = np.mean([not SENTENCE_OR_LINE_END.search(doc.content) for doc in chunks]) if chunks else 0.0
+
+        print(f"{label}: indexing and querying...")
+        hit_rate, top_score, context = evaluate_retrieval(overrides, documents, counter, args.top_k)
+        rows.append((label, len(documents), tokens, cut, elapsed, hit_rate, top_score, context))
+
+    token_kind = "tiktoken" if counter.exact else "estimated"
+    print("\n" + "=" * 96)
+    print(f"Chunking benchmark ({token_kind} tokens, {sum(len(q) for q in TEST_QUERIES.values())} "
+          f"test queries, top_k={args.top_k}, {args.embeddings} embeddings)")
+    print("=" * 96)
+    print(f"{'strategy':<14} {'docs':>7} {'tokens':>9} {'avg tok':>8} {'max tok':>8} {'cut mid-':>9} "
+          f"{'chunk s':>8} {'type hit':>9} {'top-1':>7} {'ctx tok':>8}")
+    baseline = rows[0]
+    for label, count, tokens, cut, elapsed, hit_rate, top_score, context in rows:
+        print(f"{label:<14} {count:7d} {tokens.sum():9d} {tokens.mean():8.1f} {tokens.max():8d} {cut:9.1%} "
+              f"{elapsed:8.1f} {hit_rate:9.1%} {top_score:7.3f} {context:8.0f}")
+    print("\nDeltas vs fixed windows:")
+    for label, count, tokens, _, _, hit_rate, top_score, context in rows[1:]:
+        print(f"  {label}: {count - baseline[1]:+d} docs, {tokens.sum() - baseline[2].sum():+d} embedded tokens, "
+              f"{(hit_rate - baseline[5]) * 100:+.1f} pts type hit, {top_score - baseline[6]:+.3f} top-1 score, "
+              f"{context - baseline[7]:+.0f} context tokens/query")
+
+
+if __name__ == "__main__":
+    main()
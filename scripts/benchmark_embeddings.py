@@ -0,0 +1,86 @@
+"""
+Benchmark concurrent embedding throughput against the local stub API
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import time
+
+import yaml
+
+from src.embeddings import EmbeddingGenerator
+from scripts.bench_config import write_temp_config
+from scripts.stub_openai_server import spawn_server, stub_embedding
+
+
+def make_config(base_url: str, concurrency: int, max_batch_size: int) -> str:
+    """Temporary config pointing OpenAI embeddings at the stub, with caching off"""
+    return write_temp_config({
+        'embeddings': {
+            'backend': 'openai',
+            'base_url': base_url,
+            'cache': {'enabled': False},
+            'batching': {
+                'concurrency': concurrency,
+                'max_batch_size': max_batch_size,
+                'max_retries': 20
+            }
+        }
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--rate-limit-rps", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    with open("config/config.yaml", 'r') as f:
+        dimension = yaml.safe_load(f)['embeddings']['dimension']
+
+    server, base_url = spawn_server(
+        dimension=dimension,
+        latency_ms=args.latency_ms,
+        rate_limit_rps=args.rate_limit_rps
+    )
+    texts = [f"Product {i}: wireless headphones with {i % 40} hour battery" for i in range(args.texts)]
+    expected = [stub_embedding(text, dimension) for text in texts[:50]]
+
+    print("=" * 70)
+    print("Embedding Throughput (stub API)")
+    print("=" * 70)
+    print(f"{args.texts} texts, {args.latency_ms:.0f}ms per request, batch size {args.batch_size}, "
+          f"rate limit {args.rate_limit_rps or 'none'} rps\n")
+
+    try:
+        for concurrency in args.concurrency:
+            config_path = make_config(base_url, concurrency, args.batch_size)
+            try:
+                generator = EmbeddingGenerator(config_path)
+            finally:
+                os.remove(config_path)
+
+            start_time = time.time()
+            embeddings = generator.generate_embeddings_batch(texts)
+            elapsed = time.time() - start_time
+
+            in_order = all(
+                max(abs(a - b) for a, b in zip(got, want)) < 1e-6
+                for got, want in zip(embeddings, expected)
+            )
+            stats = generator.scheduler.get_stats()
+            print(f"concurrency={concurrency:<3} {len(texts) / elapsed:8.1f} texts/s  "
+                  f"{stats['requests']:4d} requests  {stats['rate_limited']:3d} rate limited  "
+                  f"order preserved: {'yes' if in_order else 'NO'}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
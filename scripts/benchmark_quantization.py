@@ -0,0 +1,107 @@
+"""
+Benchmark compressed vector storage: recall@k and memory vs float32
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+
+from scripts.bench_config import write_temp_config
+from src.document_store import DocumentStore
+from src.numpy_vector_store import NumpyVectorStore
+
+
+def open_store(workdir: str, embeddings_backend: str, quantization: str) -> NumpyVectorStore:
+    config_path = write_temp_config({
+        'embeddings': {'backend': embeddings_backend},
+        'vector_db': {
+            'persist_directory': workdir,
+            'collection_name': 'quantization',
+            'index': 'flat',
+            'quantization': quantization
+        }
+    })
+    try:
+        return NumpyVectorStore(config_path)
+    finally:
+        os.remove(config_path)
+
+
+def run_queries(store: NumpyVectorStore, query_embeddings, top_k: int):
+    latencies, ids = [], []
+    for embedding in query_embeddings:
+        start_time = time.perf_counter()
+        docs = store.search_by_embedding(embedding, top_k=top_k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        ids.append([doc.doc_id for doc in docs])
+    return latencies, ids
+
+
+def recall(results, exact):
+    return float(np.mean([
+        len(set(got) & set(want)) / max(len(want), 1) for got, want in zip(results, exact)
+    ]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark int8 / PQ vector compression")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--embeddings", default="hashing", choices=["hashing", "openai"])
+    args = parser.parse_args()
+
+    documents = list(islice(iter(DocumentStore("data/processed/documents")), args.docs))
+    rng = random.Random(0)
+    queries = [doc.content[:120] for doc in rng.sample(documents, min(args.queries, len(documents)))]
+
+    workdir = tempfile.mkdtemp(prefix="quant_bench_")
+    try:
+        print("Building float32 baseline...")
+        store = open_store(workdir, args.embeddings, 'none')
+        store.add_documents(documents)
+        query_embeddings = store.embedding_generator.generate_embeddings_batch(queries)
+        base_latencies, exact = run_queries(store, query_embeddings, args.top_k)
+        float_mb = store.get_collection_stats()['float_vectors_mb']
+
+        print("\n" + "=" * 78)
+        print(f"{len(documents)} docs, {len(queries)} queries, recall@{args.top_k} vs exact float32 search")
+        print("=" * 78)
+        print(f"{'storage':<10} {'memory MB':>10} {'saved':>7} {'recall (ADC)':>13} "
+              f"{'recall (rerank)':>16} {'p50 ms':>8} {'build s':>8}")
+        print(f"{'float32':<10} {float_mb:10.1f} {'-':>7} {1.0:13.3f} {1.0:16.3f} "
+              f"{np.percentile(base_latencies, 50):8.2f} {'-':>8}")
+
+        for quantization in ('int8', 'pq'):
+            quantized = open_store(workdir, args.embeddings, quantization)
+            start_time = time.time()
+            quantized.build_quantized()
+            build_s = time.time() - start_time
+            memory_mb = quantized.get_collection_stats()['vector_memory_mb']
+
+            # Without re-rank: the shortlist is exactly the top-k by approximate score
+            quantized.rerank_candidates = args.top_k
+            _, approx_ids = run_queries(quantized, query_embeddings, args.top_k)
+            quantized.rerank_candidates = store.rerank_candidates
+            latencies, reranked_ids = run_queries(quantized, query_embeddings, args.top_k)
+
+            print(f"{quantization:<10} {memory_mb:10.1f} {1 - memory_mb / float_mb:7.1%} "
+                  f"{recall(approx_ids, exact):13.3f} {recall(reranked_ids, exact):16.3f} "
+                  f"{np.percentile(latencies, 50):8.2f} {build_s:8.1f}")
+
+        print(f"\nRe-rank uses the top {store.rerank_candidates} approximate candidates "
+              f"(vector_db.rerank_candidates).")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
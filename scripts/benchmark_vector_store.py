@@ -0,0 +1,126 @@
+"""
+Benchmark vector store backends (Chroma vs NumPy flat/IVF) on the same data
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+
+from scripts.bench_config import write_temp_config
+from src.document_store import DocumentStore
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def build_store(name: str, overrides: dict, documents: list):
+    """Build one store from a temp config and time the indexing"""
+    config_path = write_temp_config(overrides)
+    try:
+        if name == 'chroma':
+            from src.vector_store import ChromaVectorStore
+            store = ChromaVectorStore(config_path)
+        else:
+            from src.numpy_vector_store import NumpyVectorStore
+            store = NumpyVectorStore(config_path)
+    finally:
+        os.remove(config_path)
+
+    start_time = time.time()
+    store.add_documents(documents)
+    return store, time.time() - start_time
+
+
+def time_queries(store, query_embeddings, top_k):
+    """Per-query latency (ms) and returned doc ids"""
+    latencies, results = [], []
+    for embedding in query_embeddings:
+        start_time = time.perf_counter()
+        docs = store.search_by_embedding(embedding, top_k=top_k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        results.append([doc.doc_id for doc in docs])
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector store backends")
+    parser.add_argument("--docs", type=int, default=20000, help="Documents to index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--embeddings", default="hashing", choices=["hashing", "openai"],
+                        help="Embedding backend (hashing runs fully offline)")
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    documents = list(islice(iter(DocumentStore("data/processed/documents")), args.docs))
+    rng = random.Random(0)
+    queries = [doc.content[:120] for doc in rng.sample(documents, min(args.queries, len(documents)))]
+
+    workdir = tempfile.mkdtemp(prefix="vs_bench_")
+    base = {
+        'embeddings': {'backend': args.embeddings},
+        'vector_db': {'persist_directory': workdir, 'collection_name': 'bench'}
+    }
+    variants = [
+        ('numpy-flat', 'numpy', {'vector_db': {'index': 'flat', 'collection_name': 'flat'}}),
+        ('numpy-ivf', 'numpy', {'vector_db': {'index': 'ivf', 'collection_name': 'ivf', 'ivf_min_rows': 0}}),
+    ]
+    if not args.skip_chroma:
+        variants.append(('chroma', 'chroma', {}))
+
+    print("=" * 70)
+    print(f"Vector Store Benchmark: {len(documents)} docs, {len(queries)} queries, top_k={args.top_k}")
+    print("=" * 70)
+
+    try:
+        results = {}
+        query_embeddings = None
+        for label, name, extra in variants:
+            overrides = {
+                'embeddings': base['embeddings'],
+                'vector_db': {**base['vector_db'], **extra.get('vector_db', {})}
+            }
+            print(f"\nBuilding {label}...")
+            store, build_s = build_store(name, overrides, documents)
+            if query_embeddings is None:
+                query_embeddings = store.embedding_generator.generate_embeddings_batch(queries)
+
+            time_queries(store, query_embeddings[:10], args.top_k)  # warm up
+            latencies, ids = time_queries(store, query_embeddings, args.top_k)
+            results[label] = {'build_s': build_s, 'latencies': latencies, 'ids': ids}
+
+            if name == 'numpy':
+                start_time = time.perf_counter()
+                store.search_by_embeddings(query_embeddings, top_k=args.top_k)
+                batched_ms = (time.perf_counter() - start_time) * 1000
+                results[label]['batched_qps'] = len(queries) / (batched_ms / 1000)
+
+        exact = results['numpy-flat']['ids']
+        print("\n" + "=" * 70)
+        print(f"{'backend':<12} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'QPS':>8} "
+              f"{'batch QPS':>10} {'recall@k':>9}")
+        for label, result in results.items():
+            latencies = result['latencies']
+            recall = np.mean([
+                len(set(got) & set(want)) / max(len(want), 1)
+                for got, want in zip(result['ids'], exact)
+            ])
+            batched = f"{result['batched_qps']:10.0f}" if 'batched_qps' in result else f"{'-':>10}"
+            print(f"{label:<12} {result['build_s']:8.1f} {percentile(latencies, 50):8.2f} "
+                  f"{percentile(latencies, 95):8.2f} {1000 / np.mean(latencies):8.0f} "
+                  f"{batched} {recall:9.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,49 +4,63 @@ Build vector store from processed documents
 import sys
 sys.path.append('.')
 
-import json
-from src.vector_store import ChromaVectorStore
-from src.data_processor import Document
+import argparse
+import os
+import time
+from src.vector_store import create_vector_store
+from src.bm25_index import BM25Index
+from src.document_store import DocumentStore, convert_legacy_json
 
+STORE_DIR = "data/processed/documents"
+LEGACY_JSON = "data/processed/documents.json"
 
-def load_processed_documents(filepath: str) -> list:
-    """Load processed documents from JSON"""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-    
-    documents = []
-    for item in data:
-        doc = Document(
-            content=item['content'],
-            metadata=item['metadata'],
-            doc_type=item['doc_type'],
-            doc_id=item['doc_id']
-        )
-        documents.append(doc)
-    
-    return documents
+
+def load_processed_documents(directory: str = STORE_DIR) -> DocumentStore:
+    """Open the processed document store, converting a legacy documents.json if needed"""
+    store = DocumentStore(directory)
+    if not store.exists() and os.path.exists(LEGACY_JSON):
+        print(f"  Converting legacy {LEGACY_JSON}...")
+        convert_legacy_json(LEGACY_JSON, directory)
+    return store
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the vector store from processed documents")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only upsert new/changed documents and delete removed ones (ChromaDB backend)")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Building Vector Store")
     print("=" * 60)
     
     # Load processed documents
     print("\nLoading processed documents...")
-    documents = load_processed_documents("data/processed/documents.json")
+    documents = load_processed_documents()
     print(f"✓ Loaded {len(documents)} documents")
     
     # Initialize vector store
     print("\nInitializing vector store...")
-    vector_store = ChromaVectorStore()
+    vector_store = create_vector_store()
     
     # Clear existing data (optional)
     # vector_store.clear_collection()
     
-    # Add documents
-    print("\nAdding documents to vector store...")
-    vector_store.add_documents(documents, batch_size=100)
+    start_time = time.time()
+    if args.sync:
+        if not hasattr(vector_store, 'sync_documents'):
+            sys.exit("--sync is only supported by the chroma backend")
+        print("\nSyncing vector store with processed documents...")
+        sync_stats = vector_store.sync_documents(documents, batch_size=1000)
+        print(f"✓ Synced: {sync_stats['added']} added, {sync_stats['updated']} updated, "
+              f"{sync_stats['deleted']} deleted, {sync_stats['unchanged']} unchanged")
+        if sync_stats['duplicate_ids']:
+            print(f"  Skipped {sync_stats['duplicate_ids']} documents with duplicate ids")
+    else:
+        # Add documents
+        print("\nAdding documents to vector store...")
+        vector_store.add_documents(documents, batch_size=1000)
+    elapsed = time.time() - start_time
     
     # Get stats
     stats = vector_store.get_collection_stats()
@@ -55,6 +69,25 @@ def main():
     print("=" * 60)
     print(f"Total documents indexed: {stats['total_documents']}")
     
+    embed_stats = vector_store.embedding_generator.scheduler.get_stats()
+    print(f"Indexing throughput: {len(documents) / max(elapsed, 1e-9):.1f} docs/s ({elapsed:.1f}s total)")
+    print(f"Embedding API: {embed_stats['requests']} requests, {embed_stats['rate_limited']} rate limited, "
+          f"{embed_stats['texts_per_s']} texts/s, ~{embed_stats['tokens_per_s']} tokens/s")
+    
+    cache_stats = vector_store.embedding_generator.get_cache_stats()
+    if cache_stats:
+        print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate_pct']}% hit rate, {cache_stats['entries']} entries)")
+    
+    # Lexical index for hybrid retrieval (retrieval.search_type: hybrid)
+    print("\nBuilding BM25 index...")
+    start_time = time.time()
+    bm25_index = BM25Index()
+    bm25_index.build(documents, STORE_DIR)
+    bm25_stats = bm25_index.get_stats()
+    print(f"✓ BM25 index: {bm25_stats['terms']} terms, {bm25_stats['postings']} postings "
+          f"({bm25_stats['postings_mb']} MB) in {time.time() - start_time:.1f}s")
+    
     # Test search
     print("\nTesting search...")
     test_query = "laptop for gaming"
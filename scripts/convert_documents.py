@@ -0,0 +1,42 @@
+"""
+Convert a legacy documents.json into the compact document store
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import time
+
+from src.document_store import DocumentStore, convert_legacy_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy processed documents")
+    parser.add_argument("--input", default="data/processed/documents.json",
+                        help="Legacy JSON array of documents")
+    parser.add_argument("--output", default="data/processed/documents",
+                        help="Document store directory to write")
+    args = parser.parse_args()
+    
+    print(f"Converting {args.input} -> {args.output}/ ...")
+    start_time = time.time()
+    try:
+        count = convert_legacy_json(args.input, args.output)
+    except ValueError as e:
+        sys.exit(f"Conversion failed, {args.output}/ is incomplete: {e}")
+    elapsed = time.time() - start_time
+    
+    store = DocumentStore(args.output)
+    size_mb = sum(
+        os.path.getsize(path)
+        for path in (store.data_path, store.offsets_path, store.ids_path)
+    ) / (1024 * 1024)
+    legacy_mb = os.path.getsize(args.input) / (1024 * 1024)
+    
+    print(f"✓ Converted {count} documents in {elapsed:.1f}s")
+    print(f"  Size: {legacy_mb:.1f} MB -> {size_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Load test the FastAPI service against the local stub OpenAI server
+
+Runs ``src/api.py`` under uvicorn with embeddings and chat completions
+pointed at ``scripts/stub_openai_server.py``, then sends ``/query`` (or,
+with ``--stream``, ``/query/stream``) requests at increasing concurrency. A blocking handler serves one request
+per LLM round trip regardless of concurrency; the async pipeline should
+scale throughput with concurrency until search or the event loop saturates.
+
+``--offline`` skips the stub: hashing embeddings and the fake LLM backend
+run inside the API process, so no network or API key is needed.
+``--min-rps`` fails the run when the last level falls below a throughput
+floor, for catching regressions in CI. With ``--slow-rate`` a fraction of
+fake LLM calls is slow; compare p99 with and without ``--no-hedge`` to see
+what hedged requests buy.
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import asyncio
+import itertools
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from scripts.bench_config import write_temp_config
+from scripts.stub_openai_server import spawn_server
+from src.document_store import DocumentStore
+from src.numpy_vector_store import NumpyVectorStore
+from tests.test_queries import TEST_QUERIES
+
+STORE_DIR = "data/processed/documents"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_index(config_path: str, documents: DocumentStore, limit: int) -> int:
+    """Index the first ``limit`` processed documents into a NumPy store"""
+    store = NumpyVectorStore(config_path)
+    store.add_documents(list(itertools.islice(documents, limit)))
+    return store.count
+
+
+def start_api(config_path: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, 'SHOPASSIST_CONFIG': config_path}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            # /health builds the pipeline, so the first timed request is warm
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=30).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not become healthy")
+
+
+async def stream_one(client: httpx.AsyncClient, query: str, timings: dict):
+    """POST /query/stream and time the first byte, first token and last event"""
+    start_time = time.perf_counter()
+    first_byte = first_token = None
+    async with client.stream("POST", "/query/stream", json={"query": query}) as response:
+        if response.status_code != 200:
+            return False
+        async for line in response.aiter_lines():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start_time
+            if line == "event: token" and first_token is None:
+                first_token = time.perf_counter() - start_time
+            elif line == "event: error":
+                return False
+    timings['ttfb'].append(first_byte)
+    timings['ttft'].append(first_token or 0.0)
+    timings['total'].append(time.perf_counter() - start_time)
+    return True
+
+
+async def run_level(api_url: str, queries: list, concurrency: int, stream: bool):
+    """Send every query with at most ``concurrency`` in flight; returns (elapsed, timings, errors)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, errors = {'ttfb': [], 'ttft': [], 'total': []}, 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=120, limits=limits) as client:
+        async def one(query: str):
+            nonlocal errors
+            async with semaphore:
+                if stream:
+                    errors += not await stream_one(client, query, timings)
+                    return
+                start_time = time.perf_counter()
+                response = await client.post("/query", json={"query": query})
+                if response.status_code != 200:
+                    errors += 1
+                    return
+                timings['total'].append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(one(query) for query in queries))
+        return time.perf_counter() - start_time, timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /query against the stub OpenAI API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=128, help="Requests per concurrency level")
+    parser.add_argument("--docs", type=int, default=5000, help="Processed documents to index")
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--chat-tokens", type=int, default=64)
+    parser.add_argument("--token-interval-ms", type=float, default=2.0)
+    parser.add_argument("--stream", action="store_true",
+                        help="Use /query/stream and report time to first byte and first token")
+    parser.add_argument("--offline", action="store_true",
+                        help="Hashing embeddings and the in-process fake LLM instead of the stub server")
+    parser.add_argument("--min-rps", type=float, default=0.0,
+                        help="Exit with status 1 if the last concurrency level is below this req/s")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="--offline: fraction of LLM calls delayed by --slow-latency-ms")
+    parser.add_argument("--slow-latency-ms", type=float, default=3000.0)
+    parser.add_argument("--no-hedge", action="store_true", help="Disable hedged LLM requests")
+    args = parser.parse_args()
+
+    documents = DocumentStore(STORE_DIR)
+    if not documents.exists():
+        sys.exit(f"No processed documents at {STORE_DIR}; run scripts/process_data.py first")
+
+    stub = base_url = None
+    if args.offline:
+        args.embed_latency_ms = 0.0
+        embeddings = {'backend': 'hashing', 'dimension': args.dimension}
+        llm = {'backend': 'fake', 'fake': {
+            'latency_ms': args.chat_latency_ms,
+            'tokens_per_second': 1000 / args.token_interval_ms if args.token_interval_ms else 0,
+            'answer_tokens': args.chat_tokens,
+            'slow_rate': args.slow_rate,
+            'slow_latency_ms': args.slow_latency_ms
+        }}
+    else:
+        os.environ.setdefault('OPENAI_API_KEY', 'stub')
+        stub, base_url = spawn_server(
+            dimension=args.dimension,
+            latency_ms=args.embed_latency_ms,
+            chat_latency_ms=args.chat_latency_ms,
+            chat_tokens=args.chat_tokens,
+            token_interval_ms=args.token_interval_ms
+        )
+        embeddings = {'backend': 'openai', 'base_url': base_url, 'dimension': args.dimension,
+                      'cache': {'enabled': False}}
+        llm = {'backend': 'openai', 'base_url': base_url}
+    # Hedge from the first calls on, so short runs show its effect
+    llm['hedge'] = {'enabled': not args.no_hedge, 'min_samples': 20,
+                    'initial_delay_ms': (args.chat_latency_ms + args.chat_tokens * args.token_interval_ms) * 2}
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    config_path = write_temp_config({
+        'embeddings': embeddings,
+        'llm': llm,
+        'vector_db': {'backend': 'numpy', 'persist_directory': workdir, 'index': 'flat',
+                      'quantization': 'none'},
+        'retrieval': {'search_type': 'similarity'}
+    })
+    api = None
+    rps = 0.0
+    try:
+        print(f"Indexing {args.docs} documents{'' if args.offline else ' through the stub'}...")
+        count = build_index(config_path, documents, args.docs)
+        port = free_port()
+        api = start_api(config_path, port)
+        api_url = f"http://127.0.0.1:{port}"
+
+        base_queries = [q['query'] for queries in TEST_QUERIES.values() for q in queries]
+        llm_seconds = (args.chat_latency_ms + args.chat_tokens * args.token_interval_ms) / 1000
+        round_trip = args.embed_latency_ms / 1000 + llm_seconds
+
+        endpoint = "/query/stream" if args.stream else "/query"
+        print("\n" + "=" * 86)
+        print(f"{endpoint} load test: {count} docs, embed {args.embed_latency_ms:.0f}ms, "
+              f"LLM {llm_seconds * 1000:.0f}ms per request ({'fake LLM' if args.offline else 'stub'})")
+        print(f"A blocking handler tops out near {1 / round_trip:.1f} req/s at any concurrency")
+        print("=" * 86)
+        first = f"{'ttfb p50':>9} {'ttft p50':>9} " if args.stream else ""
+        print(f"{'concurrency':>11} {'req/s':>8} {first}{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+              f"{'LLM in flight':>14} {'new conns':>10} {'errors':>7}")
+
+        stub_url = base_url.rsplit("/v1", 1)[0] if stub else None
+        connections = httpx.get(stub_url + "/stats").json()['connections'] if stub else 0
+        for concurrency in args.concurrency:
+            # Distinct questions, so the query embedding cache does not hide the embedding call
+            queries = [f"{base_queries[i % len(base_queries)]} (#{concurrency}.{i})" for i in range(args.requests)]
+            elapsed, timings, errors = asyncio.run(run_level(api_url, queries, concurrency, args.stream))
+            if stub:
+                stub_stats = httpx.get(stub_url + "/stats").json()
+                llm_in_flight = stub_stats['max_chat_in_flight']
+                new_connections, connections = stub_stats['connections'] - connections, stub_stats['connections']
+            else:
+                llm_stats = httpx.get(api_url + "/stats").json()['llm']
+                llm_in_flight = llm_stats.get('primary', llm_stats)['max_in_flight']
+                new_connections = 0
+            rps = len(timings['total']) / elapsed
+            ms = {name: np.array(values or [0.0]) * 1000 for name, values in timings.items()}
+            first = (f"{np.percentile(ms['ttfb'], 50):9.0f} {np.percentile(ms['ttft'], 50):9.0f} "
+                     if args.stream else "")
+            print(f"{concurrency:11d} {rps:8.1f} {first}"
+                  f"{np.percentile(ms['total'], 50):8.0f} {np.percentile(ms['total'], 95):8.0f} "
+                  f"{np.percentile(ms['total'], 99):8.0f} {ms['total'].max():8.0f} {llm_in_flight:14d} {new_connections:10d} {errors:7d}")
+
+        print("\nLLM in flight: peak concurrent chat completions seen by the LLM so far")
+        llm_stats = httpx.get(api_url + "/stats").json()['llm']
+        if 'hedges' in llm_stats:
+            print(f"LLM routing: {llm_stats['hedges']} hedges ({llm_stats['hedge_wins']} won), "
+                  f"{llm_stats['fallbacks']} fallbacks, hedge delay {llm_stats['hedge_delay_ms']} ms")
+        if stub:
+            print("new conns: TCP connections the API opened to the stub during the level "
+                  "(keep-alive reuse keeps this low)")
+            print(f"API connection pool: {httpx.get(api_url + '/stats').json()['http']}")
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait()
+        if stub is not None:
+            stub.terminate()
+        os.remove(config_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if rps < args.min_rps:
+        sys.exit(f"Throughput regression: {rps:.1f} req/s at concurrency {args.concurrency[-1]} "
+                 f"is below --min-rps {args.min_rps}")
+
+
+if __name__ == "__main__":
+    main()
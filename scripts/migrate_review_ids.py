@@ -0,0 +1,147 @@
+"""
+Migrate an existing vector store from the old per-process review ids to stable ones
+
+Old review ids came from Python's salted ``hash`` and cannot be recomputed,
+so old entries are matched to freshly processed documents by content. Run
+``scripts/process_data.py`` first; matched entries keep their stored
+embeddings and are re-keyed, so nothing is re-embedded.
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import hashlib
+import os
+import shutil
+import time
+from typing import Dict, List
+
+from src.data_processor import Document
+from src.document_store import DocumentStore, document_hash, iter_batches
+from src.vector_store import create_vector_store, ChromaVectorStore
+
+STORE_DIR = "data/processed/documents"
+
+
+def content_key(content: str) -> str:
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def index_reviews(documents: DocumentStore) -> Dict[str, List[Document]]:
+    """Newly processed review documents grouped by content digest"""
+    by_content: Dict[str, List[Document]] = {}
+    for doc in documents:
+        if doc.doc_type == 'review':
+            by_content.setdefault(content_key(doc.content), []).append(doc)
+    return by_content
+
+
+def match(by_content: Dict[str, List[Document]], content: str):
+    """Take the next unclaimed new document with this content, if any"""
+    candidates = by_content.get(content_key(content))
+    return candidates.pop(0) if candidates else None
+
+
+def migrate_chroma(store: ChromaVectorStore, by_content: Dict[str, List[Document]],
+                   new_ids: set, page_size: int = 1000) -> Dict[str, int]:
+    stats = {'migrated': 0, 'unmatched': 0, 'current': 0}
+    manifest = store.load_manifest()
+
+    old_ids = []
+    for offset in range(0, store.collection.count(), page_size):
+        page = store.collection.get(limit=page_size, offset=offset, include=[])
+        old_ids.extend(doc_id for doc_id in page['ids'] if doc_id.startswith('review_'))
+
+    for ids in iter_batches(old_ids, page_size):
+        page = store.collection.get(ids=ids, include=["documents", "embeddings"])
+        moved = []
+        for doc_id, content, embedding in zip(page['ids'], page['documents'], page['embeddings']):
+            if doc_id in new_ids:
+                stats['current'] += 1
+                continue
+            doc = match(by_content, content)
+            if doc is None:
+                stats['unmatched'] += 1
+                continue
+            moved.append((doc_id, doc, embedding))
+
+        if not moved:
+            continue
+        store.collection.upsert(
+            ids=[doc.doc_id for _, doc, _ in moved],
+            documents=[doc.content for _, doc, _ in moved],
+            embeddings=[list(embedding) for _, _, embedding in moved],
+            metadatas=[{**doc.metadata, 'doc_type': doc.doc_type} for _, doc, _ in moved]
+        )
+        store.collection.delete(ids=[old_id for old_id, _, _ in moved])
+        for old_id, doc, _ in moved:
+            manifest.pop(old_id, None)
+            manifest[doc.doc_id] = document_hash(doc)
+        stats['migrated'] += len(moved)
+
+    store.save_manifest(manifest)
+    return stats
+
+
+def migrate_numpy(store, by_content: Dict[str, List[Document]], new_ids: set) -> Dict[str, int]:
+    """Rewrite the row-aligned document store with new ids; vectors stay as they are"""
+    stats = {'migrated': 0, 'unmatched': 0, 'current': 0}
+
+    def rewritten():
+        for doc in store.documents:
+            if doc.doc_type != 'review':
+                yield doc
+                continue
+            if doc.doc_id in new_ids:
+                stats['current'] += 1
+                yield doc
+                continue
+            new_doc = match(by_content, doc.content)
+            if new_doc is None:
+                stats['unmatched'] += 1
+                yield doc
+                continue
+            stats['migrated'] += 1
+            yield Document(doc.content, doc.metadata, doc.doc_type, new_doc.doc_id)
+
+    directory = store.documents.directory
+    tmp_directory = f"{directory}.migrating"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    DocumentStore(tmp_directory).write(rewritten())
+    store.documents.close()
+    shutil.rmtree(directory)
+    os.replace(tmp_directory, directory)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-key review documents to stable ids")
+    parser.add_argument("--documents", default=STORE_DIR,
+                        help="Document store produced by the current scripts/process_data.py")
+    args = parser.parse_args()
+
+    documents = DocumentStore(args.documents)
+    if not documents.exists():
+        sys.exit(f"No processed documents at {args.documents}; run scripts/process_data.py first")
+
+    print("Indexing newly processed reviews...")
+    by_content = index_reviews(documents)
+    new_ids = {doc.doc_id for docs in by_content.values() for doc in docs}
+    print(f"✓ {len(new_ids)} review documents")
+
+    start_time = time.time()
+    vector_store = create_vector_store()
+    if isinstance(vector_store, ChromaVectorStore):
+        stats = migrate_chroma(vector_store, by_content, new_ids)
+    else:
+        stats = migrate_numpy(vector_store, by_content, new_ids)
+
+    print(f"✓ Migrated {stats['migrated']} review ids in {time.time() - start_time:.1f}s "
+          f"({stats['current']} already current, {stats['unmatched']} unmatched)")
+    if stats['unmatched'] and isinstance(vector_store, ChromaVectorStore):
+        print("  Unmatched entries no longer exist in the processed data; "
+              "`scripts/build_vector_store.py --sync` removes them")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,24 +4,63 @@ Script to run data processing pipeline
 import sys
 sys.path.append('.')
 
+import argparse
+import os
+import resource
+import time
+
 from src.data_processor import DataProcessor
+from src.document_store import DocumentStore
+
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Process raw data into RAG documents")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for products/reviews (default: 1, serial)")
+    parser.add_argument("--legacy-json", action="store_true",
+                        help="Write data/processed/documents.json instead of the document store")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ShopAssist RAG - Data Processing")
     print("=" * 60)
     
     processor = DataProcessor()
-    
-    print("\nProcessing raw data...")
-    documents = processor.process_all("data/raw")
-    
-    print("\nSaving processed documents...")
-    processor.save_processed_data(documents, "data/processed/documents.json")
-    
+    os.makedirs("data/processed", exist_ok=True)
+    if processor.chunker is not None and not processor.chunker.tokens.exact:
+        print("Warning: tiktoken unavailable, chunk boundaries use a ~4 characters/token estimate "
+              "and will differ from a build with tiktoken")
+
+    mode = f"{args.workers} workers" if args.workers > 1 else "serial"
+    print(f"\nProcessing raw data (streaming, {mode})...")
+    start_time = time.time()
+    documents = processor.iter_documents("data/raw", workers=args.workers)
+    if args.legacy_json:
+        count = processor.save_processed_data(documents, "data/processed/documents.json")
+    else:
+        count = DocumentStore("data/processed/documents").write(documents)
+        print(f"✓ Saved {count} documents to data/processed/documents/")
+    elapsed = time.time() - start_time
+
     print("\n" + "=" * 60)
     print("✓ Processing complete!")
     print("=" * 60)
+    print(f"Documents written: {count}")
+    if processor.deduplicator is not None:
+        dedup_stats = processor.deduplicator.get_stats()
+        print(f"Duplicates collapsed: {dedup_stats['collapsed']} of {dedup_stats['documents']} "
+              f"({dedup_stats['exact_duplicates']} exact, {dedup_stats['near_duplicates']} near)")
+    print(f"Elapsed: {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} docs/s)")
+    print(f"Peak memory: {peak_memory_mb():.1f} MB")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
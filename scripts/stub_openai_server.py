@@ -0,0 +1,311 @@
+"""
+Local stub of the OpenAI HTTP API (embeddings and chat completions) for offline load testing
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import struct
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.llm_backends import fake_answer_tokens
+
+
+class StubState:
+    """Server-wide settings and counters"""
+
+    def __init__(self, dimension: int = 1536, latency_ms: float = 50.0, rate_limit_rps: float = 0.0,
+                 chat_latency_ms: float = 500.0, chat_tokens: int = 64, token_interval_ms: float = 5.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.rate_limit_rps = rate_limit_rps
+        self.chat_latency_ms = chat_latency_ms
+        self.chat_tokens = chat_tokens
+        self.token_interval_ms = token_interval_ms
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.window_requests = 0
+        self.counters = {'requests': 0, 'rate_limited': 0, 'inputs': 0, 'chat_completions': 0,
+                         'chat_in_flight': 0, 'max_chat_in_flight': 0, 'connections': 0}
+
+    def admit(self) -> bool:
+        """Fixed one-second window rate limiter; False means answer 429"""
+        with self.lock:
+            self.counters['requests'] += 1
+            if not self.rate_limit_rps:
+                return True
+            now = time.time()
+            if now - self.window_start >= 1.0:
+                self.window_start = now
+                self.window_requests = 0
+            if self.window_requests >= self.rate_limit_rps:
+                self.counters['rate_limited'] += 1
+                return False
+            self.window_requests += 1
+            return True
+
+
+# Texts map onto a fixed pool of vectors so responses can be served from
+# pre-serialized JSON; the stub must never be the bottleneck it measures.
+VECTOR_POOL_SIZE = 4096
+
+
+def _bucket(text: str) -> int:
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % VECTOR_POOL_SIZE
+
+
+@lru_cache(maxsize=VECTOR_POOL_SIZE)
+def _bucket_vector(bucket: int, dimension: int) -> tuple:
+    rng = random.Random(bucket)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return tuple(round(v / norm, 6) for v in vector)
+
+
+@lru_cache(maxsize=2 * VECTOR_POOL_SIZE)
+def _bucket_vector_json(bucket: int, dimension: int, encoding_format: str = "float") -> str:
+    vector = _bucket_vector(bucket, dimension)
+    if encoding_format == "base64":
+        return json.dumps(base64.b64encode(struct.pack(f"<{dimension}f", *vector)).decode('ascii'))
+    return json.dumps(list(vector))
+
+
+def stub_embedding(text: str, dimension: int) -> list:
+    """Deterministic unit vector derived from the text"""
+    return list(_bucket_vector(_bucket(text), dimension))
+
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # One handler per TCP connection; keep-alive requests reuse it
+            with state.lock:
+                state.counters['connections'] += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: dict = None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with state.lock:
+                    self._send_json(200, dict(state.counters))
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            request = self._read_json()
+            if not state.admit():
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                    {"Retry-After": "1"}
+                )
+                return
+
+            if self.path.endswith("/embeddings"):
+                self._embeddings(request)
+            elif self.path.endswith("/chat/completions"):
+                self._chat_completions(request)
+            else:
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        def _embeddings(self, request: dict):
+            inputs = request.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            with state.lock:
+                state.counters['inputs'] += len(inputs)
+
+            time.sleep(state.latency_ms / 1000)
+            encoding_format = request.get("encoding_format") or "float"
+            data = ",".join(
+                f'{{"object":"embedding","index":{i},'
+                f'"embedding":{_bucket_vector_json(_bucket(text), state.dimension, encoding_format)}}}'
+                for i, text in enumerate(inputs)
+            )
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            body = (
+                f'{{"object":"list","data":[{data}],"model":{json.dumps(request.get("model", "stub"))},'
+                f'"usage":{{"prompt_tokens":{tokens},"total_tokens":{tokens}}}}}'
+            ).encode('utf-8')
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chat_completions(self, request: dict):
+            """Answer after ``chat_latency_ms``, then one token per ``token_interval_ms``
+
+            With ``stream`` the tokens are sent as server-sent events as they
+            are "generated", so clients can measure time to first token.
+            """
+            with state.lock:
+                state.counters['chat_completions'] += 1
+                state.counters['chat_in_flight'] += 1
+                state.counters['max_chat_in_flight'] = max(
+                    state.counters['max_chat_in_flight'], state.counters['chat_in_flight']
+                )
+            try:
+                count = min(request.get("max_tokens") or state.chat_tokens, state.chat_tokens)
+                tokens = fake_answer_tokens(request.get("messages", []), count)
+                completion_id = f"chatcmpl-stub{random.getrandbits(48):012x}"
+                model = request.get("model", "stub")
+                time.sleep(state.chat_latency_ms / 1000)
+
+                if request.get("stream"):
+                    self._stream_chat(completion_id, model, tokens)
+                    return
+
+                time.sleep(state.token_interval_ms * len(tokens) / 1000)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+                })
+            finally:
+                with state.lock:
+                    state.counters['chat_in_flight'] -= 1
+
+        def _stream_chat(self, completion_id: str, model: str, tokens: list):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def event(delta: dict, finish_reason=None):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            event({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(state.token_interval_ms / 1000)
+                event({"content": token})
+            event({}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections under load tests,
+    # which then show up as 1s+ SYN retransmit latency spikes
+    request_queue_size = 512
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **settings):
+    """Start the stub in a background thread; returns (server, state, base_url)"""
+    state = StubState(**settings)
+    server = StubHTTPServer((host, port), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server, state, base_url
+
+
+def spawn_server(port: int = 0, **settings):
+    """Run the stub in a separate process so it does not share our GIL
+
+    Returns (process, base_url); terminate the process when done.
+    """
+    if not port:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+    args = [sys.executable, __file__, "--port", str(port)]
+    for name, value in settings.items():
+        args += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return process, f"http://127.0.0.1:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate-limit-rps", type=float, default=0.0,
+                        help="Answer 429 beyond this many requests per second (0 = unlimited)")
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0,
+                        help="Chat completion delay before the first token")
+    parser.add_argument("--chat-tokens", type=int, default=64, help="Tokens per chat answer")
+    parser.add_argument("--token-interval-ms", type=float, default=5.0,
+                        help="Delay between generated tokens")
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(
+        args.host, args.port,
+        dimension=args.dimension,
+        latency_ms=args.latency_ms,
+        rate_limit_rps=args.rate_limit_rps,
+        chat_latency_ms=args.chat_latency_ms,
+        chat_tokens=args.chat_tokens,
+        token_interval_ms=args.token_interval_ms
+    )
+    print(f"Stub OpenAI API listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
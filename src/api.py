@@ -3,11 +3,16 @@ FastAPI backend for ShopAssist RAG
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
+import json
+import os
 import uvicorn
 import yaml
 
+from src.llm_backends import DeadlineExceeded
+from src.metadata_index import validate_filter
 from src.rag_pipeline import RAGPipeline
 
 # Initialize FastAPI app
@@ -26,8 +31,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load config
-with open("config/config.yaml", 'r') as f:
+# Load config (SHOPASSIST_CONFIG points the service at another config file)
+CONFIG_PATH = os.getenv("SHOPASSIST_CONFIG", "config/config.yaml")
+with open(CONFIG_PATH, 'r') as f:
     config = yaml.safe_load(f)
 
 # Initialize RAG pipeline (lazy loading)
@@ -38,7 +44,7 @@ def get_pipeline():
     """Lazy load RAG pipeline"""
     global rag_pipeline
     if rag_pipeline is None:
-        rag_pipeline = RAGPipeline()
+        rag_pipeline = RAGPipeline(CONFIG_PATH)
     return rag_pipeline
 
 
@@ -48,6 +54,33 @@ class QueryRequest(BaseModel):
     query: str = Field(..., description="Customer question", min_length=3)
     return_sources: bool = Field(True, description="Include source documents")
     filter_type: Optional[str] = Field(None, description="Filter by type: product, review, or policy")
+    filters: Optional[Dict[str, Any]] = Field(
+        None, description='Metadata filter, e.g. {"price_value": {"$lte": 100}, "brand": "Sony"}'
+    )
+    
+    @field_validator('filters')
+    @classmethod
+    def check_filters(cls, filters):
+        """Reject malformed filters with a 422 instead of failing the search"""
+        if filters:
+            validate_filter(filters)
+        return filters
+
+
+class BatchQueryRequest(BaseModel):
+    """Batch query request model"""
+    queries: List[str] = Field(..., description="Customer questions", min_length=1, max_length=5000)
+    return_sources: bool = Field(True, description="Include source documents")
+    filter_type: Optional[str] = Field(None, description="Filter by type: product, review, or policy")
+    filters: Optional[Dict[str, Any]] = Field(None, description="Metadata filter applied to every query")
+    
+    @field_validator('filters')
+    @classmethod
+    def check_filters(cls, filters):
+        """Reject malformed filters with a 422 instead of failing every query"""
+        if filters:
+            validate_filter(filters)
+        return filters
 
 
 class SourceDocument(BaseModel):
@@ -64,6 +97,11 @@ class QueryResponse(BaseModel):
     query: str
     sources: Optional[List[SourceDocument]] = None
     num_sources: int
+    context: Optional[Dict[str, Any]] = Field(
+        None, description="Prompt context token stats: context_tokens, original_tokens, saved_tokens, ..."
+    )
+    model: Optional[str] = Field(None, description="LLM model that produced the answer")
+    fallback: bool = Field(False, description="True when the answer came from the llm.fallback model")
 
 
 class HealthResponse(BaseModel):
@@ -116,16 +154,86 @@ async def query_rag(request: QueryRequest):
     try:
         pipeline = get_pipeline()
         
-        result = pipeline.query(
+        result = await pipeline.aquery(
             query=request.query,
             return_sources=request.return_sources,
-            filter_type=request.filter_type
+            filter_type=request.filter_type,
+            filters=request.filters
         )
         
         return QueryResponse(**result)
     
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Query timed out: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_rag_stream(request: QueryRequest):
+    """
+    Query the RAG system, streaming the answer as server-sent events
+    
+    Events: `sources` (retrieved documents, sent before generation starts),
+    then `token` ({"text": ...}) per generated chunk, then `done` with the
+    full answer and ttfb_ms/ttft_ms/total_ms; `error` if the query fails.
+    """
+    try:
+        pipeline = get_pipeline()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    
+    async def events():
+        try:
+            async for event in pipeline.astream_query(
+                query=request.query,
+                return_sources=request.return_sources,
+                filter_type=request.filter_type,
+                filters=request.filters
+            ):
+                yield _sse(event['event'], event['data'])
+        except Exception as e:
+            yield _sse('error', {'detail': f"Query failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/query/batch")
+async def query_rag_batch(request: BatchQueryRequest):
+    """
+    Answer many questions with shared embedding and search passes
+    
+    Streams NDJSON: one line per question as soon as its answer is ready,
+    in completion order, each with the question's `index` in the request.
+    A failed question has an `error` field instead of an answer.
+    """
+    try:
+        pipeline = get_pipeline()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    
+    async def lines():
+        try:
+            async for result in pipeline.aquery_batch(
+                request.queries,
+                return_sources=request.return_sources,
+                filter_type=request.filter_type,
+                filters=request.filters
+            ):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({'error': f"Batch failed: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @app.get("/stats")
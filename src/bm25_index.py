@@ -0,0 +1,202 @@
+"""
+Persistent BM25 inverted index for lexical retrieval
+"""
+import json
+import math
+import os
+import re
+import shutil
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from src.data_processor import Document
+from src.document_store import DocumentStore
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens; model numbers like 'wh-1000xm4' are kept
+    whole and also split into their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token or "." in token:
+            tokens.extend(part for part in re.split(r"[-.]", token) if part)
+    return tokens
+
+
+def varint_lengths(values: np.ndarray) -> np.ndarray:
+    """Bytes needed to encode each value as a LEB128 varint"""
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        lengths += values >= (1 << shift)
+    return lengths
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """Encode non-negative integers as LEB128 varints (7 bits per byte)"""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = varint_lengths(values)
+    owner = np.repeat(np.arange(len(values)), lengths)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    encoded = ((values[owner] >> (7 * position).astype(np.uint64)) & 0x7F).astype(np.uint8)
+    encoded[position < lengths[owner] - 1] |= 0x80
+    return encoded
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse of ``encode_varints``"""
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+class BM25Index:
+    """Okapi BM25 over the processed document store
+
+    Rows are the rows of the DocumentStore the index was built from. Each
+    term's posting list holds its row ids in ascending order, stored as
+    varint-encoded gaps (``postings.bin``), with term frequencies alongside
+    (``tfs.u8``). A query decodes only the lists of its own terms and
+    accumulates scores into one dense array, so lookup cost is driven by
+    the document frequency of the query terms rather than the corpus size.
+    """
+
+    def __init__(self, config_path: str = "config/config.yaml"):
+        with open(config_path, 'r') as f:
+            self.config = yaml.safe_load(f)
+
+        bm25_config = self.config['retrieval'].get('bm25', {})
+        self.directory = bm25_config.get('directory', 'data/processed/bm25')
+        self.k1 = bm25_config.get('k1', 1.2)
+        self.b = bm25_config.get('b', 0.75)
+
+        self.documents: Optional[DocumentStore] = None
+        self.vocabulary = {}
+        self.count = 0
+        if self.exists():
+            self._load()
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.directory, "meta.json"))
+
+    def build(self, documents: Iterable[Document], documents_directory: str) -> int:
+        """Index ``documents``, which must be the rows of the store at ``documents_directory``"""
+        vocabulary = {}
+        term_ids, rows, tfs, lengths = array('I'), array('I'), array('B'), array('I')
+
+        for row, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.content))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                rows.append(row)
+                tfs.append(min(tf, 255))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.uint32)
+        # Stable sort keeps each term's rows ascending
+        order = np.argsort(term_ids, kind='stable')
+        sorted_rows = np.frombuffer(rows, dtype=np.uint32)[order].astype(np.int64)
+        posting_offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)))])
+
+        gaps = np.diff(sorted_rows, prepend=0)
+        starts = posting_offsets[:-1]
+        gaps[starts] = sorted_rows[starts]
+        byte_offsets = np.concatenate([[0], np.cumsum(varint_lengths(gaps))])[posting_offsets]
+
+        tmp_directory = f"{self.directory}.tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        encode_varints(gaps).tofile(os.path.join(tmp_directory, "postings.bin"))
+        np.frombuffer(tfs, dtype=np.uint8)[order].tofile(os.path.join(tmp_directory, "tfs.u8"))
+        np.savez(
+            os.path.join(tmp_directory, "offsets.npz"),
+            byte_offsets=byte_offsets.astype(np.int64),
+            posting_offsets=posting_offsets.astype(np.int64),
+            doc_lengths=np.frombuffer(lengths, dtype=np.uint32)
+        )
+        with open(os.path.join(tmp_directory, "meta.json"), 'w') as f:
+            json.dump({
+                'documents_directory': documents_directory,
+                'count': len(lengths),
+                'terms': sorted(vocabulary, key=vocabulary.get)
+            }, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(tmp_directory, self.directory)
+        self._load()
+        return self.count
+
+    def _load(self):
+        with open(os.path.join(self.directory, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        self.count = meta['count']
+        self.vocabulary = {term: i for i, term in enumerate(meta['terms'])}
+
+        offsets = np.load(os.path.join(self.directory, "offsets.npz"))
+        self.byte_offsets = offsets['byte_offsets']
+        self.posting_offsets = offsets['posting_offsets']
+        self.doc_lengths = offsets['doc_lengths'].astype(np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if self.count else 0.0
+
+        self.postings = np.memmap(os.path.join(self.directory, "postings.bin"), dtype=np.uint8, mode='r') \
+            if self.byte_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self.tfs = np.fromfile(os.path.join(self.directory, "tfs.u8"), dtype=np.uint8)
+
+        self.documents = DocumentStore(meta['documents_directory'])
+        if len(self.documents) != self.count:
+            raise ValueError(
+                f"BM25 index covers {self.count} rows but {meta['documents_directory']} has "
+                f"{len(self.documents)}; rebuild it with scripts/build_vector_store.py"
+            )
+
+    def postings_for(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, term frequencies) for one term"""
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        data = np.asarray(self.postings[self.byte_offsets[term_id]:self.byte_offsets[term_id + 1]])
+        rows = np.cumsum(decode_varints(data)).astype(np.int64)
+        tfs = self.tfs[self.posting_offsets[term_id]:self.posting_offsets[term_id + 1]]
+        return rows, tfs
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Top rows by BM25 score, best first"""
+        if not self.count:
+            return []
+
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            rows, tfs = self.postings_for(term)
+            if not len(rows):
+                continue
+            idf = math.log(1 + (self.count - len(rows) + 0.5) / (len(rows) + 0.5))
+            tfs = tfs.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(top_k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'documents': self.count,
+            'terms': len(self.vocabulary),
+            'postings': int(self.posting_offsets[-1]) if self.count else 0,
+            'postings_mb': round(len(self.postings) / (1024 * 1024), 2) if self.count else 0
+        }
@@ -1,24 +1,458 @@
 """
-Simple caching layer for RAG responses
+Caching layer for RAG responses
+
+Backends share the ``CacheBackend`` interface and are chosen by
+``cache.backend`` in config.yaml (see ``create_cache``):
+
+- ``memory``: bounded in-process LRU or LFU
+- ``sqlite``: a single persistent SQLite file
+- ``tiered``: memory in front of sqlite (the default)
+- ``files``: the original one-JSON-file-per-entry ``SimpleCache``
 """
+import atexit
+import contextlib
 import json
 import hashlib
+import logging
 import os
-from typing import Optional, Dict, Any
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+
+def make_key(query: str) -> str:
+    """Cache key for a query: case and surrounding whitespace do not matter"""
+    return hashlib.md5(query.lower().strip().encode()).hexdigest()
+
+
+class CacheBackend:
+    """Key-value store for JSON-serializable responses with a TTL
+    
+    Values are stored serialized, so callers always get a fresh copy and
+    sizes are exact. ``get_stats`` must not touch every entry.
+    """
+    
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._stop_expiry: Optional[threading.Event] = None
+    
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+    
+    def set(self, query: str, response: Dict[str, Any]):
+        raise NotImplementedError
+    
+    def set_many(self, items: List[Tuple[str, str]]):
+        """Store several (query, JSON-serialized response) pairs"""
+        for query, value in items:
+            self.set(query, json.loads(value))
+    
+    def clear(self):
+        raise NotImplementedError
+    
+    def expire(self) -> int:
+        """Drop expired entries; returns how many were removed"""
+        raise NotImplementedError
+    
+    def get_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def start_expiry(self, interval_seconds: float):
+        """Run ``expire`` every ``interval_seconds`` in a daemon thread"""
+        if self._stop_expiry is not None:
+            return
+        self._stop_expiry = threading.Event()
+        
+        def run():
+            while not self._stop_expiry.wait(interval_seconds):
+                try:
+                    self.expire()
+                except Exception:
+                    # Keep the thread alive; a locked database is retried next interval
+                    logger.exception("Cache expiry failed")
+        
+        threading.Thread(target=run, name="cache-expiry", daemon=True).start()
+    
+    def close(self):
+        """Stop background expiry and release resources"""
+        if self._stop_expiry is not None:
+            self._stop_expiry.set()
+
+
+class MemoryCache(CacheBackend):
+    """Bounded in-process cache with LRU or LFU eviction
+    
+    Bounded by entry count and by serialized size. LFU keeps one
+    insertion-ordered bucket per access frequency, so lookups, inserts and
+    evictions are all O(1); ties within a frequency evict the oldest.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 policy: str = "lru"):
+        super().__init__(ttl_seconds)
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        
+        self._lock = threading.Lock()
+        # key -> [serialized value, expires_at, frequency]
+        self._entries: Dict[str, list] = {}
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._frequencies: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_frequency = 0
+        self._bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+    
+    def _touch(self, key: str, entry: list):
+        """Record an access for the eviction policy"""
+        if self.policy == "lru":
+            self._lru.move_to_end(key)
+            return
+        frequency = entry[2]
+        bucket = self._frequencies[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._frequencies[frequency]
+            if self._min_frequency == frequency:
+                self._min_frequency = frequency + 1
+        entry[2] = frequency + 1
+        self._frequencies.setdefault(frequency + 1, OrderedDict())[key] = None
+    
+    def _remove(self, key: str):
+        value, _, frequency = self._entries.pop(key)
+        self._bytes -= len(value)
+        if self.policy == "lru":
+            del self._lru[key]
+            return
+        bucket = self._frequencies[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._frequencies[frequency]
+    
+    def _victim(self) -> str:
+        if self.policy == "lru":
+            return next(iter(self._lru))
+        if self._min_frequency not in self._frequencies:
+            # The least frequent bucket was emptied by a removal
+            self._min_frequency = min(self._frequencies)
+        return next(iter(self._frequencies[self._min_frequency]))
+    
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Get cached response for query"""
+        key = make_key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[1] <= time.time():
+                self._remove(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._touch(key, entry)
+            self.stats['hits'] += 1
+            value = entry[0]
+        return json.loads(value)
+    
+    def set(self, query: str, response: Dict[str, Any]):
+        """Cache response for query, evicting as needed to stay within bounds"""
+        self.set_serialized(make_key(query), json.dumps(response))
+    
+    def set_serialized(self, key: str, value: str, expires_at: Optional[float] = None):
+        """Store an already serialized value under an already derived key
+        
+        ``expires_at`` (epoch seconds) keeps an entry copied from another
+        tier on its original expiry instead of a fresh TTL.
+        """
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (len(self._entries) >= self.max_entries
+                                     or self._bytes + len(value) > self.max_bytes):
+                self._remove(self._victim())
+                self.stats['evictions'] += 1
+            
+            if expires_at is None:
+                expires_at = time.time() + self.ttl_seconds
+            self._entries[key] = [value, expires_at, 1]
+            self._bytes += len(value)
+            if self.policy == "lru":
+                self._lru[key] = None
+            else:
+                self._frequencies.setdefault(1, OrderedDict())[key] = None
+                self._min_frequency = 1
+    
+    def get_serialized(self, key: str) -> Optional[Tuple[str, float]]:
+        """Like ``get`` but by derived key and without deserializing: (value, expires_at)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            self._touch(key, entry)
+            return entry[0], entry[1]
+    
+    def clear(self):
+        """Clear all cache"""
+        with self._lock:
+            self._entries.clear()
+            self._lru.clear()
+            self._frequencies.clear()
+            self._min_frequency = 0
+            self._bytes = 0
+    
+    def expire(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+            for key in expired:
+                self._remove(key)
+            self.stats['expirations'] += len(expired)
+        return len(expired)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                'total_entries': len(self._entries),
+                'total_size_mb': round(self._bytes / (1024 * 1024), 2),
+                'policy': self.policy,
+                'max_entries': self.max_entries
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """Persistent cache in a single SQLite file
+    
+    One table keyed by the query hash, with an index on expiry so
+    expiration and eviction are range deletes. Entry count and size are
+    counted once at open and then maintained on every write, so stats are
+    O(1) (exact for this process's writes).
+    """
+    
+    def __init__(self, path: str, ttl_seconds: float, max_entries: Optional[int] = None):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+        ).fetchone()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+    
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Get cached response for query"""
+        entry = self.get_serialized(make_key(query))
+        with self._lock:
+            self.stats['hits' if entry is not None else 'misses'] += 1
+        return json.loads(entry[0]) if entry is not None else None
+    
+    def get_serialized(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def set(self, query: str, response: Dict[str, Any]):
+        """Cache response for query"""
+        self.set_serialized(make_key(query), json.dumps(response))
+    
+    def set_many(self, items: List[Tuple[str, str]]):
+        """Store several (query, serialized response) pairs in one transaction"""
+        self._write([(make_key(query), value) for query, value in items])
+    
+    def set_serialized(self, key: str, value: str, expires_at: Optional[float] = None):
+        self._write([(key, value)], expires_at)
+    
+    def _write(self, pairs: List[Tuple[str, str]], expires_at: Optional[float] = None):
+        """Write (key, value) pairs in one transaction"""
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            # IMMEDIATE takes the write lock up front: upgrading a read
+            # transaction fails with SQLITE_BUSY without waiting when another
+            # process writes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, value in pairs:
+                    previous = self._conn.execute(
+                        "SELECT LENGTH(value) FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, expires_at)
+                    )
+                    if previous:
+                        self._bytes -= previous[0]
+                    else:
+                        self._entries += 1
+                    self._bytes += len(value)
+                if self.max_entries and self._entries > self.max_entries:
+                    self._evict(self._entries - self.max_entries)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._recount()
+                raise
+    
+    def _delete(self, where: str, params: tuple) -> Tuple[int, int]:
+        """Delete matching rows; returns (rows, bytes). Call inside a transaction
+        
+        Counted with a SELECT over the same predicate rather than
+        ``DELETE ... RETURNING``, which needs SQLite 3.35.
+        """
+        removed, size = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM responses WHERE {where}", params
+        ).fetchone()
+        self._conn.execute(f"DELETE FROM responses WHERE {where}", params)
+        self._entries -= removed
+        self._bytes -= size
+        return removed, size
+    
+    def _evict(self, count: int):
+        """Drop the ``count`` entries closest to expiry (the oldest writes)"""
+        removed, _ = self._delete(
+            "key IN (SELECT key FROM responses ORDER BY expires_at LIMIT ?)", (count,)
+        )
+        self.stats['evictions'] += removed
+    
+    def _recount(self):
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+        ).fetchone()
+    
+    def clear(self):
+        """Clear all cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._entries, self._bytes = 0, 0
+    
+    def expire(self) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed, _ = self._delete("expires_at <= ?", (time.time(),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._recount()
+                raise
+            self.stats['expirations'] += removed
+        return removed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                'total_entries': self._entries,
+                'total_size_mb': round(self._bytes / (1024 * 1024), 2),
+                'cache_file': self.path
+            }
+    
+    def close(self):
+        super().close()
+        with self._lock:
+            self._conn.close()
+
 
-class SimpleCache:
+class TieredCache(CacheBackend):
+    """In-memory cache in front of a persistent one
+    
+    Reads try memory first and promote persistent hits into memory with their remaining TTL;
+    writes go to both tiers.
+    """
+    
+    def __init__(self, memory: MemoryCache, persistent: CacheBackend):
+        super().__init__(persistent.ttl_seconds)
+        self.memory = memory
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'persistent_hits': 0, 'misses': 0}
+    
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Get cached response for query"""
+        key = make_key(query)
+        entry = self.memory.get_serialized(key)
+        tier = 'memory_hits'
+        if entry is None:
+            entry = self.persistent.get_serialized(key)
+            tier = 'persistent_hits'
+            if entry is not None:
+                # Keep the remaining lifetime: promotion must not extend the TTL
+                self.memory.set_serialized(key, *entry)
+        with self._lock:
+            self.stats[tier if entry is not None else 'misses'] += 1
+        return json.loads(entry[0]) if entry is not None else None
+    
+    def set(self, query: str, response: Dict[str, Any]):
+        """Cache response for query in both tiers"""
+        value = json.dumps(response)
+        self.memory.set_serialized(make_key(query), value)
+        self.persistent.set_many([(query, value)])
+    
+    def clear(self):
+        """Clear all cache"""
+        self.memory.clear()
+        self.persistent.clear()
+    
+    def expire(self) -> int:
+        return self.memory.expire() + self.persistent.expire()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        persistent = self.persistent.get_stats()
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'total_entries': persistent['total_entries'],
+            'total_size_mb': persistent['total_size_mb'],
+            'memory': self.memory.get_stats(),
+            'persistent': persistent
+        }
+    
+    def close(self):
+        super().close()
+        self.memory.close()
+        self.persistent.close()
+
+
+class SimpleCache(CacheBackend):
     """Simple file-based cache for RAG responses"""
     
     def __init__(self, cache_dir: str = ".cache", ttl_hours: int = 24):
+        super().__init__(ttl_hours * 3600)
         self.cache_dir = cache_dir
         self.ttl = timedelta(hours=ttl_hours)
         os.makedirs(cache_dir, exist_ok=True)
     
     def _get_cache_key(self, query: str) -> str:
         """Generate cache key from query"""
-        return hashlib.md5(query.lower().strip().encode()).hexdigest()
+        return make_key(query)
     
     def _get_cache_path(self, cache_key: str) -> str:
         """Get full path to cache file"""
@@ -49,7 +483,12 @@ class SimpleCache:
         
         except (json.JSONDecodeError, KeyError, ValueError):
             # Invalid cache file, remove it
-            os.remove(cache_path)
+            with contextlib.suppress(OSError):
+                os.remove(cache_path)
+            return None
+        
+        except FileNotFoundError:
+            # Expired and removed by another reader
             return None
     
     def set(self, query: str, response: Dict[str, Any]):
@@ -63,8 +502,17 @@ class SimpleCache:
             'timestamp': datetime.now().isoformat()
         }
         
-        with open(cache_path, 'w') as f:
-            json.dump(cache_data, f, indent=2)
+        # Write to a unique temp file and rename over the entry, so readers
+        # and concurrent writers of the same key never see a torn file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cache_data, f)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
     
     def clear(self):
         """Clear all cache"""
@@ -72,8 +520,18 @@ class SimpleCache:
             if filename.endswith('.json'):
                 os.remove(os.path.join(self.cache_dir, filename))
     
+    def expire(self) -> int:
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.endswith('.json') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        return removed
+    
     def get_stats(self) -> Dict[str, Any]:
-        """Get cache statistics"""
+        """Get cache statistics (lists every file: O(entries))"""
         cache_files = [f for f in os.listdir(self.cache_dir) if f.endswith('.json')]
         
         total_size = 0
@@ -85,4 +543,195 @@ class SimpleCache:
             'total_entries': len(cache_files),
             'total_size_mb': round(total_size / (1024 * 1024), 2),
             'cache_directory': self.cache_dir
-        }
\ No newline at end of file
+        }
+
+
+class WriteBehindCache(CacheBackend):
+    """Queue writes to a slower backend and apply them on a writer thread
+    
+    ``set`` only serializes the response and enqueues it, so a cache miss
+    does not pay for the disk write. Pending writes are coalesced per key
+    (the latest response wins) and applied in batches through the
+    backend's ``set_many``; reads see pending writes. ``flush`` waits for
+    the queue to drain, and ``close`` (also registered with ``atexit``)
+    flushes before shutting down. Beyond ``max_pending`` queued keys new
+    writes are dropped and counted rather than blocking requests. A batch
+    whose write fails is logged and retried once before it is dropped.
+    """
+    
+    def __init__(self, backend: CacheBackend, max_pending: int = 10000, batch_size: int = 256):
+        super().__init__(backend.ttl_seconds)
+        self.backend = backend
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[str, str]] = {}
+        self._closed = False
+        self.stats = {'queued': 0, 'coalesced': 0, 'dropped': 0, 'written': 0, 'batches': 0,
+                      'write_errors': 0, 'write_retries': 0}
+        
+        self._writer = threading.Thread(target=self._run, name="cache-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                while self._pending and len(self._in_flight) < self.batch_size:
+                    key, item = self._pending.popitem(last=False)
+                    self._in_flight[key] = item
+                batch = list(self._in_flight.values())
+            
+            written, errors, retries = self._write_batch(batch)
+            
+            with self._cond:
+                self._in_flight.clear()
+                self.stats['written'] += written
+                self.stats['write_errors'] += errors
+                self.stats['write_retries'] += retries
+                self.stats['batches'] += 1
+                self._cond.notify_all()
+    
+    def _write_batch(self, batch: List[Tuple[str, str]]) -> Tuple[int, int, int]:
+        """Apply one batch, retrying once; returns (written, dropped, retries)"""
+        try:
+            self.backend.set_many(batch)
+            return len(batch), 0, 0
+        except Exception:
+            logger.exception("Cache write of %d entries failed; retrying once", len(batch))
+        try:
+            self.backend.set_many(batch)
+            return len(batch), 0, 1
+        except Exception:
+            logger.exception("Cache write retry failed; dropping %d entries", len(batch))
+            return 0, len(batch), 1
+    
+    def _pending_value(self, key: str) -> Optional[str]:
+        with self._cond:
+            item = self._pending.get(key) or self._in_flight.get(key)
+        return item[1] if item else None
+    
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Get cached response for query, including writes not yet applied"""
+        value = self._pending_value(make_key(query))
+        if value is not None:
+            return json.loads(value)
+        return self.backend.get(query)
+    
+    def get_serialized(self, key: str) -> Optional[Tuple[str, float]]:
+        value = self._pending_value(key)
+        if value is not None:
+            # The queued write gets a full TTL when it is applied
+            return value, time.time() + self.ttl_seconds
+        return self.backend.get_serialized(key)
+    
+    def set(self, query: str, response: Dict[str, Any]):
+        """Enqueue a write of response for query"""
+        self.set_many([(query, json.dumps(response))])
+    
+    def set_many(self, items: List[Tuple[str, str]]):
+        with self._cond:
+            if self._closed:
+                self.backend.set_many(items)
+                return
+            for query, value in items:
+                key = make_key(query)
+                if key in self._pending:
+                    self._pending[key] = (query, value)
+                    self._pending.move_to_end(key)
+                    self.stats['coalesced'] += 1
+                elif len(self._pending) >= self.max_pending:
+                    self.stats['dropped'] += 1
+                else:
+                    self._pending[key] = (query, value)
+                    self.stats['queued'] += 1
+            self._cond.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued write is applied; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+    
+    def clear(self):
+        """Clear all cache, including pending writes"""
+        with self._cond:
+            self._pending.clear()
+        self.flush()
+        self.backend.clear()
+    
+    def expire(self) -> int:
+        return self.backend.expire()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend statistics plus write queue counters"""
+        with self._cond:
+            write_behind = {**self.stats, 'pending': len(self._pending) + len(self._in_flight)}
+        return {**self.backend.get_stats(), 'write_behind': write_behind}
+    
+    def close(self):
+        """Flush pending writes, stop the writer and close the backend"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        super().close()
+        self.backend.close()
+        atexit.unregister(self.close)
+
+
+def create_cache(cache_config: Dict[str, Any]) -> CacheBackend:
+    """Build the response cache described by the ``cache:`` block of config.yaml"""
+    backend = cache_config.get('backend', 'tiered')
+    ttl_hours = cache_config.get('ttl_hours', 24)
+    directory = cache_config.get('cache_directory', '.cache')
+    
+    def memory_cache() -> MemoryCache:
+        memory_config = cache_config.get('memory', {})
+        return MemoryCache(
+            ttl_hours * 3600,
+            max_entries=memory_config.get('max_entries', 10000),
+            max_bytes=int(memory_config.get('max_mb', 64) * 1024 * 1024),
+            policy=memory_config.get('policy', 'lru')
+        )
+    
+    def sqlite_cache() -> SQLiteCache:
+        sqlite_config = cache_config.get('sqlite', {})
+        return SQLiteCache(
+            os.path.join(directory, sqlite_config.get('file', 'responses.sqlite3')),
+            ttl_hours * 3600,
+            max_entries=sqlite_config.get('max_entries')
+        )
+    
+    def write_behind(persistent: CacheBackend) -> CacheBackend:
+        write_config = cache_config.get('write_behind', {})
+        if not write_config.get('enabled', True):
+            return persistent
+        return WriteBehindCache(
+            persistent,
+            max_pending=write_config.get('max_pending', 10000),
+            batch_size=write_config.get('batch_size', 256)
+        )
+    
+    if backend == 'memory':
+        cache = memory_cache()
+    elif backend == 'sqlite':
+        cache = write_behind(sqlite_cache())
+    elif backend == 'tiered':
+        cache = TieredCache(memory_cache(), write_behind(sqlite_cache()))
+    elif backend == 'files':
+        cache = write_behind(SimpleCache(directory, ttl_hours))
+    else:
+        raise ValueError(f"Unknown cache backend: {backend}")
+    
+    interval = cache_config.get('expiry_interval_seconds', 300)
+    if interval:
+        cache.start_expiry(interval)
+    return cache
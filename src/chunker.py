@@ -0,0 +1,151 @@
+"""
+Token-aware chunking on section, paragraph and sentence boundaries
+"""
+import re
+from typing import List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # pinned in requirements.txt; without it chunk boundaries are estimated
+    tiktoken = None
+
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=\S)")
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when available, else ~4 characters per token"""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding)
+            except Exception:
+                # The BPE file is downloaded on first use; offline, estimate instead
+                self.encoding = None
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+
+class Chunker:
+    """Split text into chunks of at most ``max_tokens`` on natural boundaries
+
+    Markdown headings start new sections, and every chunk of a section is
+    prefixed with its heading path so it stays self-describing. Inside a
+    section, paragraphs and then sentences are packed greedily up to the
+    token budget; only a single sentence longer than the budget is split,
+    at word boundaries. Consecutive chunks share up to ``overlap_tokens`` of
+    trailing sentences. A ``context`` line (e.g. the product title) can be
+    repeated at the top of chunks that would otherwise lack it.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32,
+                 token_counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokens = token_counter or TokenCounter()
+
+    def sections(self, text: str) -> List[Tuple[List[str], str]]:
+        """(heading path, body) pairs; text before any heading has an empty path"""
+        sections = []
+        path: List[Tuple[int, str]] = []
+        body: List[str] = []
+
+        for line in text.split("\n"):
+            match = HEADING.match(line)
+            if match is None:
+                body.append(line)
+                continue
+            if "\n".join(body).strip():
+                sections.append(([title for _, title in path], "\n".join(body).strip()))
+            body = []
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+
+        if "\n".join(body).strip():
+            sections.append(([title for _, title in path], "\n".join(body).strip()))
+        return sections
+
+    def _units(self, body: str, budget: int) -> List[Tuple[str, str]]:
+        """(separator, text) units: paragraphs, or the sentences of paragraphs
+        over budget, or word runs of sentences over budget"""
+        units = []
+        for paragraph in PARAGRAPH_BREAK.split(body):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if self.tokens.count(paragraph) <= budget:
+                units.append(("\n\n", paragraph))
+                continue
+            separator = "\n\n"
+            for sentence in SENTENCE_END.split(paragraph):
+                pieces = [sentence] if self.tokens.count(sentence) <= budget else self._split_words(sentence, budget)
+                for piece in pieces:
+                    units.append((separator, piece))
+                    separator = " "
+        return units
+
+    def _split_words(self, sentence: str, budget: int) -> List[str]:
+        pieces, current = [], []
+        for word in sentence.split():
+            if current and self.tokens.count(" ".join(current + [word])) > budget:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def split(self, text: str, context: Optional[str] = None) -> List[str]:
+        """Chunk a text; a text within budget comes back unchanged as one chunk"""
+        if self.tokens.count(text) <= self.max_tokens:
+            return [text]
+
+        chunks = []
+        for path, body in self.sections(text):
+            header = "\n".join(f"{'#' * (i + 1)} {title}" for i, title in enumerate(path))
+            if context and not header:
+                header = context
+            budget = self.max_tokens - (self.tokens.count(f"{header}\n\n") if header else 0)
+            for chunk in self._pack(body, max(budget, 16)):
+                chunks.append(f"{header}\n\n{chunk}" if header and not chunk.startswith(header) else chunk)
+        return chunks
+
+    def _pack(self, body: str, budget: int) -> List[str]:
+        """Greedily pack units into chunks, carrying trailing units over as overlap"""
+        chunks = []
+        current: List[Tuple[str, str, int]] = []
+        current_tokens = 0
+
+        for separator, unit in self._units(body, budget):
+            unit_tokens = self.tokens.count(unit)
+            if current and current_tokens + unit_tokens > budget:
+                chunks.append(self._join(current))
+                overlap, overlap_tokens = [], 0
+                for item in reversed(current):
+                    tokens = item[2]
+                    if overlap_tokens + tokens > self.overlap_tokens or overlap_tokens + tokens + unit_tokens > budget:
+                        break
+                    overlap.insert(0, item)
+                    overlap_tokens += tokens
+                current, current_tokens = overlap, overlap_tokens
+            current.append((separator, unit, unit_tokens))
+            current_tokens += unit_tokens
+
+        if current:
+            chunks.append(self._join(current))
+        return chunks
+
+    @staticmethod
+    def _join(units: List[Tuple[str, str, int]]) -> str:
+        return "".join(separator + text for separator, text, _ in units)[len(units[0][0]):]
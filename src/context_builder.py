@@ -0,0 +1,201 @@
+"""
+Token-budgeted prompt context from retrieved documents
+"""
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.chunker import TokenCounter
+from src.retriever import RetrievedDocument
+
+
+FIELD_LINE = re.compile(r"^([A-Z][\w ]{0,30}):\s*(.*)$")
+PLACEHOLDER_VALUES = {'', 'n/a', 'na', 'none', 'null', 'nan', 'unknown', 'anonymous'}
+CHUNK_SUFFIX = re.compile(r"_chunk_\d+$")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=\S)")
+
+
+def strip_boilerplate(content: str, strip_fields: Iterable[str] = ()) -> str:
+    """Drop ``Label: value`` lines that carry no information
+
+    Removes fields listed in ``strip_fields``, fields whose value is a
+    placeholder ("N/A", "Unknown", ...) and section labels with no content
+    before the next label, then collapses runs of blank lines.
+    """
+    strip_fields = {field.lower() for field in strip_fields}
+    lines = content.split("\n")
+    kept = []
+    for i, line in enumerate(lines):
+        match = FIELD_LINE.match(line.strip())
+        if match:
+            label, value = match.group(1).lower(), match.group(2).strip()
+            if label in strip_fields:
+                continue
+            if value.lower() in PLACEHOLDER_VALUES:
+                following = next((later.strip() for later in lines[i + 1:] if later.strip()), None)
+                # "Description:" heads the lines below it unless they are empty or another field
+                if value or following is None or FIELD_LINE.match(following):
+                    continue
+        if not line.strip() and (not kept or not kept[-1].strip()):
+            continue
+        kept.append(line.rstrip())
+    return "\n".join(kept).strip()
+
+
+def source_key(doc: RetrievedDocument) -> str:
+    """Identity of the document a chunk was cut from"""
+    return CHUNK_SUFFIX.sub("", doc.doc_id)
+
+
+class ContextBuilder:
+    """Fit retrieved documents into a prompt token budget
+
+    Documents are taken in score order. Each is stripped of boilerplate
+    fields; sentences already included from another chunk of the same
+    source (the same product ``asin`` or the same review) are removed, and
+    a chunk with nothing new left is dropped. Sources are added whole while
+    they fit in ``max_tokens``; the first one that does not is truncated at
+    a sentence boundary if at least ``min_source_tokens`` remain, and every
+    lower-scoring source after it is dropped.
+    """
+
+    def __init__(self, max_tokens: int = 1500, min_source_tokens: int = 48,
+                 strip_fields: Iterable[str] = ('Reviewer',), dedupe: bool = True,
+                 token_counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.min_source_tokens = min_source_tokens
+        self.strip_fields = tuple(strip_fields)
+        self.dedupe = dedupe
+        self.tokens = token_counter or TokenCounter()
+
+        self._lock = threading.Lock()
+        self.stats = {'builds': 0, 'original_tokens': 0, 'context_tokens': 0, 'saved_tokens': 0,
+                      'sources_dropped': 0, 'sources_truncated': 0, 'duplicates_removed': 0}
+
+    @classmethod
+    def from_config(cls, context_config: Optional[Dict[str, Any]]) -> "ContextBuilder":
+        """Builder for the ``context:`` section of config.yaml"""
+        context_config = context_config or {}
+        return cls(
+            max_tokens=context_config.get('max_tokens', 1500),
+            min_source_tokens=context_config.get('min_source_tokens', 48),
+            strip_fields=context_config.get('strip_fields', ['Reviewer']),
+            dedupe=context_config.get('dedupe', True)
+        )
+
+    @staticmethod
+    def _header(position: int, doc: RetrievedDocument) -> str:
+        return f"[SOURCE {position} - {doc.doc_type.upper()}]"
+
+    def _new_content(self, content: str, seen: Set[str]) -> Optional[str]:
+        """Content without sentences in ``seen`` (updated); None if nothing new remains"""
+        lines = content.split("\n")
+        kept, new = [lines[0]], False
+        for line in lines[1:]:
+            sentences = [s for s in SENTENCE_SPLIT.split(line) if not s.strip() or " ".join(s.lower().split()) not in seen]
+            for sentence in sentences:
+                if sentence.strip():
+                    seen.add(" ".join(sentence.lower().split()))
+                    new = True
+            if sentences or not line.strip():
+                kept.append(" ".join(sentences))
+        return "\n".join(kept).strip() if new else None
+
+    def _truncate(self, content: str, budget: int) -> str:
+        """Longest prefix of whole sentences (or words) within ``budget`` tokens"""
+        pieces = re.split(r"(?<=[.!?\n])(?=\s)", content)
+        if len(pieces) == 1 or self.tokens.count(pieces[0]) > budget:
+            pieces = re.split(r"(?=\s)", content)
+
+        kept, used = [], 0
+        for piece in pieces:
+            tokens = self.tokens.count(piece)
+            if used + tokens > budget:
+                break
+            kept.append(piece)
+            used += tokens
+        text = "".join(kept).rstrip()
+        while text and self.tokens.count(text + " ...") > budget:
+            text = text.rsplit(None, 1)[0] if " " in text else ""
+        return text + " ..." if text else ""
+
+    def build(self, retrieved_docs: List[RetrievedDocument]) -> Tuple[str, List[dict], Dict[str, int]]:
+        """(context, sources, stats) for the documents, best-scoring first
+
+        ``sources`` lists only the documents that made it into the context,
+        numbered as in the context. ``stats`` compares the context's tokens
+        with those of every full document.
+        """
+        docs = sorted(retrieved_docs, key=lambda doc: doc.score, reverse=True)
+        original_tokens = sum(self.tokens.count(f"{self._header(i, doc)}\n{doc.content}\n")
+                              for i, doc in enumerate(docs, 1))
+
+        seen: Dict[str, Set[str]] = {}
+        seen_contents: Set[str] = set()
+        context_parts, sources = [], []
+        used = dropped = truncated = duplicates = 0
+        full = False
+
+        for doc in docs:
+            content = strip_boilerplate(doc.content, self.strip_fields)
+            normalized = " ".join(content.lower().split())
+            if self.dedupe:
+                new_content = self._new_content(content, seen.setdefault(source_key(doc), set()))
+                if new_content is None or normalized in seen_contents:
+                    duplicates += 1
+                    continue
+                content = new_content
+            seen_contents.add(normalized)
+            if full:
+                dropped += 1
+                continue
+
+            header = self._header(len(sources) + 1, doc)
+            block_tokens = self.tokens.count(f"{header}\n{content}\n")
+            if used + block_tokens > self.max_tokens:
+                remaining = self.max_tokens - used - self.tokens.count(f"{header}\n\n")
+                content = self._truncate(content, remaining) if remaining >= self.min_source_tokens else ""
+                # Later sources are still checked, so duplicates are not counted as dropped
+                full = True
+                if not content:
+                    dropped += 1
+                    continue
+                truncated += 1
+                block_tokens = self.tokens.count(f"{header}\n{content}\n")
+
+            context_parts.extend([header, content, ""])
+            used += block_tokens
+            sources.append({
+                'id': len(sources) + 1,
+                'type': doc.doc_type,
+                'score': doc.score,
+                'content_preview': doc.content[:200] + "..." if len(doc.content) > 200 else doc.content,
+                'metadata': doc.metadata
+            })
+
+        context = "\n".join(context_parts)
+        context_tokens = self.tokens.count(context) if context else 0
+        stats = {
+            'context_tokens': context_tokens,
+            'original_tokens': original_tokens,
+            'saved_tokens': max(original_tokens - context_tokens, 0),
+            'sources_dropped': dropped,
+            'sources_truncated': truncated,
+            'duplicates_removed': duplicates
+        }
+        with self._lock:
+            self.stats['builds'] += 1
+            for name, value in stats.items():
+                self.stats[name] += value
+        return context, sources, stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Totals since start, plus average tokens saved per context"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['avg_saved_tokens'] = round(stats['saved_tokens'] / stats['builds'], 1) if stats['builds'] else 0.0
+        stats['saved_pct'] = (round(stats['saved_tokens'] / stats['original_tokens'] * 100, 2)
+                              if stats['original_tokens'] else 0.0)
+        stats['max_tokens'] = self.max_tokens
+        stats['exact_token_counts'] = self.tokens.exact
+        return stats
@@ -1,12 +1,21 @@
 """
 Data processing pipeline for products, reviews, and policies
 """
+import hashlib
+import itertools
 import json
 import os
-from typing import List, Dict, Any
+import textwrap
+from collections import deque
+from multiprocessing import Pool
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from dataclasses import dataclass
 import yaml
 
+from src.chunker import Chunker
+from src.dedup import Deduplicator
+from src.metadata_index import parse_price
+
 
 @dataclass
 class Document:
@@ -21,39 +30,39 @@ class DataProcessor:
     """Process raw data into RAG-ready documents"""
     
     def __init__(self, config_path: str = "config/config.yaml"):
+        self.config_path = config_path
         with open(config_path, 'r') as f:
             self.config = yaml.safe_load(f)
         
         self.chunk_size = self.config['data']['chunk_size']
         self.chunk_overlap = self.config['data']['chunk_overlap']
+        
+        chunking = self.config['data'].get('chunking', {})
+        self.chunking_strategy = chunking.get('strategy', 'fixed')
+        self.chunker = Chunker(
+            max_tokens=chunking.get('max_tokens', 256),
+            overlap_tokens=chunking.get('overlap_tokens', 32)
+        ) if self.chunking_strategy == 'semantic' else None
+        self.deduplicator: Optional[Deduplicator] = None
     
-    def load_products(self, filepath: str, limit: int = None) -> List[Dict]:
-        """Load product metadata from JSON file"""
-        products = []
+    def iter_jsonl(self, filepath: str, limit: int = None) -> Iterator[Dict]:
+        """Stream records from a JSON-lines file, skipping malformed lines"""
         with open(filepath, 'r') as f:
             for i, line in enumerate(f):
                 if limit and i >= limit:
                     break
                 try:
-                    product = json.loads(line)
-                    products.append(product)
+                    yield json.loads(line)
                 except json.JSONDecodeError:
                     continue
-        return products
+    
+    def load_products(self, filepath: str, limit: int = None) -> List[Dict]:
+        """Load product metadata from JSON file"""
+        return list(self.iter_jsonl(filepath, limit))
     
     def load_reviews(self, filepath: str, limit: int = None) -> List[Dict]:
         """Load reviews from JSON file"""
-        reviews = []
-        with open(filepath, 'r') as f:
-            for i, line in enumerate(f):
-                if limit and i >= limit:
-                    break
-                try:
-                    review = json.loads(line)
-                    reviews.append(review)
-                except json.JSONDecodeError:
-                    continue
-        return reviews
+        return list(self.iter_jsonl(filepath, limit))
     
     def load_policies(self, directory: str) -> List[Dict]:
         """Load policy markdown files"""
@@ -114,8 +123,13 @@ Key Features:
             'title': title,
             'brand': brand,
             'price': price,
-            'category': category_text
+            'category': category_text,
+            'doc_type': 'product'
         }
+        # Numeric price for range filters; omitted when unparsable (Chroma rejects None)
+        price_value = parse_price(price)
+        if price_value is not None:
+            metadata['price_value'] = price_value
         
         return Document(
             content=content.strip(),
@@ -148,15 +162,30 @@ Review:
             'asin': asin,
             'rating': rating,
             'reviewer': reviewer,
-            'summary': summary
+            'summary': summary,
+            'doc_type': 'review'
         }
         
         return Document(
             content=content.strip(),
             metadata=metadata,
             doc_type='review',
-            doc_id=f"review_{asin}_{hash(text) % 10000}"
+            doc_id=self.review_id(review)
+        )
+    
+    @staticmethod
+    def review_id(review: Dict) -> str:
+        """Deterministic review id: a digest of who reviewed what, when, and the text
+        
+        Unlike the builtin ``hash`` this is identical across runs and processes,
+        so re-ingesting the same reviews yields the same ids.
+        """
+        identity = "\x1f".join(
+            str(review.get(field, ''))
+            for field in ('asin', 'reviewerID', 'unixReviewTime', 'reviewTime', 'reviewText')
         )
+        digest = hashlib.blake2b(identity.encode('utf-8'), digest_size=8).hexdigest()
+        return f"review_{review.get('asin', 'unknown')}_{digest}"
     
     def process_policy(self, policy: Dict) -> Document:
         """Convert policy to RAG document"""
@@ -178,7 +207,34 @@ Review:
         )
     
     def chunk_document(self, doc: Document) -> List[Document]:
-        """Split long documents into chunks"""
+        """Split long documents into chunks (``data.chunking.strategy``)"""
+        if self.chunker is not None:
+            return self._chunk_semantic(doc)
+        return self._chunk_fixed(doc)
+    
+    def _chunk_semantic(self, doc: Document) -> List[Document]:
+        """Token-budgeted chunks on heading, paragraph and sentence boundaries"""
+        # Repeat what the document is about on chunks that would lose it
+        context = doc.content.split("\n", 1)[0] if doc.doc_type in ('product', 'review') else None
+        texts = self.chunker.split(doc.content, context=context)
+        if len(texts) == 1:
+            return [doc]
+        
+        chunks = []
+        for chunk_id, chunk_text in enumerate(texts):
+            chunk_metadata = doc.metadata.copy()
+            chunk_metadata['chunk_id'] = chunk_id
+            chunk_metadata['is_chunk'] = True
+            chunks.append(Document(
+                content=chunk_text,
+                metadata=chunk_metadata,
+                doc_type=doc.doc_type,
+                doc_id=f"{doc.doc_id}_chunk_{chunk_id}"
+            ))
+        return chunks
+    
+    def _chunk_fixed(self, doc: Document) -> List[Document]:
+        """Fixed ``chunk_size`` character windows with ``chunk_overlap``"""
         content = doc.content
         
         # If document is short enough, return as is
@@ -212,56 +268,195 @@ Review:
         
         return chunks
     
-    def process_all(self, data_dir: str = "data/raw") -> List[Document]:
-        """Process all data sources"""
-        documents = []
+    def iter_documents(self, data_dir: str = "data/raw", workers: int = 1) -> Iterator[Document]:
+        """Stream processed and chunked documents from all data sources
         
-        print("Processing products...")
-        products = self.load_products(
-            os.path.join(data_dir, "products_50k.json"),
-            limit=self.config['data']['products_limit']
-        )
-        for product in products:
-            doc = self.process_product(product)
-            chunks = self.chunk_document(doc)
-            documents.extend(chunks)
-        print(f"  ✓ Processed {len(products)} products")
+        Raw records are read one line at a time and each chunk is yielded as
+        soon as it is produced, so memory stays flat regardless of corpus size.
+        With ``workers > 1`` products and reviews are split into byte-range
+        shards and processed in a process pool; shards are yielded back in
+        file order, so the output matches the serial path exactly.
         
-        print("Processing reviews...")
-        reviews = self.load_reviews(
-            os.path.join(data_dir, "reviews_100k.json"),
-            limit=self.config['data']['reviews_limit']
-        )
-        for review in reviews:
-            doc = self.process_review(review)
-            chunks = self.chunk_document(doc)
-            documents.extend(chunks)
-        print(f"  ✓ Processed {len(reviews)} reviews")
+        With ``data.dedup.enabled`` the stream passes through a Deduplicator
+        in this process, which keeps the first of any exact or near-duplicate
+        documents; its counts are in ``self.deduplicator.get_stats()``.
+        """
+        documents = self._iter_all_documents(data_dir, workers)
+        
+        dedup_config = self.config['data'].get('dedup', {})
+        if dedup_config.get('enabled', False):
+            self.deduplicator = Deduplicator.from_config(dedup_config)
+            documents = self.deduplicator.filter(documents)
+        
+        yield from documents
+    
+    def _iter_all_documents(self, data_dir: str, workers: int) -> Iterator[Document]:
+        """Products, reviews, then policies, before deduplication"""
+        sources = [
+            ('product', "products_50k.json", self.config['data']['products_limit']),
+            ('review', "reviews_100k.json", self.config['data']['reviews_limit']),
+        ]
+        
+        pool = Pool(workers, initializer=_init_worker, initargs=(self.config_path,)) if workers > 1 else None
+        try:
+            for kind, filename, limit in sources:
+                print(f"Processing {kind}s...")
+                filepath = os.path.join(data_dir, filename)
+                if pool is None:
+                    count = yield from self._iter_source(kind, filepath, limit)
+                else:
+                    count = yield from self._iter_source_parallel(pool, kind, filepath, limit, 2 * workers)
+                print(f"  ✓ Processed {count} {kind}s")
+        finally:
+            if pool is not None:
+                pool.terminate()
         
         print("Processing policies...")
         policies = self.load_policies(data_dir)
         for policy in policies:
-            doc = self.process_policy(policy)
-            chunks = self.chunk_document(doc)
-            documents.extend(chunks)
+            yield from self.chunk_document(self.process_policy(policy))
         print(f"  ✓ Processed {len(policies)} policies")
+    
+    def _process_record(self, kind: str, record: Dict) -> List[Document]:
+        """Process and chunk a single raw product or review"""
+        if kind == 'product':
+            return self.chunk_document(self.process_product(record))
+        return self.chunk_document(self.process_review(record))
+    
+    def _iter_source(self, kind: str, filepath: str, limit: Optional[int]):
+        """Serially stream chunks for one raw file; returns the record count"""
+        count = 0
+        for record in self.iter_jsonl(filepath, limit):
+            yield from self._process_record(kind, record)
+            count += 1
+        return count
+    
+    def _iter_source_parallel(self, pool: Pool, kind: str, filepath: str, limit: Optional[int],
+                              max_in_flight: int):
+        """Stream chunks for one raw file from a process pool; returns the record count
+        
+        At most ``max_in_flight`` shards are submitted ahead of the consumer,
+        so workers cannot run ahead and pile finished shards up in memory.
+        """
+        shard_bytes = self.config['data'].get('shard_bytes', 4 * 1024 * 1024)
+        shards = iter(shard_file(filepath, shard_bytes, limit))
         
-        return documents
+        count = 0
+        in_flight = deque(
+            pool.apply_async(_process_shard, ((kind, filepath, start, end),))
+            for start, end in itertools.islice(shards, max_in_flight)
+        )
+        while in_flight:
+            shard_count, docs = in_flight.popleft().get()
+            shard = next(shards, None)
+            if shard is not None:
+                in_flight.append(pool.apply_async(_process_shard, ((kind, filepath, *shard),)))
+            yield from docs
+            count += shard_count
+        return count
+    
+    def process_all(self, data_dir: str = "data/raw") -> List[Document]:
+        """Process all data sources"""
+        return list(self.iter_documents(data_dir))
+    
+    @staticmethod
+    def document_to_dict(doc: Document) -> Dict[str, Any]:
+        """Serialize a document to a plain dict"""
+        return {
+            'content': doc.content,
+            'metadata': doc.metadata,
+            'doc_type': doc.doc_type,
+            'doc_id': doc.doc_id
+        }
     
-    def save_processed_data(self, documents: List[Document], output_path: str):
-        """Save processed documents to JSON"""
-        data = []
-        for doc in documents:
-            data.append({
-                'content': doc.content,
-                'metadata': doc.metadata,
-                'doc_type': doc.doc_type,
-                'doc_id': doc.doc_id
-            })
+    def save_processed_data(self, documents: Iterable[Document], output_path: str) -> int:
+        """Save processed documents to JSON
         
+        Documents are written one at a time as they arrive, so a generator from
+        ``iter_documents`` is never materialized. The output is identical to a
+        single ``json.dump(..., indent=2)`` of the full list.
+        """
+        count = 0
         with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
-        print(f"✓ Saved {len(documents)} documents to {output_path}")
+            for doc in documents:
+                f.write("[\n" if count == 0 else ",\n")
+                f.write(textwrap.indent(json.dumps(self.document_to_dict(doc), indent=2), "  "))
+                count += 1
+            f.write("\n]" if count else "[]")
+        print(f"✓ Saved {count} documents to {output_path}")
+        return count
+
+
+def _line_offset(filepath: str, limit: Optional[int]) -> int:
+    """Byte offset just past the first ``limit`` lines of a file"""
+    size = os.path.getsize(filepath)
+    if not limit:
+        return size
+    
+    seen = 0
+    offset = 0
+    with open(filepath, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return size
+            newlines = block.count(b"\n")
+            if seen + newlines >= limit:
+                pos = -1
+                for _ in range(limit - seen):
+                    pos = block.index(b"\n", pos + 1)
+                return offset + pos + 1
+            seen += newlines
+            offset += len(block)
+
+
+def shard_file(filepath: str, shard_bytes: int, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split a JSON-lines file into (start, end) byte ranges aligned to line starts"""
+    end_offset = _line_offset(filepath, limit)
+    shards = []
+    
+    with open(filepath, 'rb') as f:
+        start = 0
+        while start < end_offset:
+            f.seek(min(start + shard_bytes, end_offset))
+            if f.tell() < end_offset:
+                f.readline()
+            end = min(f.tell(), end_offset)
+            shards.append((start, end))
+            start = end
+    
+    return shards
+
+
+_worker_processor: Optional[DataProcessor] = None
+
+
+def _init_worker(config_path: str):
+    """Pool initializer: build one DataProcessor per worker process"""
+    global _worker_processor
+    _worker_processor = DataProcessor(config_path)
+
+
+def _process_shard(task: Tuple[str, str, int, int]) -> Tuple[int, List[Document]]:
+    """Process every line in a byte range of a raw file (runs in a worker)"""
+    kind, filepath, start, end = task
+    count = 0
+    docs = []
+    
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            count += 1
+            docs.extend(_worker_processor._process_record(kind, record))
+    
+    return count, docs
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+"""
+Streaming exact and near-duplicate detection for processed documents
+"""
+import hashlib
+import re
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from src.data_processor import Document
+
+
+WHITESPACE = re.compile(r"\s+")
+REVIEW_BODY_MARKER = "\nReview:\n"
+
+
+def normalize(text: str) -> str:
+    return WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def dedup_scope(doc: "Document", cross_product: bool = False) -> str:
+    """Documents only duplicate others in the same scope: by default the same
+    product (``asin``), so identical short reviews of different products stay"""
+    return "" if cross_product else str(doc.metadata.get('asin', ''))
+
+
+def dedup_text(doc: "Document") -> str:
+    """Text that defines a duplicate: for reviews, the review body without the
+    per-review header (reviewer name, rating), so copied reviews match"""
+    if doc.doc_type == 'review' and REVIEW_BODY_MARKER in doc.content:
+        return doc.content.split(REVIEW_BODY_MARKER, 1)[1]
+    return doc.content
+
+
+class MinHashLSH:
+    """MinHash signatures over word shingles, bucketed by LSH bands
+
+    Each of ``num_perm`` hash functions is a multiply-shift hash of the
+    shingle's CRC32, so a signature is one vectorized min over a
+    (num_perm, shingles) matrix. Two texts share a band bucket with high
+    probability once their Jaccard similarity passes roughly
+    ``(1 / bands) ** (1 / rows)``; candidates are then confirmed against
+    the signature estimate and ``threshold``.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 5, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.offsets = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self.band_mixers = rng.integers(1, 2 ** 63, size=num_perm // bands, dtype=np.uint64) | np.uint64(1)
+
+        self.buckets: List[Dict[Tuple[str, int], int]] = [{} for _ in range(bands)]
+        self.signatures: List[np.ndarray] = []
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature, or None for texts shorter than one shingle"""
+        words = text.split()
+        if len(words) < self.shingle_size:
+            return None
+        shingles = {
+            zlib.crc32(" ".join(words[i:i + self.shingle_size]).encode('utf-8'))
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashed = (self.multipliers[:, None] * values[None, :] + self.offsets[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        bands = signature.reshape(self.bands, -1).astype(np.uint64)
+        return [int(key) for key in (bands * self.band_mixers).sum(axis=1)]
+
+    def insert_if_new(self, text: str, scope: str = "") -> bool:
+        """Add ``text`` unless it near-duplicates one already seen in ``scope``; True if added"""
+        signature = self.signature(text)
+        if signature is None:
+            return True
+
+        keys = [(scope, key) for key in self._band_keys(signature)]
+        checked = set()
+        for band, key in enumerate(keys):
+            match = self.buckets[band].get(key)
+            if match is None or match in checked:
+                continue
+            checked.add(match)
+            if np.mean(self.signatures[match] == signature) >= self.threshold:
+                return False
+
+        doc_index = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in enumerate(keys):
+            self.buckets[band].setdefault(key, doc_index)
+        return True
+
+
+class Deduplicator:
+    """Drop exact and near-duplicate documents from a document stream
+
+    Exact duplicates are caught by a digest of the normalized text for every
+    document type; near-duplicates by MinHash/LSH for the types listed in
+    ``near_doc_types``. Both only compare documents of the same product
+    unless ``cross_product`` is set. The first occurrence is kept, so the
+    output is deterministic and order-preserving.
+    """
+
+    def __init__(self, exact: bool = True, near_duplicates: bool = True,
+                 near_doc_types: Iterable[str] = ('review',), threshold: float = 0.8,
+                 num_perm: int = 64, bands: int = 16, shingle_size: int = 5,
+                 cross_product: bool = False):
+        self.exact = exact
+        self.cross_product = cross_product
+        self.near_doc_types = set(near_doc_types) if near_duplicates else set()
+        self.lsh = MinHashLSH(threshold, num_perm, bands, shingle_size) if self.near_doc_types else None
+
+        self.seen_digests = set()
+        self.stats = {'documents': 0, 'kept': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+
+    @classmethod
+    def from_config(cls, dedup_config: Dict[str, Any]) -> "Deduplicator":
+        """Build from the ``data.dedup`` section of config.yaml"""
+        return cls(
+            exact=dedup_config.get('exact', True),
+            near_duplicates=dedup_config.get('near_duplicates', True),
+            near_doc_types=dedup_config.get('near_doc_types', ['review']),
+            threshold=dedup_config.get('threshold', 0.8),
+            num_perm=dedup_config.get('num_perm', 64),
+            bands=dedup_config.get('bands', 16),
+            shingle_size=dedup_config.get('shingle_size', 5),
+            cross_product=dedup_config.get('cross_product', False)
+        )
+
+    def is_duplicate(self, doc: "Document") -> bool:
+        """Check a document and remember it if new"""
+        text = normalize(dedup_text(doc))
+        scope = dedup_scope(doc, self.cross_product)
+
+        if self.exact:
+            digest = hashlib.blake2b(f"{doc.doc_type}\x1f{scope}\x1f{text}".encode('utf-8'), digest_size=16).digest()
+            if digest in self.seen_digests:
+                self.stats['exact_duplicates'] += 1
+                return True
+            self.seen_digests.add(digest)
+
+        if doc.doc_type in self.near_doc_types and not self.lsh.insert_if_new(text, scope):
+            self.stats['near_duplicates'] += 1
+            return True
+
+        return False
+
+    def filter(self, documents: Iterable["Document"]) -> Iterator["Document"]:
+        """Yield only the documents that are not duplicates of earlier ones"""
+        for doc in documents:
+            self.stats['documents'] += 1
+            if not self.is_duplicate(doc):
+                self.stats['kept'] += 1
+                yield doc
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'collapsed': self.stats['exact_duplicates'] + self.stats['near_duplicates']}
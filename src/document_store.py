@@ -0,0 +1,243 @@
+"""
+Compact on-disk storage for processed documents
+"""
+import hashlib
+import json
+import mmap
+import os
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from src.data_processor import Document, DataProcessor
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Yield successive lists of at most ``batch_size`` items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def document_hash(doc: Document) -> str:
+    """Digest of what a vector store indexes for a document: content and metadata"""
+    payload = json.dumps(
+        {'content': doc.content, 'metadata': {**doc.metadata, 'doc_type': doc.doc_type}},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class DocumentStore:
+    """Append-friendly JSON-lines document store with an offsets index
+
+    A store is a directory with three files:
+
+    - ``documents.jsonl``: one compact JSON record per line
+    - ``documents.offsets``: native uint64 end offset of every record
+    - ``documents.ids``: the ``doc_id`` of every record, one per line
+
+    Records are read through a memory map, so iteration streams and lookup
+    by row or ``doc_id`` touches only the bytes of that record. The offsets
+    file is the source of truth: a torn write at the end of the data file is
+    never visible to readers.
+    """
+
+    DATA_FILE = "documents.jsonl"
+    OFFSETS_FILE = "documents.offsets"
+    IDS_FILE = "documents.ids"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.data_path = os.path.join(directory, self.DATA_FILE)
+        self.offsets_path = os.path.join(directory, self.OFFSETS_FILE)
+        self.ids_path = os.path.join(directory, self.IDS_FILE)
+
+        self._mmap: Optional[mmap.mmap] = None
+        self._offsets: Optional[array] = None
+        self._id_index: Optional[Dict[str, int]] = None
+
+    def exists(self) -> bool:
+        """Whether the store has been written"""
+        return os.path.exists(self.offsets_path)
+
+    def write(self, documents: Iterable[Document], append: bool = False) -> int:
+        """Write documents to the store, streaming; returns the number written"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.close()
+
+        if append and self.exists():
+            offset = self._truncate_to_committed()
+            mode = 'ab'
+        else:
+            offset = 0
+            mode = 'wb'
+        count = 0
+
+        with open(self.data_path, mode) as data_f, \
+                open(self.offsets_path, mode) as offsets_f, \
+                open(self.ids_path, mode) as ids_f:
+            for batch in iter_batches(documents, 1000):
+                ends = array('Q')
+                for doc in batch:
+                    record = json.dumps(
+                        DataProcessor.document_to_dict(doc),
+                        ensure_ascii=False,
+                        separators=(',', ':')
+                    ).encode('utf-8') + b"\n"
+                    data_f.write(record)
+                    offset += len(record)
+                    ends.append(offset)
+                    ids_f.write(doc.doc_id.encode('utf-8') + b"\n")
+                data_f.flush()
+                ids_f.flush()
+                # Offsets are written last: a batch is committed once its offsets land
+                offsets_f.write(ends.tobytes())
+                offsets_f.flush()
+                count += len(batch)
+
+        return count
+
+    def _truncate_to_committed(self) -> int:
+        """Drop any partially written tail left by an interrupted write
+
+        Returns the size of the data file covered by the offsets index.
+        """
+        itemsize = array('Q').itemsize
+        offsets = array('Q')
+        with open(self.offsets_path, 'r+b') as f:
+            raw = f.read()
+            rows = len(raw) // itemsize
+            offsets.frombytes(raw[:rows * itemsize])
+            f.truncate(rows * itemsize)
+
+        data_size = offsets[-1] if rows else 0
+        with open(self.data_path, 'r+b') as f:
+            f.truncate(data_size)
+
+        with open(self.ids_path, 'r+b') as f:
+            for _ in range(rows):
+                f.readline()
+            f.truncate(f.tell())
+
+        return data_size
+
+    def _open(self):
+        """Map the data file and load the offsets index"""
+        if self._offsets is not None:
+            return
+
+        self._offsets = array('Q')
+        with open(self.offsets_path, 'rb') as f:
+            self._offsets.frombytes(f.read())
+
+        if self._offsets and self._offsets[-1] > 0:
+            with open(self.data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Release the memory map and cached indexes"""
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._offsets = None
+        self._id_index = None
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._offsets)
+
+    def __getitem__(self, row: int) -> Document:
+        """Load the document stored at ``row``"""
+        self._open()
+        if row < 0:
+            row += len(self._offsets)
+        start = self._offsets[row - 1] if row > 0 else 0
+        item = json.loads(self._mmap[start:self._offsets[row]])
+        return Document(**item)
+
+    def __iter__(self) -> Iterator[Document]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        """Look up a document by ``doc_id``"""
+        if self._id_index is None:
+            self._id_index = {}
+            with open(self.ids_path, 'r', encoding='utf-8') as f:
+                for row, line in enumerate(islice(f, len(self))):
+                    self._id_index[line.rstrip("\n")] = row
+
+        row = self._id_index.get(doc_id)
+        return self[row] if row is not None else None
+
+
+def iter_legacy_json(filepath: str, read_size: int = 1024 * 1024) -> Iterator[Document]:
+    """Stream documents out of a legacy ``documents.json`` array without loading it whole
+
+    Raises ValueError with the byte offset if the file is not a JSON array,
+    has a malformed item, or ends before the array is closed, so a broken
+    file never converts into a silently partial store.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    offset = 0  # bytes of the file before buffer[0]
+    expect = "["  # "[" -> "item" -> "," -> "item" ... -> "end"
+    eof = False
+
+    def here() -> int:
+        return offset + len(buffer[:pos].encode('utf-8'))
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+
+            if pos < len(buffer):
+                char = buffer[pos]
+                if expect == "[":
+                    if char != "[":
+                        raise ValueError(f"{filepath}: expected a JSON array at byte {here()}")
+                    expect, pos = "first", pos + 1
+                    continue
+                if expect == "end":
+                    raise ValueError(f"{filepath}: unexpected data after the array at byte {here()}")
+                if char == "]" and expect in ("first", ","):
+                    expect, pos = "end", pos + 1
+                    continue
+                if expect == ",":
+                    if char != ",":
+                        raise ValueError(f"{filepath}: expected ',' or ']' at byte {here()}")
+                    expect, pos = "item", pos + 1
+                    continue
+
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    # Usually an item cut by the read boundary; at EOF it is broken
+                    if eof:
+                        raise ValueError(f"{filepath}: malformed or truncated document at byte {here()}")
+                else:
+                    expect = ","
+                    yield Document(**item)
+                    continue
+            elif eof:
+                if expect != "end":
+                    raise ValueError(f"{filepath}: ends at byte {here()} before the array is closed")
+                return
+
+            chunk = f.read(read_size)
+            offset = here()
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+
+
+def convert_legacy_json(json_path: str, directory: str) -> int:
+    """Convert a legacy ``documents.json`` into a DocumentStore"""
+    return DocumentStore(directory).write(iter_legacy_json(json_path))
@@ -0,0 +1,197 @@
+"""
+Embedding backends: the OpenAI API and an offline feature-hashing vectorizer
+"""
+import asyncio
+import base64
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Tuple, Type
+
+import numpy as np
+from openai import (APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, OpenAI,
+                    RateLimitError)
+
+from src.http_client import get_http_clients
+
+
+class EmbeddingBackend:
+    """Base class for embedding providers
+
+    ``name`` identifies the vectors a backend produces (it namespaces the
+    embedding cache). ``remote`` backends are called through the concurrent
+    scheduler and cached; local ones are called directly.
+    """
+
+    remote = True
+    rate_limit_errors: Tuple[Type[BaseException], ...] = ()
+    transient_errors: Tuple[Type[BaseException], ...] = ()
+
+    def __init__(self, name: str, dimension: int):
+        self.name = name
+        self.dimension = dimension
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of texts"""
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch without blocking the event loop"""
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI (or OpenAI-compatible) embeddings API"""
+
+    rate_limit_errors = (RateLimitError,)
+    transient_errors = (APIConnectionError, APITimeoutError, InternalServerError)
+
+    def __init__(self, model: str, dimension: int, base_url: str = None,
+                 http_config: Dict[str, Any] = None, timeout_seconds: float = 30):
+        super().__init__(model, dimension)
+        self.model = model
+        # Connection pools are shared with the LLM clients (src/http_client.py)
+        http = get_http_clients(http_config)
+        # Retries (429s, timeouts, connection errors, 5xx) are left to the
+        # scheduler so 429s also throttle concurrency
+        self.client = OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=base_url,
+            max_retries=0,
+            timeout=http.timeout(timeout_seconds),
+            http_client=http.client
+        )
+        # Query-time requests are single inputs outside the scheduler, so the
+        # async client keeps the SDK's own retries with Retry-After backoff
+        self.async_client = AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=base_url,
+            timeout=http.timeout(timeout_seconds),
+            http_client=http.async_client
+        )
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Single embeddings API request
+
+        Vectors are requested base64-encoded: the payload is several times
+        smaller than JSON floats and decodes without per-float parsing.
+        """
+        response = self.client.embeddings.create(
+            model=self.model,
+            input=texts,
+            encoding_format="base64"
+        )
+        return self._decode(response)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Single embeddings API request on the async client"""
+        response = await self.async_client.embeddings.create(
+            model=self.model,
+            input=texts,
+            encoding_format="base64"
+        )
+        return self._decode(response)
+
+    @staticmethod
+    def _decode(response) -> List[List[float]]:
+        embeddings = []
+        for item in sorted(response.data, key=lambda item: item.index):
+            if isinstance(item.embedding, str):
+                embeddings.append(np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32).tolist())
+            else:
+                embeddings.append(item.embedding)
+        return embeddings
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Deterministic local embeddings via signed feature hashing
+
+    Each text is turned into word unigrams, word bigrams and character
+    n-grams of every word; features are hashed with CRC32 into
+    ``dimension`` buckets with a hash-derived sign, and rows are
+    L2-normalized so cosine similarity behaves like TF overlap. A batch is
+    accumulated into one matrix with a single ``np.bincount``. No network,
+    no model files, and identical output on every machine, which makes it
+    suitable for offline benchmarks and load tests rather than answer
+    quality.
+    """
+
+    remote = False
+    TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+    def __init__(self, dimension: int, char_ngram: int = 3, word_weight: float = 1.0,
+                 bigram_weight: float = 0.5, char_weight: float = 0.25):
+        super().__init__(f"hashing-{dimension}-c{char_ngram}", dimension)
+        self.char_ngram = char_ngram
+        self.weights = (word_weight, bigram_weight, char_weight)
+
+    def _features(self, text: str) -> Tuple[List[bytes], List[float]]:
+        """Hashable features of one text and their weights"""
+        words = self.TOKEN_PATTERN.findall(text.lower())
+        word_weight, bigram_weight, char_weight = self.weights
+        n = self.char_ngram
+
+        features = [w.encode() for w in words]
+        weights = [word_weight] * len(words)
+
+        bigrams = [f"{a} {b}".encode() for a, b in zip(words, words[1:])]
+        features += bigrams
+        weights += [bigram_weight] * len(bigrams)
+
+        for word in words:
+            padded = f"<{word}>"
+            grams = [f"#{padded[i:i + n]}".encode() for i in range(max(1, len(padded) - n + 1))]
+            features += grams
+            weights += [char_weight] * len(grams)
+
+        return features, weights
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch into a (len(texts), dimension) float32 matrix"""
+        rows, hashes, weights = [], [], []
+        for row, text in enumerate(texts):
+            features, feature_weights = self._features(text)
+            rows.extend([row] * len(features))
+            hashes.extend(zlib.crc32(feature) for feature in features)
+            weights.extend(feature_weights)
+
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        flat = np.asarray(rows, dtype=np.int64) * self.dimension + (hashes % self.dimension).astype(np.int64)
+
+        matrix = np.bincount(
+            flat,
+            weights=signs * np.asarray(weights, dtype=np.float64),
+            minlength=len(texts) * self.dimension
+        ).reshape(len(texts), self.dimension).astype(np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        # A query takes well under a millisecond; a thread hop would cost more
+        return self.embed(texts)
+
+
+def create_embedding_backend(embeddings_config: Dict[str, Any],
+                             http_config: Dict[str, Any] = None) -> EmbeddingBackend:
+    """Build the backend named by ``embeddings.backend`` in config.yaml"""
+    backend = embeddings_config.get('backend', 'openai')
+    dimension = embeddings_config['dimension']
+
+    if backend == 'openai':
+        return OpenAIEmbeddingBackend(
+            embeddings_config['model'],
+            dimension,
+            base_url=embeddings_config.get('base_url'),
+            http_config=http_config,
+            timeout_seconds=embeddings_config.get('timeout_seconds', 30)
+        )
+    if backend == 'hashing':
+        options = embeddings_config.get('hashing', {})
+        return HashingEmbeddingBackend(dimension, **options)
+
+    raise ValueError(f"Unknown embeddings backend: {backend}")
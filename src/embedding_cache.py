@@ -0,0 +1,335 @@
+"""
+Persistent content-addressed cache for embeddings
+"""
+import asyncio
+import fcntl
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing so trivial whitespace changes still hit"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model, hash of normalized text)
+
+    Each model gets its own directory holding:
+
+    - ``vectors.f32``: a contiguous float32 matrix, one row per entry,
+      read through a memory map
+    - ``keys.bin``: the 16-byte digest of every row, in row order
+
+    The digest -> row index is rebuilt from ``keys.bin`` on startup and
+    extended with rows other processes have committed since. Appends take
+    an exclusive ``flock`` on ``.lock``, write the vector first and the key
+    second, and number rows by the size of ``vectors.f32``; a tail left by
+    an interrupted writer is truncated under the same lock.
+    """
+
+    KEY_SIZE = 16
+
+    def __init__(self, directory: str, model: str, dimension: int):
+        self.model = model
+        self.dimension = dimension
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.lock_path = os.path.join(self.directory, ".lock")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process appending to this cache"""
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Drop any uncommitted tail and build the digest index"""
+        with self._file_lock():
+            self._truncate_tail()
+        self._refresh()
+
+    def _truncate_tail(self) -> int:
+        """Cut both files back to their committed rows; call with the file lock held"""
+        row_bytes = self.dimension * 4
+        with open(self.vectors_path, 'ab') as vectors, open(self.keys_path, 'ab') as keys:
+            rows = min(os.fstat(keys.fileno()).st_size // self.KEY_SIZE,
+                       os.fstat(vectors.fileno()).st_size // row_bytes)
+            keys.truncate(rows * self.KEY_SIZE)
+            vectors.truncate(rows * row_bytes)
+        return rows
+
+    def _refresh(self):
+        """Index keys committed (by any process) since the last refresh"""
+        try:
+            if os.path.getsize(self.keys_path) < (self._rows + 1) * self.KEY_SIZE:
+                return
+            with open(self.keys_path, 'rb') as f:
+                f.seek(self._rows * self.KEY_SIZE)
+                keys = f.read()
+        except FileNotFoundError:
+            return
+
+        # A key is written after its vector, so every whole key has its row
+        for offset in range(len(keys) // self.KEY_SIZE):
+            key = keys[offset * self.KEY_SIZE:(offset + 1) * self.KEY_SIZE]
+            self._index.setdefault(key, self._rows + offset)
+        self._rows += len(keys) // self.KEY_SIZE
+
+    def _matrix(self) -> Optional[np.memmap]:
+        """Memory-map the vectors file, remapping if it has grown"""
+        if self._rows == 0:
+            return None
+        if self._vectors is None or self._vectors.shape[0] != self._rows:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode='r', shape=(self._rows, self.dimension)
+            )
+        return self._vectors
+
+    def key(self, text: str) -> bytes:
+        """Content address of ``text`` for this model"""
+        payload = f"{self.model}\0{normalize_text(text)}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=self.KEY_SIZE).digest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings; missing entries are returned as None"""
+        with self._lock:
+            self._refresh()
+            rows = [self._index.get(self.key(text)) for text in texts]
+            matrix = self._matrix()
+            results = [np.array(matrix[row]) if row is not None else None for row in rows]
+
+            found = sum(1 for row in rows if row is not None)
+            self.hits += found
+            self.misses += len(rows) - found
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Persist embeddings for texts not already cached"""
+        with self._lock:
+            self._refresh()
+            new_keys = {}
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key not in self._index:
+                    new_keys.setdefault(key, vector)
+
+            if not new_keys:
+                return
+
+            matrix = np.asarray(list(new_keys.values()), dtype=np.float32)
+            if matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {matrix.shape[1]} does not match "
+                    f"configured dimension {self.dimension}"
+                )
+
+            with self._file_lock():
+                self._truncate_tail()
+                # Another process may have appended the same texts meanwhile
+                self._refresh()
+                new_keys = {key: row for key, row in zip(new_keys, matrix) if key not in self._index}
+                if not new_keys:
+                    return
+
+                with open(self.vectors_path, 'ab') as f:
+                    start = os.fstat(f.fileno()).st_size // (self.dimension * 4)
+                    f.write(np.asarray(list(new_keys.values()), dtype=np.float32).tobytes())
+                with open(self.keys_path, 'ab') as f:
+                    f.write(b"".join(new_keys))
+
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start + offset
+            self._rows = start + len(new_keys)
+
+    def get_stats(self) -> Dict[str, object]:
+        """Hit/miss counters and size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model,
+            'entries': self._rows,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate_pct': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            'size_mb': round(self._rows * self.dimension * 4 / (1024 * 1024), 2)
+        }
+
+
+class _Flight:
+    """An upstream call that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class QueryEmbeddingCache:
+    """In-process LRU cache with TTL for query embeddings
+
+    Concurrent misses for the same (normalized) query are coalesced: the
+    first caller computes the embedding while the others wait on its
+    result, so a burst of identical questions costs one upstream call.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, _Flight] = {}
+        self._async_in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'upstream_calls': 0,
+            'evictions': 0
+        }
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        """Fresh cached value for ``key``; call with the lock held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+        del self._entries[key]
+        return None
+
+    def _store(self, key: str, value: List[float]):
+        """Insert a computed value, evicting the least recently used; call with the lock held"""
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached embedding for ``text`` or compute it once"""
+        key = normalize_text(text)
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._in_flight[key] = flight
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute(text)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                self.stats['upstream_calls'] += 1
+                if flight.error is None:
+                    self._store(key, flight.value)
+            flight.done.set()
+
+        return flight.value
+
+    async def aget_or_compute(self, text: str, compute: Callable[[str], Awaitable[List[float]]]) -> List[float]:
+        """Async ``get_or_compute``: concurrent misses await one ``compute`` task
+
+        The task is shared and shielded, so a caller that is cancelled (for
+        example by a deadline) stops waiting without cancelling it for others.
+        """
+        key = normalize_text(text)
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+
+            task = self._async_in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(compute(text))
+                self._async_in_flight[key] = task
+                task.add_done_callback(lambda done: self._finish_async(key, done))
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key: str, task: "asyncio.Future"):
+        """Cache a finished ``compute`` task's result and retire it from the in-flight table"""
+        with self._lock:
+            if self._async_in_flight.get(key) is task:
+                del self._async_in_flight[key]
+            self.stats['upstream_calls'] += 1
+            # exception() also marks a failure retrieved when nobody waited for it
+            if not task.cancelled() and task.exception() is None:
+                self._store(key, task.result())
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached embeddings in input order, None for misses"""
+        with self._lock:
+            values = [self._lookup(normalize_text(text)) for text in texts]
+            self.stats['misses'] += sum(value is None for value in values)
+        return values
+
+    def put_many(self, texts: Sequence[str], values: Sequence[List[float]]):
+        """Store embeddings computed outside ``get_or_compute`` (e.g. one batched call)"""
+        with self._lock:
+            for text, value in zip(texts, values):
+                self._store(normalize_text(text), value)
+            self.stats['upstream_calls'] += 1
+
+    def clear(self):
+        """Drop all cached query embeddings"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and upstream calls saved"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['upstream_calls_saved'] = stats['hits'] + stats['coalesced']
+        stats['hit_rate_pct'] = round(stats['upstream_calls_saved'] / lookups * 100, 2) if lookups else 0.0
+        return stats
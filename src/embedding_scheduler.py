@@ -0,0 +1,206 @@
+"""
+Concurrent, rate-limit-aware scheduling of embedding requests
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class RateLimited(Exception):
+    """Raised by an embed function when the provider answers 429"""
+
+    def __init__(self, message: str = "rate limited", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _AdaptiveLimit:
+    """Concurrency limit that halves on rate limiting and creeps back up on success"""
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = maximum
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited: bool = False, failed: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            elif not failed:
+                self._successes += 1
+                if self.limit < self.maximum and self._successes >= self.limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class EmbeddingScheduler:
+    """Run embedding requests concurrently with token-aware batch packing
+
+    Texts are packed into batches bounded by both item count and estimated
+    tokens, and batches are sent from a thread pool. A 429 (``RateLimited``
+    or any exception type listed in ``rate_limit_errors``) backs the batch
+    off exponentially, honouring Retry-After, and halves the effective
+    concurrency until requests succeed again. Transient failures listed in
+    ``transient_errors`` (timeouts, dropped connections, 5xx) are retried
+    with the same backoff but leave the concurrency alone. Results are
+    always returned in input order.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        concurrency: int = 4,
+        max_batch_size: int = 100,
+        max_batch_tokens: int = 100000,
+        max_retries: int = 6,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        rate_limit_errors: Tuple[Type[BaseException], ...] = (),
+        transient_errors: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.embed_fn = embed_fn
+        self.concurrency = max(1, concurrency)
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.rate_limit_errors = (RateLimited,) + tuple(rate_limit_errors)
+        self.transient_errors = tuple(transient_errors)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'texts': 0,
+            'estimated_tokens': 0,
+            'rate_limited': 0,
+            'transient_errors': 0,
+            'elapsed_s': 0.0
+        }
+
+    def pack_batches(self, texts: Sequence[str], max_batch_size: Optional[int] = None) -> List[List[int]]:
+        """Group text indices into batches bounded by size and estimated tokens"""
+        max_size = min(max_batch_size or self.max_batch_size, self.max_batch_size)
+        batches = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= max_size or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def run(self, texts: Sequence[str], max_batch_size: Optional[int] = None) -> List[List[float]]:
+        """Embed ``texts`` and return vectors in the same order"""
+        if not texts:
+            return []
+
+        start_time = time.time()
+        batches = self.pack_batches(texts, max_batch_size)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        limit = _AdaptiveLimit(self.concurrency)
+
+        def run_batch(indices: List[int]):
+            batch = [texts[i] for i in indices]
+            vectors = self._call_with_backoff(batch, limit)
+            for i, vector in zip(indices, vectors):
+                results[i] = vector
+
+        if len(batches) == 1 or self.concurrency == 1:
+            for indices in batches:
+                run_batch(indices)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+                # list() re-raises the first failure
+                list(executor.map(run_batch, batches))
+
+        with self._stats_lock:
+            self.stats['texts'] += len(texts)
+            self.stats['estimated_tokens'] += sum(estimate_tokens(text) for text in texts)
+            self.stats['elapsed_s'] += time.time() - start_time
+        return results
+
+    def _call_with_backoff(self, batch: List[str], limit: _AdaptiveLimit) -> List[List[float]]:
+        """Send one batch, retrying with exponential backoff on rate limits and transient errors"""
+        for attempt in range(self.max_retries + 1):
+            limit.acquire()
+            try:
+                with self._stats_lock:
+                    self.stats['requests'] += 1
+                vectors = self.embed_fn(batch)
+            except self.rate_limit_errors as e:
+                limit.release(rate_limited=True)
+                with self._stats_lock:
+                    self.stats['rate_limited'] += 1
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+                continue
+            except self.transient_errors as e:
+                limit.release(failed=True)
+                with self._stats_lock:
+                    self.stats['transient_errors'] += 1
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                limit.release(failed=True)
+                raise
+            limit.release()
+
+            if len(vectors) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+            return vectors
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait before retrying, preferring the server's Retry-After"""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is None:
+            response = getattr(error, 'response', None)
+            headers = getattr(response, 'headers', None) or {}
+            try:
+                retry_after = float(headers.get('retry-after'))
+            except (TypeError, ValueError):
+                retry_after = None
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+
+        delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request counters and throughput"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        elapsed = stats['elapsed_s']
+        stats['texts_per_s'] = round(stats['texts'] / elapsed, 1) if elapsed else 0.0
+        stats['tokens_per_s'] = round(stats['estimated_tokens'] / elapsed, 1) if elapsed else 0.0
+        stats['elapsed_s'] = round(elapsed, 2)
+        return stats
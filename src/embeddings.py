@@ -1,47 +1,143 @@
 """
 Embedding generation for documents and queries
 """
-import os
-from typing import List
-from openai import OpenAI
+import asyncio
+from typing import List, Dict, Any, Optional, Sequence
 import yaml
 from dotenv import load_dotenv
 
+from src.embedding_backends import create_embedding_backend
+from src.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from src.embedding_scheduler import EmbeddingScheduler
+
 load_dotenv()
 
 
 class EmbeddingGenerator:
-    """Generate embeddings using OpenAI API"""
+    """Generate embeddings with the backend configured under ``embeddings:``"""
     
     def __init__(self, config_path: str = "config/config.yaml"):
         with open(config_path, 'r') as f:
             self.config = yaml.safe_load(f)
         
-        self.model = self.config['embeddings']['model']
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.backend = create_embedding_backend(self.config['embeddings'], self.config.get('http'))
+        self.model = self.backend.name
+        
+        # Concurrent, token-aware batching with 429 and transient-error backoff
+        batching = self.config['embeddings'].get('batching', {})
+        self.scheduler = EmbeddingScheduler(
+            self.backend.embed,
+            concurrency=batching.get('concurrency', 4),
+            max_batch_size=batching.get('max_batch_size', 100),
+            max_batch_tokens=batching.get('max_batch_tokens', 100000),
+            max_retries=batching.get('max_retries', 6),
+            rate_limit_errors=self.backend.rate_limit_errors,
+            transient_errors=self.backend.transient_errors
+        )
+        
+        # Persistent embedding cache, so unchanged texts are never re-embedded.
+        # Local backends are cheaper to recompute than to look up.
+        cache_config = self.config['embeddings'].get('cache', {})
+        self.cache = None
+        if cache_config.get('enabled', False) and self.backend.remote:
+            self.cache = EmbeddingCache(
+                cache_config.get('directory', '.cache/embeddings'),
+                self.model,
+                self.backend.dimension
+            )
+        
+        # Bounded in-memory LRU for query embeddings, with single-flight
+        query_cache_config = self.config['embeddings'].get('query_cache', {})
+        self.query_cache = None
+        if query_cache_config.get('enabled', True):
+            self.query_cache = QueryEmbeddingCache(
+                max_size=query_cache_config.get('max_size', 10000),
+                ttl_seconds=query_cache_config.get('ttl_seconds', 3600)
+            )
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query
+        
+        Queries go through the in-memory query cache only; they are not
+        written to the persistent document embedding cache.
+        """
+        if self.query_cache is None:
+            return self._embed_uncached([query], None)[0]
+        return self.query_cache.get_or_compute(query, lambda text: self._embed_uncached([text], None)[0])
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """Embed a search query without blocking the event loop"""
+        if self.query_cache is None:
+            return await self._aembed_one(query)
+        return await self.query_cache.aget_or_compute(query, self._aembed_one)
+    
+    async def _aembed_one(self, text: str) -> List[float]:
+        return (await self.backend.aembed([text]))[0]
+    
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """Embed many search queries at once
+        
+        Query cache misses go out as batched requests through the scheduler
+        instead of one request per query.
+        """
+        if self.query_cache is None:
+            return self._embed_uncached(list(queries), None)
+        
+        embeddings = self.query_cache.get_many(queries)
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, embeddings) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, self._embed_uncached(missing, None)))
+            self.query_cache.put_many(missing, [fresh[query] for query in missing])
+            embeddings = [vector if vector is not None else fresh[query] for query, vector in zip(queries, embeddings)]
+        return embeddings
+    
+    async def aembed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """``embed_queries`` on a worker thread (the scheduler batches and retries there)"""
+        return await asyncio.to_thread(self.embed_queries, queries)
     
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=text
-        )
-        return response.data[0].embedding
+        return self.generate_embeddings_batch([text])[0]
     
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
-        """Generate embeddings for multiple texts in batches"""
-        embeddings = []
+    def generate_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Generate embeddings for multiple texts in batches
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=batch
-            )
-            batch_embeddings = [item.embedding for item in response.data]
-            embeddings.extend(batch_embeddings)
+        With the cache enabled only texts that miss are sent to the API.
+        Batches are packed by item count and estimated tokens (capped by
+        ``batch_size`` if given) and sent concurrently.
+        """
+        if self.cache is None:
+            return self._embed_uncached(texts, batch_size)
+        
+        cached = self.cache.get_many(texts)
+        embeddings: List[List[float]] = [
+            vector.tolist() if vector is not None else None for vector in cached
+        ]
+        
+        # Embed each distinct missing text once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, self._embed_uncached(missing, batch_size)))
+            self.cache.put_many(missing, [fresh[text] for text in missing])
+            for i, text in enumerate(texts):
+                if embeddings[i] is None:
+                    embeddings[i] = fresh[text]
         
         return embeddings
+    
+    def _embed_uncached(self, texts: List[str], batch_size: Optional[int]) -> List[List[float]]:
+        """Embed every text with the backend, remote batches running concurrently"""
+        if not self.backend.remote:
+            return self.backend.embed(texts)
+        return self.scheduler.run(texts, max_batch_size=batch_size)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Embedding cache counters, or None when caching is disabled"""
+        return self.cache.get_stats() if self.cache else None
+    
+    def get_query_cache_stats(self) -> Dict[str, Any]:
+        """Query embedding cache counters, or None when disabled"""
+        return self.query_cache.get_stats() if self.query_cache else None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,242 @@
+"""
+Shared HTTP connection pools for the OpenAI-compatible API clients
+"""
+import importlib.util
+import threading
+from typing import Any, Callable, Dict, Optional
+
+try:
+    # Newer openai SDKs are built on the httpx2 fork; handing them the same
+    # client type keeps them on their native (faster) connection pool
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``pip install httpx[http2]``)"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class PoolStats:
+    """Request and connection counters for one connection pool
+
+    ``connections_opened`` against ``requests`` shows how often a request
+    paid for a TCP connect (and TLS handshake) instead of reusing a
+    keep-alive connection. ``in_flight`` counts requests from send until
+    their response body is closed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'connections_opened': 0, 'tls_handshakes': 0,
+                         'in_flight': 0, 'max_in_flight': 0, 'errors': 0}
+
+    def started(self):
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters['in_flight'] += 1
+            self.counters['max_in_flight'] = max(self.counters['max_in_flight'], self.counters['in_flight'])
+
+    def finished(self, error: bool = False):
+        with self._lock:
+            self.counters['in_flight'] -= 1
+            self.counters['errors'] += error
+
+    def traced(self, event: str):
+        """Count httpcore trace events that mean a new connection"""
+        if event.endswith("connect_tcp.complete"):
+            with self._lock:
+                self.counters['connections_opened'] += 1
+        elif event.endswith("start_tls.complete"):
+            with self._lock:
+                self.counters['tls_handshakes'] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class _AsyncTrackedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class _TrackedTransport(httpx.HTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions = {**request.extensions, 'trace': lambda event, info: self.stats.traced(event)}
+        self.stats.started()
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            self.stats.finished(error=True)
+            raise
+        response.stream = _TrackedStream(response.stream, self.stats.finished)
+        return response
+
+
+class _AsyncTrackedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async def trace(event, info):
+            self.stats.traced(event)
+
+        request.extensions = {**request.extensions, 'trace': trace}
+        self.stats.started()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            self.stats.finished(error=True)
+            raise
+        response.stream = _AsyncTrackedStream(response.stream, self.stats.finished)
+        return response
+
+
+def _pool_connections(transport) -> Dict[str, int]:
+    """Open and idle connection counts of a transport's httpcore pool"""
+    connections = list(getattr(getattr(transport, '_pool', None), 'connections', []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {'open_connections': len(connections), 'idle_connections': idle}
+
+
+class HTTPClients:
+    """One sync and one async ``httpx`` client sharing pool settings
+
+    Built from the ``http:`` section of config.yaml. Keep-alive connections
+    are kept up to ``max_keepalive_connections`` (default: the whole pool),
+    so a burst at the configured concurrency reuses its connections instead
+    of reconnecting. HTTP/2 is used when enabled and ``h2`` is installed.
+    Read timeouts are set per API client via ``timeout``.
+    """
+
+    def __init__(self, http_config: Optional[Dict[str, Any]] = None):
+        http_config = http_config or {}
+        max_connections = http_config.get('max_connections', 100)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=http_config.get('max_keepalive_connections') or max_connections,
+            keepalive_expiry=http_config.get('keepalive_expiry_seconds', 30)
+        )
+        self.connect_timeout = http_config.get('connect_timeout_seconds', 5)
+        self.pool_timeout = http_config.get('pool_timeout_seconds', 10)
+        http2 = http_config.get('http2', 'auto')
+        self.http2 = http2_available() if http2 == 'auto' else bool(http2)
+
+        self.sync_stats = PoolStats()
+        self.async_stats = PoolStats()
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def timeout(self, read_seconds: float) -> httpx.Timeout:
+        """Timeout for one kind of API call, sharing the pool's connect and pool limits"""
+        return httpx.Timeout(read_seconds, connect=self.connect_timeout, pool=self.pool_timeout)
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                transport = _TrackedTransport(self.sync_stats, limits=self.limits, http2=self.http2)
+                self._client = httpx.Client(transport=transport, timeout=self.timeout(60), follow_redirects=True)
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_client is None:
+                transport = _AsyncTrackedTransport(self.async_stats, limits=self.limits, http2=self.http2)
+                self._async_client = httpx.AsyncClient(
+                    transport=transport, timeout=self.timeout(60), follow_redirects=True
+                )
+            return self._async_client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool limits plus request, connection and utilisation counters per client"""
+        stats = {
+            'max_connections': self.limits.max_connections,
+            'max_keepalive_connections': self.limits.max_keepalive_connections,
+            'http2': self.http2
+        }
+        for name, stats_source, client in (('sync', self.sync_stats, self._client),
+                                           ('async', self.async_stats, self._async_client)):
+            if client is None:
+                continue
+            counters = stats_source.snapshot()
+            counters.update(_pool_connections(client._transport))
+            counters['utilisation_pct'] = round(counters['in_flight'] / self.limits.max_connections * 100, 2)
+            counters['connection_reuse_pct'] = round(
+                (1 - counters['connections_opened'] / counters['requests']) * 100, 2
+            ) if counters['requests'] else 0.0
+            stats[name] = counters
+        return stats
+
+    def close(self):
+        """Close the sync client; the async one is closed with its event loop"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+_shared: Dict[tuple, HTTPClients] = {}
+_shared_lock = threading.Lock()
+
+
+def get_http_clients(http_config: Optional[Dict[str, Any]] = None) -> HTTPClients:
+    """Process-wide ``HTTPClients`` for a given ``http:`` config
+
+    Every embedding backend and LLM generator built from the same settings
+    shares one pool, so they reuse each other's keep-alive connections.
+    """
+    key = tuple(sorted((http_config or {}).items()))
+    with _shared_lock:
+        clients = _shared.get(key)
+        if clients is None:
+            clients = _shared[key] = HTTPClients(http_config)
+        return clients
+
+
+def get_http_stats() -> Dict[str, Any]:
+    """Stats of every shared pool created so far"""
+    with _shared_lock:
+        pools = list(_shared.values())
+    if len(pools) == 1:
+        return pools[0].get_stats()
+    return {f"pool_{i}": clients.get_stats() for i, clients in enumerate(pools)}
@@ -1,19 +1,19 @@
 """
 LLM integration for answer generation
 """
-import os
-from typing import List, Optional
-from openai import OpenAI
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 import yaml
 from dotenv import load_dotenv
 
+from src.context_builder import ContextBuilder
+from src.llm_backends import ANSWERED_BY, create_llm_backend
 from src.retriever import RetrievedDocument
 
 load_dotenv()
 
 
 class LLMGenerator:
-    """Generate answers using OpenAI LLM"""
+    """Generate answers with the LLM backend configured under ``llm:``"""
     
     def __init__(self, config_path: str = "config/config.yaml"):
         with open(config_path, 'r') as f:
@@ -22,16 +22,19 @@ class LLMGenerator:
         self.model = self.config['llm']['model']
         self.temperature = self.config['llm']['temperature']
         self.max_tokens = self.config['llm']['max_tokens']
+        # Token budget, boilerplate stripping and dedup for retrieved sources
+        self.context_builder = ContextBuilder.from_config(self.config.get('context'))
         
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # OpenAI-compatible API or the local fake (llm.backend)
+        self.backend = create_llm_backend(self.config['llm'], self.config.get('http'))
     
-    def generate_answer(
-        self, 
-        query: str, 
+    def _build_messages(
+        self,
+        query: str,
         context: str,
         system_prompt: Optional[str] = None
-    ) -> str:
-        """Generate answer based on query and retrieved context"""
+    ) -> List[dict]:
+        """Chat messages for a query and its retrieved context"""
         
         if system_prompt is None:
             system_prompt = """You are a helpful e-commerce shopping assistant. Answer customer questions based on the provided product information, customer reviews, and store policies.
@@ -52,17 +55,69 @@ Customer Question: {query}
 
 Please provide a helpful answer based on the context above."""
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=self.temperature,
-            max_tokens=self.max_tokens
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def generate_answer(
+        self, 
+        query: str, 
+        context: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        """Generate answer based on query and retrieved context"""
+        ANSWERED_BY.set(None)
+        return self.backend.complete(
+            self._build_messages(query, context, system_prompt), self.temperature, self.max_tokens
+        )
+    
+    async def agenerate_answer(
+        self,
+        query: str,
+        context: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        """Async version of generate_answer"""
+        ANSWERED_BY.set(None)
+        return await self.backend.acomplete(
+            self._build_messages(query, context, system_prompt), self.temperature, self.max_tokens
+        )
+    
+    def stream_answer(
+        self,
+        query: str,
+        context: str,
+        system_prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """Yield answer tokens as the LLM generates them"""
+        ANSWERED_BY.set(None)
+        yield from self.backend.stream(
+            self._build_messages(query, context, system_prompt), self.temperature, self.max_tokens
         )
-        
-        return response.choices[0].message.content
+    
+    async def astream_answer(
+        self,
+        query: str,
+        context: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Async version of stream_answer"""
+        ANSWERED_BY.set(None)
+        async for token in self.backend.astream(
+            self._build_messages(query, context, system_prompt), self.temperature, self.max_tokens
+        ):
+            yield token
+    
+    def answered_by(self) -> Dict[str, Any]:
+        """Model that produced the last answer in this context, and whether it was the fallback"""
+        model, fallback = ANSWERED_BY.get() or (self.backend.name, False)
+        return {'model': model, 'fallback': fallback}
+    
+    def build_context(self, retrieved_docs: List[RetrievedDocument]) -> Tuple[str, List[dict], Dict[str, Any]]:
+        """Numbered context block within the ``context.max_tokens`` budget,
+        the attributions of the sources it includes, and its token stats"""
+        return self.context_builder.build(retrieved_docs)
     
     def generate_answer_with_sources(
         self,
@@ -70,35 +125,32 @@ Please provide a helpful answer based on the context above."""
         retrieved_docs: List[RetrievedDocument]
     ) -> dict:
         """Generate answer with source attribution"""
-        
-        # Format context from retrieved documents
-        context_parts = []
-        sources = []
-        
-        for i, doc in enumerate(retrieved_docs, 1):
-            doc_type_label = doc.doc_type.upper()
-            context_parts.append(f"[SOURCE {i} - {doc_type_label}]")
-            context_parts.append(doc.content)
-            context_parts.append("")
-            
-            # Track sources
-            source_info = {
-                'id': i,
-                'type': doc.doc_type,
-                'score': doc.score,
-                'metadata': doc.metadata
-            }
-            sources.append(source_info)
-        
-        context = "\n".join(context_parts)
-        
-        # Generate answer
+        context, sources, context_stats = self.build_context(retrieved_docs)
         answer = self.generate_answer(query, context)
         
         return {
             'answer': answer,
             'sources': sources,
-            'query': query
+            'query': query,
+            'context': context_stats,
+            **self.answered_by()
+        }
+    
+    async def agenerate_answer_with_sources(
+        self,
+        query: str,
+        retrieved_docs: List[RetrievedDocument]
+    ) -> dict:
+        """Async version of generate_answer_with_sources"""
+        context, sources, context_stats = self.build_context(retrieved_docs)
+        answer = await self.agenerate_answer(query, context)
+        
+        return {
+            'answer': answer,
+            'sources': sources,
+            'query': query,
+            'context': context_stats,
+            **self.answered_by()
         }
 
 
@@ -123,4 +175,5 @@ if __name__ == "__main__":
     print(result['answer'])
     print("\nSources used:")
     for source in result['sources']:
-        print(f"  - {source['type']} (score: {source['score']:.3f})")
\ No newline at end of file
+        print(f"  - {source['type']} (score: {source['score']:.3f})")
+    print(f"\nPrompt tokens saved: {result['context']['saved_tokens']}")
\ No newline at end of file
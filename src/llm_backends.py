@@ -0,0 +1,524 @@
+"""
+LLM backends: OpenAI-compatible chat completions and a deterministic local fake
+"""
+import asyncio
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from openai import AsyncOpenAI, OpenAI
+
+from src.http_client import get_http_clients
+from src.metrics import LatencyRecorder
+
+
+class LLMBackend:
+    """Base class for chat completion providers
+
+    A backend turns chat ``messages`` into an answer, either whole or as a
+    stream of text deltas. ``name`` identifies the model in stats.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def complete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        """Full answer for one conversation"""
+        raise NotImplementedError
+
+    async def acomplete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        """Full answer without blocking the event loop"""
+        return await asyncio.to_thread(self.complete, messages, temperature, max_tokens)
+
+    def stream(self, messages: List[dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        """Answer as text deltas in generation order"""
+        yield self.complete(messages, temperature, max_tokens)
+
+    async def astream(self, messages: List[dict], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        """Async version of ``stream``"""
+        yield await self.acomplete(messages, temperature, max_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class OpenAILLMBackend(LLMBackend):
+    """OpenAI (or OpenAI-compatible, via ``base_url``) chat completions API"""
+
+    def __init__(self, model: str, base_url: str = None, http_config: Dict[str, Any] = None,
+                 timeout_seconds: float = 60):
+        super().__init__(model)
+        self.model = model
+        # Connection pools are shared with the embedding clients (src/http_client.py)
+        http = get_http_clients(http_config)
+        timeout = http.timeout(timeout_seconds)
+        self.client = OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=base_url,
+            timeout=timeout,
+            http_client=http.client
+        )
+        # Used by the async pipeline so waiting on the LLM never holds a thread
+        self.async_client = AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=base_url,
+            timeout=timeout,
+            http_client=http.async_client
+        )
+
+    def complete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    async def acomplete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    def stream(self, messages: List[dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, messages: List[dict], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+QUESTION_PATTERN = re.compile(r"Customer Question:\s*(.*)")
+FILLER = "based on the store context this product matches what you are looking for".split()
+
+
+def fake_answer_tokens(messages: List[dict], count: int) -> List[str]:
+    """Deterministic answer, as ``count`` whitespace-led tokens, echoing the question"""
+    prompt = messages[-1].get("content", "") if messages else ""
+    match = QUESTION_PATTERN.search(prompt)
+    question = match.group(1).strip() if match else prompt[:80]
+    words = f"Stub answer to: {question}".split()
+    while len(words) < count:
+        words += FILLER
+    return [word if i == 0 else f" {word}" for i, word in enumerate(words[:count])]
+
+
+class FakeLLMBackend(LLMBackend):
+    """Local stand-in for an LLM that models latency and token throughput
+
+    Every answer waits ``latency_ms`` before its first token, then produces
+    ``answer_tokens`` tokens (capped by ``max_tokens``) at
+    ``tokens_per_second``. The text only echoes the question, identically
+    on every run. No network and no API key, so the whole pipeline can be
+    load-tested locally or in CI; the async methods sleep without holding
+    a thread, like a real HTTP client.
+    """
+
+    def __init__(self, latency_ms: float = 300.0, tokens_per_second: float = 100.0, answer_tokens: int = 64,
+                 slow_rate: float = 0.0, slow_latency_ms: float = 3000.0, seed: int = 0):
+        super().__init__("fake")
+        self.latency = latency_ms / 1000
+        self.token_interval = 1 / tokens_per_second if tokens_per_second else 0.0
+        self.answer_tokens = answer_tokens
+        # A seeded fraction of calls waits slow_latency_ms instead: a reproducible latency tail
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency_ms / 1000
+        self._random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self.stats = {'completions': 0, 'tokens': 0, 'in_flight': 0, 'max_in_flight': 0, 'slow': 0}
+
+    def _tokens(self, messages: List[dict], max_tokens: int) -> List[str]:
+        return fake_answer_tokens(messages, min(self.answer_tokens, max_tokens or self.answer_tokens))
+
+    def _first_token_delay(self) -> float:
+        with self._lock:
+            slow = self.slow_rate and self._random.random() < self.slow_rate
+            self.stats['slow'] += bool(slow)
+        return self.slow_latency if slow else self.latency
+
+    def _started(self, tokens: List[str]):
+        with self._lock:
+            self.stats['completions'] += 1
+            self.stats['tokens'] += len(tokens)
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def _finished(self):
+        with self._lock:
+            self.stats['in_flight'] -= 1
+
+    def complete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        return "".join(self.stream(messages, temperature, max_tokens))
+
+    async def acomplete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        return "".join([token async for token in self.astream(messages, temperature, max_tokens)])
+
+    def stream(self, messages: List[dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        tokens = self._tokens(messages, max_tokens)
+        self._started(tokens)
+        try:
+            time.sleep(self._first_token_delay())
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.token_interval)
+                yield token
+        finally:
+            self._finished()
+
+    async def astream(self, messages: List[dict], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        tokens = self._tokens(messages, max_tokens)
+        self._started(tokens)
+        try:
+            await asyncio.sleep(self._first_token_delay())
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(self.token_interval)
+                yield token
+        finally:
+            self._finished()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'backend': self.name, **self.stats}
+
+
+class DeadlineExceeded(TimeoutError):
+    """A pipeline stage (retrieval, or an LLM call and its fallback) missed its deadline"""
+
+
+# (model, fallback?) of the last answer a RoutedLLMBackend returned in this context
+ANSWERED_BY: contextvars.ContextVar[Optional[Tuple[str, bool]]] = contextvars.ContextVar('answered_by', default=None)
+
+
+def _close_stream(result):
+    """Close the token iterator of a losing streamed attempt"""
+    if isinstance(result, tuple):
+        close = getattr(result[1], 'close', None)
+        if close is not None:
+            close()
+
+
+async def _aclose_stream(result):
+    if isinstance(result, tuple):
+        await result[1].aclose()
+
+
+async def _afirst_token(tokens: AsyncIterator[str]) -> Tuple[str, AsyncIterator[str]]:
+    """Wait for a stream's first token; (first token, rest of the stream)"""
+    try:
+        return await tokens.__anext__(), tokens
+    except StopAsyncIteration:
+        return "", tokens
+    except BaseException:
+        await tokens.aclose()
+        raise
+
+
+def _first_token(tokens: Iterator[str]) -> Tuple[str, Iterator[str]]:
+    return next(tokens, ""), tokens
+
+
+class RoutedLLMBackend(LLMBackend):
+    """Deadline, hedged requests and fallback around another backend
+
+    A call goes to ``primary``. If it has not answered after the
+    ``hedge_percentile`` of recent primary latencies (``hedge_initial_ms``
+    until ``hedge_min_samples`` are recorded), an identical hedge request
+    is sent and the first answer wins; the other is cancelled. If neither
+    answers within ``deadline_ms``, or both fail, the call is retried once
+    on ``fallback`` (e.g. a faster, cheaper model) within
+    ``fallback_deadline_ms``; without a fallback ``DeadlineExceeded`` (or
+    the error) is raised. For streams, deadlines and hedging apply to the
+    first token. The model that answered is recorded in ``ANSWERED_BY``.
+
+    Sync calls run their attempts on a small thread pool; a losing sync
+    attempt cannot be interrupted, so it finishes in the background.
+    """
+
+    def __init__(self, primary: LLMBackend, fallback: Optional[LLMBackend] = None,
+                 deadline_ms: Optional[float] = None, fallback_deadline_ms: Optional[float] = None,
+                 hedge: bool = True, hedge_percentile: float = 95, hedge_min_samples: int = 50,
+                 hedge_initial_ms: Optional[float] = None, sync_workers: int = 32):
+        super().__init__(primary.name)
+        self.primary = primary
+        self.fallback = fallback
+        self.deadline = deadline_ms / 1000 if deadline_ms else None
+        self.fallback_deadline = fallback_deadline_ms / 1000 if fallback_deadline_ms else None
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_initial = hedge_initial_ms / 1000 if hedge_initial_ms else None
+
+        self.latency = LatencyRecorder()
+        self._executor = ThreadPoolExecutor(max_workers=sync_workers, thread_name_prefix="llm-attempt")
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'primary_wins': 0, 'deadline_exceeded': 0,
+                      'primary_errors': 0, 'fallbacks': 0, 'fallback_errors': 0}
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self.stats[name] += value
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait on the primary before hedging; None disables hedging"""
+        if not self.hedge:
+            return None
+        delay = self.latency.percentile('primary', self.hedge_percentile, self.hedge_min_samples)
+        return delay if delay is not None else self.hedge_initial
+
+    def _next_wait(self, elapsed: float, hedge_at: Optional[float]) -> Optional[float]:
+        """Seconds until the next hedge or deadline event (None = no limit)"""
+        until = [t for t in (hedge_at, self.deadline) if t is not None]
+        return max(min(until) - elapsed, 0.0) if until else None
+
+    def _won(self, label: str, started: float):
+        # Latency of the primary model, whichever of its attempts answered
+        self.latency.observe('primary', time.perf_counter() - started)
+        self._count(f'{label}_wins')
+        ANSWERED_BY.set((self.primary.name, False))
+
+    def _censored(self, attempts: Dict[Any, Tuple[str, float]]):
+        # Losers ran at least this long; recording it keeps them in the percentile
+        now = time.perf_counter()
+        for _, started in attempts.values():
+            self.latency.observe('primary', now - started)
+
+    def _race(self, call: Callable[[LLMBackend], Any], discard: Callable[[Any], None] = None):
+        """Primary with hedging under the deadline, then fallback; returns the first result"""
+        start = time.perf_counter()
+        self._count('calls')
+        hedge_at = self.hedge_delay()
+        attempts = {self._executor.submit(call, self.primary): ('primary', start)}
+        error = None
+
+        while attempts:
+            done, _ = wait(attempts, timeout=self._next_wait(time.perf_counter() - start, hedge_at),
+                           return_when=FIRST_COMPLETED)
+            winner = None
+            for future in done:
+                label, started = attempts.pop(future)
+                if future.exception() is not None:
+                    error = future.exception()
+                    self._count('primary_errors')
+                elif winner is None:
+                    winner = future.result()
+                    self._won(label, started)
+                elif discard is not None:
+                    discard(future.result())
+            if winner is not None:
+                self._censored(attempts)
+                for future in attempts:
+                    if discard is not None:
+                        future.add_done_callback(lambda f: f.exception() or discard(f.result()))
+                self.latency.observe('total', time.perf_counter() - start)
+                return winner
+            elapsed = time.perf_counter() - start
+            if done:
+                continue
+            if hedge_at is not None and elapsed >= hedge_at:
+                hedge_at = None
+                self._count('hedges')
+                attempts[self._executor.submit(call, self.primary)] = ('hedge', time.perf_counter())
+                continue
+            if self.deadline is None or elapsed < self.deadline:
+                continue
+            # Deadline blown: leave the attempts running, their results are discarded
+            self._count('deadline_exceeded')
+            self._censored(attempts)
+            for future in attempts:
+                if discard is not None:
+                    future.add_done_callback(lambda f: f.exception() or discard(f.result()))
+            error = DeadlineExceeded(f"LLM call exceeded its {self.deadline:.1f}s deadline")
+            break
+
+        if self.fallback is None:
+            raise error
+        self._count('fallbacks')
+        future = self._executor.submit(call, self.fallback)
+        try:
+            result = future.result(timeout=self.fallback_deadline)
+        except FutureTimeoutError:
+            self._count('fallback_errors')
+            if discard is not None:
+                future.add_done_callback(lambda f: f.exception() or discard(f.result()))
+            raise DeadlineExceeded(f"Fallback LLM call exceeded its {self.fallback_deadline:.1f}s deadline")
+        except Exception:
+            self._count('fallback_errors')
+            raise
+        ANSWERED_BY.set((self.fallback.name, True))
+        self.latency.observe('total', time.perf_counter() - start)
+        return result
+
+    async def _arace(self, call: Callable[[LLMBackend], Any], discard: Callable[[Any], Any] = None):
+        """Async ``_race``: losing attempts are cancelled rather than left running"""
+        start = time.perf_counter()
+        self._count('calls')
+        hedge_at = self.hedge_delay()
+        attempts = {asyncio.ensure_future(call(self.primary)): ('primary', start)}
+        error = None
+
+        try:
+            while attempts:
+                done, _ = await asyncio.wait(
+                    attempts, timeout=self._next_wait(time.perf_counter() - start, hedge_at),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = None
+                for task in done:
+                    label, started = attempts.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        self._count('primary_errors')
+                    elif winner is None:
+                        winner = task.result()
+                        self._won(label, started)
+                    elif discard is not None:
+                        await discard(task.result())
+                if winner is not None:
+                    self.latency.observe('total', time.perf_counter() - start)
+                    return winner
+                elapsed = time.perf_counter() - start
+                if done:
+                    continue
+                if hedge_at is not None and elapsed >= hedge_at:
+                    hedge_at = None
+                    self._count('hedges')
+                    attempts[asyncio.ensure_future(call(self.primary))] = ('hedge', time.perf_counter())
+                    continue
+                if self.deadline is None or elapsed < self.deadline:
+                    continue
+                self._count('deadline_exceeded')
+                error = DeadlineExceeded(f"LLM call exceeded its {self.deadline:.1f}s deadline")
+                break
+        finally:
+            self._censored(attempts)
+            for task in attempts:
+                task.cancel()
+
+        if self.fallback is None:
+            raise error
+        self._count('fallbacks')
+        try:
+            result = await asyncio.wait_for(call(self.fallback), self.fallback_deadline)
+        except asyncio.TimeoutError:
+            self._count('fallback_errors')
+            raise DeadlineExceeded(f"Fallback LLM call exceeded its {self.fallback_deadline:.1f}s deadline")
+        except Exception:
+            self._count('fallback_errors')
+            raise
+        ANSWERED_BY.set((self.fallback.name, True))
+        self.latency.observe('total', time.perf_counter() - start)
+        return result
+
+    def complete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        return self._race(lambda backend: backend.complete(messages, temperature, max_tokens))
+
+    async def acomplete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        return await self._arace(lambda backend: backend.acomplete(messages, temperature, max_tokens))
+
+    def stream(self, messages: List[dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        first, tokens = self._race(
+            lambda backend: _first_token(iter(backend.stream(messages, temperature, max_tokens))),
+            discard=_close_stream
+        )
+        if first:
+            yield first
+        yield from tokens
+
+    async def astream(self, messages: List[dict], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        first, tokens = await self._arace(
+            lambda backend: _afirst_token(backend.astream(messages, temperature, max_tokens)),
+            discard=_aclose_stream
+        )
+        if first:
+            yield first
+        async for token in tokens:
+            yield token
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Routing counters, the current hedge delay and primary/total latency percentiles"""
+        with self._lock:
+            stats = {'backend': self.name, **self.stats}
+        hedge_delay = self.hedge_delay()
+        stats['hedge_delay_ms'] = round(hedge_delay * 1000, 2) if hedge_delay is not None else None
+        stats['latency'] = self.latency.get_stats()
+        stats['primary'] = self.primary.get_stats()
+        if self.fallback is not None:
+            stats['fallback'] = self.fallback.get_stats()
+        return stats
+
+
+def _create_backend(llm_config: Dict[str, Any], http_config: Dict[str, Any] = None) -> LLMBackend:
+    backend = llm_config.get('backend', 'openai')
+
+    if backend == 'openai':
+        return OpenAILLMBackend(
+            llm_config['model'],
+            base_url=llm_config.get('base_url'),
+            http_config=http_config,
+            timeout_seconds=llm_config.get('timeout_seconds', 60)
+        )
+    if backend == 'fake':
+        options = llm_config.get('fake', {})
+        return FakeLLMBackend(**options)
+
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+def create_llm_backend(llm_config: Dict[str, Any], http_config: Dict[str, Any] = None) -> LLMBackend:
+    """Build the backend named by ``llm.backend`` in config.yaml
+
+    With ``llm.deadline_ms``, ``llm.hedge.enabled`` or ``llm.fallback``
+    set, it is wrapped in a ``RoutedLLMBackend``. The fallback backend is
+    ``llm:`` with the keys under ``llm.fallback`` (e.g. ``model``)
+    overriding it.
+    """
+    primary = _create_backend(llm_config, http_config)
+    hedge = llm_config.get('hedge') or {}
+    fallback_config = llm_config.get('fallback') or {}
+    if not (llm_config.get('deadline_ms') or hedge.get('enabled') or fallback_config.get('model')):
+        return primary
+
+    fallback = None
+    if fallback_config.get('model'):
+        overrides = {key: value for key, value in fallback_config.items() if key != 'deadline_ms'}
+        fallback = _create_backend({**llm_config, **overrides}, http_config)
+
+    return RoutedLLMBackend(
+        primary,
+        fallback=fallback,
+        deadline_ms=llm_config.get('deadline_ms'),
+        fallback_deadline_ms=fallback_config.get('deadline_ms'),
+        hedge=hedge.get('enabled', False),
+        hedge_percentile=hedge.get('percentile', 95),
+        hedge_min_samples=hedge.get('min_samples', 50),
+        hedge_initial_ms=hedge.get('initial_delay_ms')
+    )
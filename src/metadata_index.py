@@ -0,0 +1,346 @@
+"""
+Metadata index for filtered vector search
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+PRICE_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+EQUALITY_OPERATORS = ("$eq", "$ne", "$in", "$nin")
+# Category path levels stored for Chroma, which cannot match a path prefix
+CATEGORY_LEVELS = 8
+CATEGORY_LEVEL_KEYS = tuple(f"category_{level}" for level in range(1, CATEGORY_LEVELS + 1))
+RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+
+def parse_price(price: Any) -> Optional[float]:
+    """Parse a raw price like '$1,299.99' or '$10.00 - $20.00' (lower bound)"""
+    if isinstance(price, (int, float)):
+        return float(price)
+    if not isinstance(price, str):
+        return None
+    match = PRICE_PATTERN.search(price)
+    if match is None:
+        return None
+    try:
+        return float(match.group().replace(",", ""))
+    except ValueError:
+        return None
+
+
+def category_prefixes(category: str) -> List[str]:
+    """'A > B > C' -> ['A', 'A > B', 'A > B > C'] so a filter on a parent matches children"""
+    parts = [part.strip() for part in category.split(">") if part.strip()]
+    return [" > ".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def category_levels(category: Any) -> Dict[str, str]:
+    """``category_1`` .. ``category_8`` metadata: the path's parent at each depth, '' past its end"""
+    prefixes = category_prefixes(category) if isinstance(category, str) else []
+    return {key: prefixes[i] if i < len(prefixes) else "" for i, key in enumerate(CATEGORY_LEVEL_KEYS)}
+
+
+def strip_category_levels(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata without the ``category_levels`` fields"""
+    return {key: value for key, value in metadata.items() if key not in CATEGORY_LEVEL_KEYS}
+
+
+def validate_filter(filter_dict: Dict[str, Any]):
+    """Raise ValueError if the filter uses syntax the search backends cannot evaluate"""
+    if not isinstance(filter_dict, dict):
+        raise ValueError(f"Filter must be an object, got {filter_dict!r}")
+    for key, condition in filter_dict.items():
+        if key in ("$and", "$or"):
+            if not isinstance(condition, list) or not condition:
+                raise ValueError(f"{key} takes a non-empty list of filters")
+            for clause in condition:
+                validate_filter(clause)
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported filter operator: {key}")
+        elif isinstance(condition, dict):
+            if not condition:
+                raise ValueError(f"Empty condition on {key}")
+            for operator, expected in condition.items():
+                if operator in RANGE_OPERATORS and key in MetadataIndex.CATEGORICAL:
+                    raise ValueError(f"Operator {operator} is not supported on {key}")
+                if operator not in EQUALITY_OPERATORS + RANGE_OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if operator in ("$in", "$nin") and not isinstance(expected, list):
+                    raise ValueError(f"{operator} on {key} takes a list of values")
+
+
+def _compare_category(category: str, operator: str, expected: Any) -> bool:
+    """Equality operators on a category path, where a parent matches its children"""
+    prefixes = category_prefixes(category)
+    if operator == "$eq":
+        return expected in prefixes
+    if operator == "$ne":
+        return expected not in prefixes
+    if operator == "$in":
+        return any(value in prefixes for value in expected)
+    if operator == "$nin":
+        return not any(value in prefixes for value in expected)
+    raise ValueError(f"Operator {operator} is not supported on category")
+
+
+def _compare(actual: Any, operator: str, expected: Any) -> bool:
+    if operator == "$eq":
+        return actual == expected
+    if operator == "$ne":
+        return actual != expected
+    if operator == "$in":
+        return actual in expected
+    if operator == "$nin":
+        return actual not in expected
+    if actual is None:
+        return False
+    if operator == "$gt":
+        return actual > expected
+    if operator == "$gte":
+        return actual >= expected
+    if operator == "$lt":
+        return actual < expected
+    if operator == "$lte":
+        return actual <= expected
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def matches_filter(metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma-style ``where`` filter against one metadata dict"""
+    for key, condition in filter_dict.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            compare = _compare_category if key == "category" and isinstance(metadata.get(key), str) else _compare
+            if not all(compare(metadata.get(key), op, value) for op, value in condition.items()):
+                return False
+        elif key == "category" and isinstance(metadata.get(key), str):
+            if not _compare_category(metadata[key], "$eq", condition):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _category_level_key(category: Any) -> str:
+    """Field holding paths as deep as ``category``; deeper paths only match in full"""
+    depth = len(category_prefixes(category)) if isinstance(category, str) else 0
+    return CATEGORY_LEVEL_KEYS[depth - 1] if 1 <= depth <= CATEGORY_LEVELS else "category"
+
+
+def _chroma_category(operator: str, expected: Any) -> Dict[str, Any]:
+    if operator in ("$eq", "$ne"):
+        return {_category_level_key(expected): {operator: expected}}
+    by_level: Dict[str, List[Any]] = {}
+    for value in expected:
+        by_level.setdefault(_category_level_key(value), []).append(value)
+    clauses = [{key: {operator: values}} for key, values in by_level.items()] or [{"category": {operator: []}}]
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$or" if operator == "$in" else "$and": clauses}
+
+
+def _chroma_condition(key: str, condition: Any) -> Dict[str, Any]:
+    if key in ("$and", "$or"):
+        return {key: [to_chroma_where(clause) for clause in condition]}
+    if key != "category" and not isinstance(condition, dict):
+        return {key: condition}
+    operators = condition if isinstance(condition, dict) else {"$eq": condition}
+    # Chroma takes one operator per field condition
+    clauses = [_chroma_category(operator, expected) if key == "category" else {key: {operator: expected}}
+               for operator, expected in operators.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def to_chroma_where(filter_dict: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Translate a filter into a Chroma ``where``
+
+    Chroma requires an explicit $and when a filter has several fields or
+    a field has several operators.
+    ``category`` conditions are rewritten to the ``category_levels`` field
+    of the value's depth, so a parent category matches its children as it
+    does on the NumPy backend.
+    """
+    if not filter_dict:
+        return None
+    clauses = [_chroma_condition(key, condition) for key, condition in filter_dict.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class MetadataIndex:
+    """Posting lists over document metadata, built at indexing time
+
+    Categorical fields (``doc_type``, ``asin``, ``brand``, ``category`` and
+    every parent of the category path) map each value to a sorted array of row
+    ids. Numeric fields (``price_value``, ``rating``) keep their values
+    sorted alongside the row ids, so a range is two ``searchsorted`` calls.
+    ``evaluate`` turns a Chroma-style ``where`` filter into the sorted row
+    ids that satisfy it, so filtered search only scores those rows.
+    """
+
+    CATEGORICAL = ("doc_type", "asin", "brand", "category")
+    NUMERIC = ("price_value", "rating")
+
+    def __init__(self):
+        self.count = 0
+        self.postings: Dict[str, Dict[Any, np.ndarray]] = {field: {} for field in self.CATEGORICAL}
+        self.numeric: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, Dict[str, Any]]]) -> "MetadataIndex":
+        """Build from (doc_type, metadata) pairs in row order"""
+        index = cls()
+        postings: Dict[str, Dict[Any, List[int]]] = {field: {} for field in cls.CATEGORICAL}
+        numeric: Dict[str, Tuple[List[float], List[int]]] = {field: ([], []) for field in cls.NUMERIC}
+
+        row = -1
+        for row, (doc_type, metadata) in enumerate(entries):
+            postings["doc_type"].setdefault(doc_type, []).append(row)
+            for field in ("asin", "brand"):
+                value = metadata.get(field)
+                if isinstance(value, str):
+                    postings[field].setdefault(value, []).append(row)
+            category = metadata.get("category")
+            if isinstance(category, str):
+                for prefix in category_prefixes(category):
+                    postings["category"].setdefault(prefix, []).append(row)
+
+            for field in cls.NUMERIC:
+                value = metadata.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numeric[field][0].append(float(value))
+                    numeric[field][1].append(row)
+
+        index.count = row + 1
+        index.postings = {
+            field: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+            for field, values in postings.items()
+        }
+        for field, (values, rows) in numeric.items():
+            values = np.asarray(values, dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            index.numeric[field] = (values[order], np.asarray(rows, dtype=np.int64)[order])
+        return index
+
+    def supports(self, filter_dict: Dict[str, Any]) -> bool:
+        """Whether every field in the filter is indexed"""
+        for key, condition in filter_dict.items():
+            if key in ("$and", "$or"):
+                if not all(self.supports(clause) for clause in condition):
+                    return False
+            elif key not in self.CATEGORICAL and key not in self.NUMERIC:
+                return False
+        return True
+
+    def _all(self) -> np.ndarray:
+        return np.arange(self.count, dtype=np.int64)
+
+    def _categorical(self, field: str, operator: str, expected: Any) -> np.ndarray:
+        values = self.postings[field]
+        empty = np.zeros(0, dtype=np.int64)
+        if operator == "$eq":
+            return values.get(expected, empty)
+        if operator == "$in":
+            lists = [values[value] for value in expected if value in values]
+            return np.unique(np.concatenate(lists)) if lists else empty
+        if operator == "$ne":
+            return np.setdiff1d(self._all(), values.get(expected, empty), assume_unique=True)
+        if operator == "$nin":
+            return np.setdiff1d(self._all(), self._categorical(field, "$in", expected), assume_unique=True)
+        raise ValueError(f"Operator {operator} is not supported on {field}")
+
+    def _numeric(self, field: str, operator: str, expected: Any) -> np.ndarray:
+        values, rows = self.numeric[field]
+        if operator == "$eq":
+            selected = rows[np.searchsorted(values, expected, "left"):np.searchsorted(values, expected, "right")]
+        elif operator == "$gt":
+            selected = rows[np.searchsorted(values, expected, "right"):]
+        elif operator == "$gte":
+            selected = rows[np.searchsorted(values, expected, "left"):]
+        elif operator == "$lt":
+            selected = rows[:np.searchsorted(values, expected, "left")]
+        elif operator == "$lte":
+            selected = rows[:np.searchsorted(values, expected, "right")]
+        elif operator == "$in":
+            selected = np.concatenate([self._numeric(field, "$eq", value) for value in expected] or [rows[:0]])
+        elif operator in ("$ne", "$nin"):
+            excluded = self._numeric(field, "$eq" if operator == "$ne" else "$in", expected)
+            return np.setdiff1d(self._all(), excluded)
+        else:
+            raise ValueError(f"Operator {operator} is not supported on {field}")
+        return np.sort(selected)
+
+    def _condition(self, field: str, condition: Any) -> np.ndarray:
+        operators = condition if isinstance(condition, dict) else {"$eq": condition}
+        result = None
+        for operator, expected in operators.items():
+            if field in self.NUMERIC:
+                rows = self._numeric(field, operator, expected)
+            else:
+                rows = self._categorical(field, operator, expected)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def evaluate(self, filter_dict: Dict[str, Any]) -> np.ndarray:
+        """Sorted row ids matching the filter; every field must be indexed"""
+        result = None
+        for key, condition in filter_dict.items():
+            if key == "$and":
+                rows = self.evaluate({})
+                for clause in condition:
+                    rows = np.intersect1d(rows, self.evaluate(clause), assume_unique=True)
+            elif key == "$or":
+                lists = [self.evaluate(clause) for clause in condition]
+                rows = np.unique(np.concatenate(lists)) if lists else np.zeros(0, dtype=np.int64)
+            else:
+                rows = self._condition(key, condition)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return self._all() if result is None else result
+
+    def save(self, path: str):
+        """Persist as one .npz: concatenated postings plus a JSON value table"""
+        arrays = {}
+        values_table = {}
+        for field, values in self.postings.items():
+            keys = list(values)
+            values_table[field] = keys
+            lengths = [len(values[key]) for key in keys]
+            arrays[f"{field}.rows"] = (
+                np.concatenate([values[key] for key in keys]) if keys else np.zeros(0, dtype=np.int64)
+            )
+            arrays[f"{field}.offsets"] = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        for field, (values, rows) in self.numeric.items():
+            arrays[f"{field}.values"] = values
+            arrays[f"{field}.value_rows"] = rows
+
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, count=self.count, values=json.dumps(values_table), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        saved = np.load(path)
+        index = cls()
+        index.count = int(saved["count"])
+        values_table = json.loads(str(saved["values"]))
+        for field, keys in values_table.items():
+            rows, offsets = saved[f"{field}.rows"], saved[f"{field}.offsets"]
+            index.postings[field] = {key: rows[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys)}
+        for field in cls.NUMERIC:
+            index.numeric[field] = (saved[f"{field}.values"], saved[f"{field}.value_rows"])
+        return index
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self.count,
+            'distinct_values': {field: len(values) for field, values in self.postings.items()},
+            'numeric_rows': {field: len(rows) for field, (_, rows) in self.numeric.items()}
+        }
@@ -0,0 +1,58 @@
+"""
+Rolling latency metrics for the query pipeline
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import numpy as np
+
+
+class LatencyRecorder:
+    """Keeps the last ``window`` samples per metric and summarizes them
+
+    Percentiles are computed over the window only, so they track current
+    behaviour; ``count`` is the total number of observations.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def observe(self, name: str, seconds: float):
+        """Record one latency sample in seconds"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def percentile(self, name: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """q-th percentile of the window in seconds; None with fewer than ``min_samples``"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None or len(samples) < min_samples:
+                return None
+            values = np.array(samples)
+        return float(np.percentile(values, q))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per metric: count and avg/p50/p95/p99/max in milliseconds"""
+        with self._lock:
+            snapshot = {name: (np.array(samples) * 1000, self._counts[name])
+                        for name, samples in self._samples.items()}
+
+        return {
+            name: {
+                'count': count,
+                'avg_ms': round(float(samples.mean()), 2),
+                'p50_ms': round(float(np.percentile(samples, 50)), 2),
+                'p95_ms': round(float(np.percentile(samples, 95)), 2),
+                'p99_ms': round(float(np.percentile(samples, 99)), 2),
+                'max_ms': round(float(samples.max()), 2)
+            }
+            for name, (samples, count) in snapshot.items()
+        }
@@ -0,0 +1,416 @@
+"""
+In-process NumPy vector store with exact and IVF search
+"""
+import math
+import os
+import shutil
+from itertools import islice
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import yaml
+from tqdm import tqdm
+
+from src.embeddings import EmbeddingGenerator
+from src.retriever import RetrievedDocument
+from src.data_processor import Document
+from src.document_store import DocumentStore, iter_batches
+from src.metadata_index import MetadataIndex, matches_filter
+from src.quantization import create_quantizer, load_quantizer
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """k-means on unit vectors using dot-product assignment; returns unit centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=k)
+
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    return centroids
+
+
+class NumpyVectorStore:
+    """Vector store over a contiguous, memory-mapped float32 matrix
+
+    Vectors are L2-normalized on insert so cosine similarity is a single
+    matrix-vector (or matrix-matrix, for query batches) product, and the
+    top-k is selected with ``argpartition`` instead of a full sort. With
+    ``vector_db.index: ivf`` a spherical k-means coarse quantizer restricts
+    each query to the ``ivf_nprobe`` closest lists.
+
+    With ``vector_db.quantization`` set to ``int8`` or ``pq`` only compact
+    codes are held in memory: candidates are scored against the codes with
+    asymmetric distance computation, and the best ``rerank_candidates`` are
+    re-scored exactly from the float matrix, which stays on disk and is only
+    paged in for those rows.
+
+    Filters are answered from a MetadataIndex built at indexing time: the
+    rows matching the filter are resolved first and only those rows are
+    scored, so a selective filter makes a search cheaper, not slower.
+
+    On disk, under ``<persist_directory>/numpy/<collection_name>/``:
+
+    - ``vectors.f32``: the (rows, dimension) float32 matrix
+    - ``documents/``: a DocumentStore with content and metadata per row
+    - ``metadata.npz``: the metadata index; ``ivf.npz``: the IVF index, if built
+    - ``codes.bin`` / ``quantizer.npz``: quantized vectors, if enabled
+    """
+
+    BLOCK_ROWS = 32768
+    QUANTIZED_BLOCK_ROWS = 4096
+
+    def __init__(self, config_path: str = "config/config.yaml"):
+        with open(config_path, 'r') as f:
+            self.config = yaml.safe_load(f)
+
+        vector_db = self.config['vector_db']
+        self.collection_name = vector_db['collection_name']
+        self.directory = os.path.join(vector_db['persist_directory'], 'numpy', self.collection_name)
+        self.index_type = vector_db.get('index', 'flat')
+        self.ivf_nlist = vector_db.get('ivf_nlist')
+        self.ivf_nprobe = vector_db.get('ivf_nprobe', 8)
+        self.ivf_min_rows = vector_db.get('ivf_min_rows', 20000)
+        self.quantization = vector_db.get('quantization', 'none')
+        self.pq_subspaces = vector_db.get('pq_subspaces', 96)
+        self.rerank_candidates = vector_db.get('rerank_candidates', 100)
+
+        self.dimension = self.config['embeddings']['dimension']
+        self.embedding_generator = EmbeddingGenerator(config_path)
+
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.metadata_index_path = os.path.join(self.directory, "metadata.npz")
+        self.ivf_path = os.path.join(self.directory, "ivf.npz")
+        self.codes_path = os.path.join(self.directory, "codes.bin")
+        self.quantizer_path = os.path.join(self.directory, "quantizer.npz")
+        self.documents = DocumentStore(os.path.join(self.directory, "documents"))
+
+        self._load()
+
+    def _load(self):
+        """Map vectors and load the metadata index, trimming any torn tail"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        row_bytes = self.dimension * 4
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        doc_rows = len(self.documents) if self.documents.exists() else 0
+        self.count = min(vector_rows, doc_rows)
+
+        self.vectors: Optional[np.ndarray] = None
+        if self.count:
+            self.vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dimension)
+            )
+
+        self.metadata_index = None
+        if os.path.exists(self.metadata_index_path):
+            metadata_index = MetadataIndex.load(self.metadata_index_path)
+            if metadata_index.count == self.count:
+                self.metadata_index = metadata_index
+        if self.metadata_index is None:
+            self.build_metadata_index()
+
+        self.ivf = None
+        if self.index_type == 'ivf' and os.path.exists(self.ivf_path):
+            ivf = np.load(self.ivf_path)
+            if int(ivf['rows']) == self.count:
+                self.ivf = {name: ivf[name] for name in ('centroids', 'order', 'offsets')}
+
+        self.quantizer = None
+        self.codes: Optional[np.ndarray] = None
+        if self.quantization != 'none' and os.path.exists(self.quantizer_path):
+            saved = np.load(self.quantizer_path)
+            if str(saved['kind']) == self.quantization and int(saved['rows']) == self.count:
+                self.quantizer = load_quantizer(self.quantization, saved)
+                code_bytes = self.quantizer.code_bytes(self.dimension)
+                self.codes = np.fromfile(self.codes_path, dtype=np.uint8).reshape(self.count, code_bytes)
+                if self.quantization == 'int8':
+                    self.codes = self.codes.view(np.int8)
+
+    def add_documents(self, documents: Sequence[Document], batch_size: int = 1000):
+        """Add documents to vector store"""
+        print(f"Adding {len(documents)} documents to vector store...")
+
+        # Drop rows not committed by an earlier, interrupted add
+        self.documents.close()
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(self.count * self.dimension * 4)
+
+        num_batches = math.ceil(len(documents) / batch_size)
+        for batch in tqdm(iter_batches(documents, batch_size), total=num_batches, desc="Indexing"):
+            embeddings = self.embedding_generator.generate_embeddings_batch([doc.content for doc in batch])
+            matrix = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+            with open(self.vectors_path, 'ab') as f:
+                f.write(matrix.tobytes())
+            # The document store commits the rows
+            self.documents.write(batch, append=True)
+
+        self._load()
+        if self.index_type == 'ivf':
+            self.build_ivf()
+        if self.quantization != 'none':
+            self.build_quantized()
+
+        print(f"✓ Added {len(documents)} documents to vector store")
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def build_metadata_index(self):
+        """Rebuild posting lists for filterable fields from the stored documents"""
+        entries = ((doc.doc_type, doc.metadata) for doc in self.documents) if self.count else ()
+        self.metadata_index = MetadataIndex.build(islice(entries, self.count))
+        if self.count:
+            self.metadata_index.save(self.metadata_index_path)
+
+    def build_ivf(self, iterations: int = 10):
+        """Train the coarse quantizer and assign every row to a list"""
+        if self.count < self.ivf_min_rows:
+            self.ivf = None
+            return
+
+        nlist = self.ivf_nlist or int(4 * math.sqrt(self.count))
+        nlist = max(1, min(nlist, self.count))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(self.count, size=min(self.count, nlist * 64), replace=False))
+        centroids = spherical_kmeans(np.asarray(self.vectors[sample]), nlist, iterations)
+
+        assignment = np.empty(self.count, dtype=np.int32)
+        for start in range(0, self.count, self.BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + self.BLOCK_ROWS])
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+        np.savez(self.ivf_path, centroids=centroids, order=order, offsets=offsets, rows=self.count)
+        self.ivf = {'centroids': centroids, 'order': order, 'offsets': offsets}
+
+    def build_quantized(self, sample_size: int = 50000):
+        """Train the quantizer on a sample and encode every row"""
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(self.count, size=min(self.count, sample_size), replace=False))
+        quantizer = create_quantizer(self.quantization, self.pq_subspaces)
+        quantizer.train(np.asarray(self.vectors[sample]))
+
+        with open(self.codes_path, 'wb') as f:
+            for start in range(0, self.count, self.BLOCK_ROWS):
+                f.write(quantizer.encode(np.asarray(self.vectors[start:start + self.BLOCK_ROWS])).tobytes())
+
+        np.savez(self.quantizer_path, kind=self.quantization, rows=self.count, **quantizer.state())
+        self._load()
+
+    def _probe(self, query: np.ndarray) -> np.ndarray:
+        """Candidate rows from the ``ivf_nprobe`` lists closest to the query"""
+        centroid_scores = self.ivf['centroids'] @ query
+        nprobe = min(self.ivf_nprobe, len(centroid_scores))
+        lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        order, offsets = self.ivf['order'], self.ivf['offsets']
+        return np.sort(np.concatenate([order[offsets[i]:offsets[i + 1]] for i in lists]))
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first"""
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind='stable')]
+
+    def _scan_top_k(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray],
+                    score_block, block_size: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k for a batch of queries, scoring the candidate rows block by block"""
+        best_rows = [np.zeros(0, dtype=np.int64)] * len(queries)
+        best_scores = [np.zeros(0, dtype=np.float32)] * len(queries)
+        total = self.count if rows is None else len(rows)
+
+        for start in range(0, total, block_size):
+            if rows is None:
+                block_rows = np.arange(start, min(start + block_size, total))
+                scores = score_block(queries, slice(start, start + block_size))
+            else:
+                block_rows = rows[start:start + block_size]
+                scores = score_block(queries, block_rows)
+
+            for i in range(len(queries)):
+                merged_rows = np.concatenate([best_rows[i], block_rows])
+                merged_scores = np.concatenate([best_scores[i], scores[i]])
+                top = self._top_k(merged_scores, k)
+                best_rows[i], best_scores[i] = merged_rows[top], merged_scores[top]
+
+        return list(zip(best_rows, best_scores))
+
+    def _exact_scores(self, queries: np.ndarray, rows) -> np.ndarray:
+        return queries @ np.asarray(self.vectors[rows]).T
+
+    def _quantized_scores(self, queries: np.ndarray, rows) -> np.ndarray:
+        return self.quantizer.scores(queries, self.codes[rows])
+
+    def _exact_top_k(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k for a batch of queries; quantized scoring plus exact re-rank if enabled"""
+        if self.quantizer is None:
+            return self._scan_top_k(queries, k, rows, self._exact_scores, self.BLOCK_ROWS)
+
+        shortlist = self._scan_top_k(
+            queries, max(k, self.rerank_candidates), rows,
+            self._quantized_scores, self.QUANTIZED_BLOCK_ROWS
+        )
+        reranked = []
+        for query, (candidates, _) in zip(queries, shortlist):
+            # Fancy indexing needs sorted rows for sequential reads of the memmap
+            candidates = np.sort(candidates)
+            scores = np.asarray(self.vectors[candidates]) @ query
+            top = self._top_k(scores, k)
+            reranked.append((candidates[top], scores[top]))
+        return reranked
+
+    def _candidate_rows(self, query: Optional[np.ndarray], filter_dict: Optional[Dict],
+                        top_k: int) -> Tuple[Optional[np.ndarray], Dict]:
+        """Rows to score for a query, plus any filter terms left to post-filter"""
+        use_ivf = self.ivf is not None and query is not None
+        indexed, remaining = {}, {}
+        for key, condition in (filter_dict or {}).items():
+            # Unindexed fields are checked per document after scoring
+            target = indexed if self.metadata_index.supports({key: condition}) else remaining
+            target[key] = condition
+        if not indexed:
+            return (self._probe(query) if use_ivf else None), remaining
+
+        rows = self.metadata_index.evaluate(indexed)
+        # A filter selecting fewer rows than the probed lists would hold is
+        # scanned exactly; otherwise only its rows inside the probed lists
+        # are, unless too few of them fall there to fill the top-k
+        if use_ivf and len(rows) > self.count * self.ivf_nprobe / len(self.ivf['centroids']):
+            probed = np.intersect1d(rows, self._probe(query), assume_unique=True)
+            if len(probed) >= top_k:
+                rows = probed
+        return rows, remaining
+
+    @staticmethod
+    def _matches(doc: Document, filter_dict: Dict) -> bool:
+        """Match a document against the filter terms left after the index"""
+        return matches_filter({**doc.metadata, 'doc_type': doc.doc_type}, filter_dict)
+
+    def search(self, query: str, top_k: int = 5, filter_dict: Optional[Dict] = None) -> List[RetrievedDocument]:
+        """Search for documents similar to query"""
+        query_embedding = self.embedding_generator.embed_query(query)
+        return self.search_by_embedding(query_embedding, top_k, filter_dict)
+
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> List[RetrievedDocument]:
+        """Search for documents similar to a precomputed query embedding"""
+        return self.search_by_embeddings([query_embedding], top_k, filter_dict)[0]
+
+    def search_by_embeddings(
+        self,
+        query_embeddings: Sequence[List[float]],
+        top_k: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> List[List[RetrievedDocument]]:
+        """Search for several query embeddings at once with one batched matmul"""
+        if self.count == 0 or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        if self.ivf is None:
+            rows, remaining = self._candidate_rows(None, filter_dict, top_k)
+            # Over-fetch when some filter terms can only be checked per document
+            fetch = top_k * 8 if remaining else top_k
+            candidates = [rows] * len(queries)
+            hits = self._exact_top_k(queries, fetch, rows)
+        else:
+            candidates, hits = [], []
+            for query in queries:
+                rows, remaining = self._candidate_rows(query, filter_dict, top_k)
+                fetch = top_k * 8 if remaining else top_k
+                candidates.append(rows)
+                hits.extend(self._exact_top_k(query[None, :], fetch, rows))
+
+        results = []
+        for query, rows, (hit_rows, hit_scores) in zip(queries, candidates, hits):
+            docs = self._post_filter(hit_rows, hit_scores, remaining, top_k)
+            if remaining and len(docs) < top_k:
+                docs = self._widen(query, rows, filter_dict, remaining, top_k, fetch, len(hit_rows), docs)
+            results.append(docs)
+
+        return results
+
+    def _post_filter(self, hit_rows: np.ndarray, hit_scores: np.ndarray, remaining: Dict,
+                     top_k: int) -> List[RetrievedDocument]:
+        """The first ``top_k`` hits that pass the per-document filter terms"""
+        docs = []
+        for row, score in zip(hit_rows, hit_scores):
+            doc = self.documents[int(row)]
+            if remaining and not self._matches(doc, remaining):
+                continue
+            docs.append(RetrievedDocument(
+                content=doc.content,
+                metadata=doc.metadata,
+                doc_type=doc.doc_type,
+                doc_id=doc.doc_id,
+                score=float(score)
+            ))
+            if len(docs) == top_k:
+                break
+        return docs
+
+    def _widen(self, query: np.ndarray, rows: Optional[np.ndarray], filter_dict: Dict, remaining: Dict,
+               top_k: int, fetch: int, fetched: int, docs: List[RetrievedDocument]) -> List[RetrievedDocument]:
+        """Re-fetch a post-filtered query with a growing fetch until ``top_k`` pass
+
+        Stops once every candidate row has been scored; with IVF the probed
+        lists are followed by a scan of every row the filter index allows.
+        """
+        full_scan = self.ivf is None
+        while len(docs) < top_k:
+            if fetched == fetch:
+                # Every fetched row was used, so more candidates may match
+                fetch *= 4
+            elif not full_scan:
+                rows, _ = self._candidate_rows(None, filter_dict, top_k)
+                full_scan = True
+            else:
+                break
+            (hit_rows, hit_scores), = self._exact_top_k(query[None, :], fetch, rows)
+            fetched = len(hit_rows)
+            docs = self._post_filter(hit_rows, hit_scores, remaining, top_k)
+        return docs
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """Get statistics about the collection"""
+        float_bytes = self.count * self.dimension * 4
+        resident_bytes = self.codes.nbytes if self.codes is not None else float_bytes
+        return {
+            'total_documents': self.count,
+            'collection_name': self.collection_name,
+            'backend': 'numpy',
+            'index': 'ivf' if self.ivf is not None else 'flat',
+            'quantization': self.quantizer.kind if self.quantizer is not None else 'none',
+            'vector_memory_mb': round(resident_bytes / (1024 * 1024), 2),
+            'float_vectors_mb': round(float_bytes / (1024 * 1024), 2),
+            'metadata_index': self.metadata_index.get_stats()
+        }
+
+    def clear_collection(self):
+        """Clear all documents from collection"""
+        self.documents.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._load()
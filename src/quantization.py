@@ -0,0 +1,174 @@
+"""
+Vector compression: int8 scalar quantization and product quantization
+"""
+from typing import Dict
+
+import numpy as np
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain (Euclidean) k-means; returns float32 centroids"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c
+        distances = (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+        assignment = np.argmin(distances, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=k)
+
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+
+    return centroids
+
+
+class Quantizer:
+    """Base class: encode float vectors to compact codes and score queries against codes"""
+
+    kind = "none"
+
+    def train(self, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner products, shape (len(queries), len(codes))"""
+        raise NotImplementedError
+
+    def code_bytes(self, dimension: int) -> int:
+        """Bytes per encoded vector"""
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "Quantizer":
+        raise NotImplementedError
+
+
+class ScalarQuantizer(Quantizer):
+    """Per-dimension affine int8 quantization (4x smaller than float32)
+
+    Scores are computed asymmetrically: the query stays float and the dot
+    product with ``offset + scale * (code + 128)`` is folded into one matmul
+    over the int8 codes plus a per-query constant.
+    """
+
+    kind = "int8"
+
+    def __init__(self):
+        self.offset = None
+        self.scale = None
+
+    def train(self, vectors: np.ndarray):
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = low.astype(np.float32)
+        self.scale = (np.maximum(high - low, 1e-12) / 255.0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        levels = np.rint((vectors - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        weighted = queries * self.scale
+        constant = queries @ self.offset + 128.0 * weighted.sum(axis=1)
+        return weighted @ codes.astype(np.float32).T + constant[:, None]
+
+    def code_bytes(self, dimension: int) -> int:
+        return dimension
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'offset': self.offset, 'scale': self.scale}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ScalarQuantizer":
+        quantizer = cls()
+        quantizer.offset = state['offset']
+        quantizer.scale = state['scale']
+        return quantizer
+
+
+class ProductQuantizer(Quantizer):
+    """Product quantization with 256 centroids per subspace (one byte per subspace)
+
+    A vector of ``dimension`` floats is split into ``subspaces`` slices and
+    each slice is replaced by the id of its nearest sub-centroid. At query
+    time a (subspaces, 256) table of query-slice x centroid inner products
+    is built once, and a code's score is the sum of its table entries
+    (asymmetric distance computation).
+    """
+
+    kind = "pq"
+    CENTROIDS = 256
+
+    def __init__(self, subspaces: int = 96):
+        self.subspaces = subspaces
+        self.codebooks = None  # (subspaces, 256, sub_dim)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dimension = vectors.shape
+        if dimension % self.subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible by {self.subspaces} subspaces")
+        return vectors.reshape(n, self.subspaces, dimension // self.subspaces)
+
+    def train(self, vectors: np.ndarray, iterations: int = 10):
+        parts = self._split(vectors.astype(np.float32))
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(parts[:, j]), self.CENTROIDS, iterations, seed=j)
+            for j in range(self.subspaces)
+        ])
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(vectors.astype(np.float32))
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            codebook = self.codebooks[j]
+            distances = (codebook ** 2).sum(axis=1) - 2 * parts[:, j] @ codebook.T
+            codes[:, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # tables[q, j, c] = <query q slice j, centroid c of subspace j>
+        tables = np.einsum('qjd,jcd->qjc', self._split(queries), self.codebooks)
+        subspace = np.arange(self.subspaces)
+        return np.stack([table[subspace, codes].sum(axis=1) for table in tables])
+
+    def code_bytes(self, dimension: int) -> int:
+        return self.subspaces
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'codebooks': self.codebooks}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        quantizer = cls(subspaces=state['codebooks'].shape[0])
+        quantizer.codebooks = state['codebooks']
+        return quantizer
+
+
+def create_quantizer(kind: str, pq_subspaces: int = 96) -> Quantizer:
+    """Build an untrained quantizer for ``vector_db.quantization``"""
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(pq_subspaces)
+    raise ValueError(f"Unknown quantization: {kind}")
+
+
+def load_quantizer(kind: str, state: Dict[str, np.ndarray]) -> Quantizer:
+    """Rebuild a trained quantizer from its saved state"""
+    classes = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+    if kind not in classes:
+        raise ValueError(f"Unknown quantization: {kind}")
+    return classes[kind].from_state(state)
@@ -1,34 +1,65 @@
 """
 Complete RAG pipeline
 """
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import yaml
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Sequence
 
-from src.vector_store import ChromaVectorStore, ChromaRetriever
+from src.vector_store import create_vector_store, create_retriever
+from src.http_client import get_http_stats
 from src.llm import LLMGenerator
+from src.llm_backends import DeadlineExceeded
+from src.metrics import LatencyRecorder
 from src.retriever import RetrievedDocument
 
 
 class RAGPipeline:
-    """End-to-end RAG pipeline"""
+    """End-to-end RAG pipeline
+    
+    ``query`` blocks and suits scripts; ``aquery`` is the same pipeline for
+    the API: embedding and generation await async clients, and the
+    CPU-bound vector/BM25 search runs on a bounded thread pool so it never
+    stalls the event loop.
+    """
     
     def __init__(self, config_path: str = "config/config.yaml"):
         with open(config_path, 'r') as f:
             self.config = yaml.safe_load(f)
         
         # Initialize components
-        self.vector_store = ChromaVectorStore(config_path)
-        self.retriever = ChromaRetriever(
-            self.vector_store,
-            top_k=self.config['retrieval']['top_k']
-        )
+        self.vector_store = create_vector_store(config_path)
+        self.retriever = create_retriever(self.vector_store, config_path)
         self.llm_generator = LLMGenerator(config_path)
+        
+        self.retrieval_executor = ThreadPoolExecutor(
+            max_workers=self.config['retrieval'].get('executor_workers', 4),
+            thread_name_prefix="retrieval"
+        )
+        self.latency = LatencyRecorder()
+        deadline_ms = self.config['retrieval'].get('deadline_ms')
+        self.retrieval_deadline = deadline_ms / 1000 if deadline_ms else None
+        
+        # query_batch: queries embedded and searched per chunk, LLM calls bounded
+        self.batch_size = self.config['retrieval'].get('batch_size', 64)
+        self.batch_concurrency = self.config['llm'].get('batch_concurrency', 8)
+    
+    @staticmethod
+    def _filter_dict(filter_type: Optional[str], filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Combine the doc type shortcut and a metadata filter into one filter"""
+        if filter_type:
+            return {**(filters or {}), 'doc_type': filter_type}
+        return filters or None
     
     def query(
         self, 
         query: str,
         return_sources: bool = True,
-        filter_type: Optional[str] = None
+        filter_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict[str, Any]:
         """
         Process a query through the RAG pipeline
@@ -37,44 +68,322 @@ class RAGPipeline:
             query: User question
             return_sources: Whether to include source documents
             filter_type: Filter by document type ('product', 'review', 'policy')
+            filters: Metadata filter, e.g. {"price_value": {"$lte": 100}}
+            query_embedding: Embedding of ``query`` if the caller already has it
         
         Returns:
             Dictionary with answer and optionally sources
         """
         
+        start_time = time.perf_counter()
+        
         # Retrieve relevant documents
-        if filter_type:
-            retrieved_docs = self.retriever.retrieve_by_type(query, filter_type)
-        else:
-            retrieved_docs = self.retriever.retrieve(query)
+        retrieved_docs = self.retriever.retrieve_filtered(
+            query, self._filter_dict(filter_type, filters), query_embedding
+        )
+        retrieved_time = time.perf_counter()
         
         # Generate answer with sources
         result = self.llm_generator.generate_answer_with_sources(query, retrieved_docs)
         
-        if not return_sources:
-            return {'answer': result['answer'], 'query': query}
+        self._observe_stages(start_time, retrieved_time)
+        return self._format_result(query, result, return_sources)
+    
+    async def aquery(
+        self,
+        query: str,
+        return_sources: bool = True,
+        filter_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Async version of ``query`` with the same arguments and result"""
+        start_time = time.perf_counter()
+        retrieved_docs = await self._aretrieve(query, filter_type, filters)
+        retrieved_time = time.perf_counter()
+        result = await self.llm_generator.agenerate_answer_with_sources(query, retrieved_docs)
         
-        # Format sources for output
-        formatted_sources = []
-        for doc, source_info in zip(retrieved_docs, result['sources']):
-            formatted_source = {
-                'type': source_info['type'],
-                'score': source_info['score'],
-                'content_preview': doc.content[:200] + "..." if len(doc.content) > 200 else doc.content,
-                'metadata': source_info['metadata']
+        self._observe_stages(start_time, retrieved_time)
+        return self._format_result(query, result, return_sources)
+    
+    async def _aretrieve(
+        self,
+        query: str,
+        filter_type: Optional[str],
+        filters: Optional[Dict[str, Any]]
+    ) -> List[RetrievedDocument]:
+        """Embed on the event loop, search on the retrieval thread pool,
+        within ``retrieval.deadline_ms``"""
+        async def retrieve():
+            # Shielded: on a timeout the embedding still completes for requests
+            # coalesced onto it, and is cached for a retry
+            query_embedding = await asyncio.shield(
+                self.vector_store.embedding_generator.aembed_query(query)
+            )
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.retrieval_executor,
+                self.retriever.retrieve_filtered,
+                query,
+                self._filter_dict(filter_type, filters),
+                query_embedding
+            )
+        
+        try:
+            return await asyncio.wait_for(retrieve(), self.retrieval_deadline)
+        except asyncio.TimeoutError:
+            self.latency.observe('retrieval_deadline_exceeded', self.retrieval_deadline)
+            raise DeadlineExceeded(f"Retrieval exceeded its {self.retrieval_deadline:.1f}s deadline")
+    
+    def _observe_stages(self, start_time: float, retrieved_time: float):
+        """Record retrieval, generation and total latency of one query"""
+        end_time = time.perf_counter()
+        self.latency.observe('retrieval', retrieved_time - start_time)
+        self.latency.observe('generation', end_time - retrieved_time)
+        self.latency.observe('query', end_time - start_time)
+    
+    def _answer(
+        self,
+        query: str,
+        retrieved_docs: List[RetrievedDocument],
+        return_sources: bool
+    ) -> Dict[str, Any]:
+        """Generate one batch answer; a failure is reported in the result, not raised"""
+        try:
+            result = self.llm_generator.generate_answer_with_sources(query, retrieved_docs)
+        except Exception as e:
+            return {'query': query, 'error': str(e)}
+        return self._format_result(query, result, return_sources)
+    
+    async def _aanswer(
+        self,
+        query: str,
+        retrieved_docs: List[RetrievedDocument],
+        return_sources: bool
+    ) -> Dict[str, Any]:
+        try:
+            result = await self.llm_generator.agenerate_answer_with_sources(query, retrieved_docs)
+        except Exception as e:
+            return {'query': query, 'error': str(e)}
+        return self._format_result(query, result, return_sources)
+    
+    def query_batch(
+        self,
+        queries: Sequence[str],
+        return_sources: bool = True,
+        filter_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Answer many queries, in order
+        
+        All queries are embedded with batched requests and searched with one
+        multi-query vector search; answers are then generated by up to
+        ``llm.batch_concurrency`` concurrent LLM calls. A query whose
+        generation fails gets ``{'query': ..., 'error': ...}``.
+        """
+        query_embeddings = self.vector_store.embedding_generator.embed_queries(queries)
+        retrieved = self.retriever.retrieve_batch(queries, self._filter_dict(filter_type, filters), query_embeddings)
+        
+        with ThreadPoolExecutor(max_workers=self.batch_concurrency) as executor:
+            return list(executor.map(
+                lambda query, docs: self._answer(query, docs, return_sources), queries, retrieved
+            ))
+    
+    async def aquery_batch(
+        self,
+        queries: Sequence[str],
+        return_sources: bool = True,
+        filter_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async ``query_batch`` that yields each result as soon as it is ready
+        
+        Results carry their position in ``queries`` as ``index`` and arrive
+        in completion order. Queries are embedded and searched ``batch_size``
+        at a time, so generation for the first chunk starts while later
+        chunks are still being retrieved.
+        """
+        filter_dict = self._filter_dict(filter_type, filters)
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        results: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+        loop = asyncio.get_running_loop()
+        
+        async def answer(index: int, query: str, retrieved_docs: List[RetrievedDocument]):
+            async with semaphore:
+                result = await self._aanswer(query, retrieved_docs, return_sources)
+            await results.put({'index': index, **result})
+        
+        async def produce():
+            try:
+                for start in range(0, len(queries), self.batch_size):
+                    chunk = list(queries[start:start + self.batch_size])
+                    query_embeddings = await self.vector_store.embedding_generator.aembed_queries(chunk)
+                    retrieved = await loop.run_in_executor(
+                        self.retrieval_executor, self.retriever.retrieve_batch, chunk, filter_dict, query_embeddings
+                    )
+                    for offset, (query, docs) in enumerate(zip(chunk, retrieved)):
+                        tasks.append(asyncio.create_task(answer(start + offset, query, docs)))
+            except Exception as e:
+                # Embedding or search failed for the whole batch; surface it to the consumer
+                await results.put(e)
+        
+        producer = asyncio.create_task(produce())
+        try:
+            for _ in range(len(queries)):
+                item = await results.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stop outstanding work if the consumer goes away (e.g. client disconnect)
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+    
+    def stream_query(
+        self,
+        query: str,
+        return_sources: bool = True,
+        filter_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a query as events: ``sources`` as soon as retrieval is done,
+        then one ``token`` per LLM delta, then ``done`` with the full answer
+        and its timings (time to first byte/token, total)
+        """
+        start_time = time.perf_counter()
+        retrieved_docs = self.retriever.retrieve_filtered(query, self._filter_dict(filter_type, filters))
+        context, sources, context_stats = self.llm_generator.build_context(retrieved_docs)
+        
+        # Measured before yielding: a slow consumer must not inflate it
+        ttfb = time.perf_counter() - start_time
+        yield self._sources_event(query, sources, context_stats, return_sources)
+        
+        tokens, ttft, answered_by = [], None, None
+        for token in self.llm_generator.stream_answer(query, context):
+            if ttft is None:
+                ttft = time.perf_counter() - start_time
+                # Read with the first token: later steps may run in another context
+                answered_by = self.llm_generator.answered_by()
+            tokens.append(token)
+            yield {'event': 'token', 'data': {'text': token}}
+        
+        yield self._done_event(start_time, ttfb, ttft, tokens, answered_by or self.llm_generator.answered_by())
+    
+    async def astream_query(
+        self,
+        query: str,
+        return_sources: bool = True,
+        filter_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of ``stream_query`` with the same events"""
+        start_time = time.perf_counter()
+        retrieved_docs = await self._aretrieve(query, filter_type, filters)
+        context, sources, context_stats = self.llm_generator.build_context(retrieved_docs)
+        
+        # Measured before yielding: a slow consumer must not inflate it
+        ttfb = time.perf_counter() - start_time
+        yield self._sources_event(query, sources, context_stats, return_sources)
+        
+        tokens, ttft, answered_by = [], None, None
+        async for token in self.llm_generator.astream_answer(query, context):
+            if ttft is None:
+                ttft = time.perf_counter() - start_time
+                # Read with the first token: later steps may run in another context
+                answered_by = self.llm_generator.answered_by()
+            tokens.append(token)
+            yield {'event': 'token', 'data': {'text': token}}
+        
+        yield self._done_event(start_time, ttfb, ttft, tokens, answered_by or self.llm_generator.answered_by())
+    
+    def _sources_event(
+        self,
+        query: str,
+        sources: List[dict],
+        context_stats: Dict[str, Any],
+        return_sources: bool
+    ) -> Dict[str, Any]:
+        data = {'query': query, 'num_sources': len(sources), 'context': context_stats}
+        if return_sources:
+            data['sources'] = self._format_sources(sources)
+        return {'event': 'sources', 'data': data}
+    
+    def _done_event(self, start_time: float, ttfb: float, ttft: Optional[float], tokens: List[str],
+                    answered_by: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the stream's timings and build the final event"""
+        total = time.perf_counter() - start_time
+        self.latency.observe('stream_ttfb', ttfb)
+        if ttft is not None:
+            self.latency.observe('stream_ttft', ttft)
+        self.latency.observe('stream_total', total)
+        return {
+            'event': 'done',
+            'data': {
+                'answer': "".join(tokens),
+                **answered_by,
+                'ttfb_ms': round(ttfb * 1000, 2),
+                'ttft_ms': round(ttft * 1000, 2) if ttft is not None else None,
+                'total_ms': round(total * 1000, 2)
             }
-            formatted_sources.append(formatted_source)
+        }
+    
+    def _format_result(
+        self,
+        query: str,
+        result: Dict[str, Any],
+        return_sources: bool
+    ) -> Dict[str, Any]:
+        """Shape the generator output into the API response"""
+        if not return_sources:
+            return {'answer': result['answer'], 'query': query, 'context': result['context'],
+                    'model': result['model'], 'fallback': result['fallback']}
+        
+        formatted_sources = self._format_sources(result['sources'])
         
         return {
             'answer': result['answer'],
             'query': query,
             'sources': formatted_sources,
-            'num_sources': len(formatted_sources)
+            'num_sources': len(formatted_sources),
+            'context': result['context'],
+            'model': result['model'],
+            'fallback': result['fallback']
         }
     
+    @staticmethod
+    def _format_sources(sources: List[dict]) -> List[Dict[str, Any]]:
+        """Sources for output, with a content preview
+        
+        Each source carries its own preview, since the context builder may
+        drop retrieved documents and ``sources`` no longer lines up with them.
+        """
+        return [
+            {
+                'type': source_info['type'],
+                'score': source_info['score'],
+                'content_preview': source_info['content_preview'],
+                'metadata': source_info['metadata']
+            }
+            for source_info in sources
+        ]
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get pipeline statistics"""
-        return self.vector_store.get_collection_stats()
+        stats = self.vector_store.get_collection_stats()
+        stats['query_embedding_cache'] = self.vector_store.embedding_generator.get_query_cache_stats()
+        stats['latency'] = self.latency.get_stats()
+        stats['context'] = self.llm_generator.context_builder.get_stats()
+        stats['llm'] = self.llm_generator.backend.get_stats()
+        stats['http'] = get_http_stats()
+        return stats
+    
+    def close(self):
+        """Shut down the retrieval executor"""
+        self.retrieval_executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
@@ -2,8 +2,10 @@
 RAG pipeline with caching
 """
 from src.rag_pipeline import RAGPipeline
-from src.cache import SimpleCache
+from src.cache import create_cache
+from src.semantic_cache import SemanticCache
 from typing import Dict, Any, Optional
+import json
 import time
 
 
@@ -13,12 +15,25 @@ class CachedRAGPipeline(RAGPipeline):
     def __init__(self, config_path: str = "config/config.yaml", enable_cache: bool = True):
         super().__init__(config_path)
         self.enable_cache = enable_cache
-        self.cache = SimpleCache() if enable_cache else None
+        self.cache = create_cache(self.config.get('cache', {})) if enable_cache else None
+        
+        # Second tier: answers to paraphrases of earlier questions
+        semantic_config = self.config.get('cache', {}).get('semantic', {})
+        self.semantic_cache = None
+        if enable_cache and semantic_config.get('enabled', False):
+            self.semantic_cache = SemanticCache(
+                dimension=self.config['embeddings']['dimension'],
+                threshold=semantic_config.get('threshold', 0.9),
+                max_entries=semantic_config.get('max_entries', 10000),
+                ttl_seconds=self.config['cache'].get('ttl_hours', 24) * 3600
+            )
         
         # Performance metrics
         self.metrics = {
             'total_queries': 0,
             'cache_hits': 0,
+            'exact_cache_hits': 0,
+            'semantic_cache_hits': 0,
             'cache_misses': 0,
             'avg_latency_ms': 0,
             'total_latency_ms': 0
@@ -29,48 +44,79 @@ class CachedRAGPipeline(RAGPipeline):
         query: str,
         return_sources: bool = True,
         filter_type: Optional[str] = None,
-        use_cache: bool = True
+        use_cache: bool = True,
+        filters: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Query with caching support
+        
+        The exact cache is tried first, then the semantic cache, which
+        answers paraphrases of earlier questions with the same filter.
         """
         start_time = time.time()
+        use_cache = use_cache and self.enable_cache
+        cache_key = self._cache_key(query, filter_type, filters)
+        filter_key = self._filter_key(filter_type, filters)
+        query_embedding = None
         
         # Try cache first
-        if use_cache and self.enable_cache:
-            cached_result = self.cache.get(query)
+        if use_cache:
+            cached_result = self.cache.get(cache_key)
             if cached_result is not None:
-                # Cache hit
-                self.metrics['cache_hits'] += 1
-                self.metrics['total_queries'] += 1
-                
-                latency_ms = (time.time() - start_time) * 1000
-                self.metrics['total_latency_ms'] += latency_ms
-                self.metrics['avg_latency_ms'] = self.metrics['total_latency_ms'] / self.metrics['total_queries']
-                
-                cached_result['from_cache'] = True
-                cached_result['latency_ms'] = round(latency_ms, 2)
-                return cached_result
+                self.metrics['exact_cache_hits'] += 1
+                return self._cache_hit(cached_result, start_time)
+            
+            if self.semantic_cache is not None:
+                # Reused by retrieval after a miss instead of embedding the query twice
+                query_embedding = self.vector_store.embedding_generator.embed_query(query)
+                cached_result = self.semantic_cache.lookup(query, query_embedding, filter_key)
+                if cached_result is not None:
+                    self.metrics['semantic_cache_hits'] += 1
+                    cached_result['query'] = query
+                    return self._cache_hit(cached_result, start_time)
         
         # Cache miss - run actual query
-        result = super().query(query, return_sources, filter_type)
+        result = super().query(query, return_sources, filter_type, filters, query_embedding=query_embedding)
         
         # Update metrics
         self.metrics['cache_misses'] += 1
+        self._record_latency(start_time, result, from_cache=False)
+        
+        # Cache the result
+        if use_cache:
+            self.cache.set(cache_key, result)
+            if self.semantic_cache is not None:
+                self.semantic_cache.add(query, query_embedding, dict(result), filter_key)
+        
+        return result
+    
+    def _cache_hit(self, cached_result: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        self.metrics['cache_hits'] += 1
+        self._record_latency(start_time, cached_result, from_cache=True)
+        return cached_result
+    
+    def _record_latency(self, start_time: float, result: Dict[str, Any], from_cache: bool):
         self.metrics['total_queries'] += 1
         
         latency_ms = (time.time() - start_time) * 1000
         self.metrics['total_latency_ms'] += latency_ms
         self.metrics['avg_latency_ms'] = self.metrics['total_latency_ms'] / self.metrics['total_queries']
         
-        result['from_cache'] = False
+        result['from_cache'] = from_cache
         result['latency_ms'] = round(latency_ms, 2)
-        
-        # Cache the result
-        if use_cache and self.enable_cache:
-            self.cache.set(query, result)
-        
-        return result
+    
+    @staticmethod
+    def _filter_key(filter_type: Optional[str], filters: Optional[Dict[str, Any]]) -> str:
+        """Canonical form of the filters, empty when unfiltered"""
+        if not filter_type and not filters:
+            return ""
+        return json.dumps({'filter_type': filter_type, 'filters': filters}, sort_keys=True)
+    
+    @staticmethod
+    def _cache_key(query: str, filter_type: Optional[str], filters: Optional[Dict[str, Any]]) -> str:
+        """Filtered queries must not share a cache entry with the unfiltered one"""
+        filter_key = CachedRAGPipeline._filter_key(filter_type, filters)
+        return f"{query}\n{filter_key}" if filter_key else query
     
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get performance metrics"""
@@ -78,10 +124,16 @@ class CachedRAGPipeline(RAGPipeline):
         if self.metrics['total_queries'] > 0:
             cache_hit_rate = (self.metrics['cache_hits'] / self.metrics['total_queries']) * 100
         
+        semantic_hit_rate = 0
+        if self.metrics['total_queries'] > 0:
+            semantic_hit_rate = (self.metrics['semantic_cache_hits'] / self.metrics['total_queries']) * 100
+        
         metrics = {
             **self.metrics,
             'cache_hit_rate_pct': round(cache_hit_rate, 2),
-            'cache_stats': self.cache.get_stats() if self.cache else None
+            'semantic_hit_rate_pct': round(semantic_hit_rate, 2),
+            'cache_stats': self.cache.get_stats() if self.cache else None,
+            'semantic_cache_stats': self.semantic_cache.get_stats() if self.semantic_cache else None
         }
         
         return metrics
@@ -90,7 +142,15 @@ class CachedRAGPipeline(RAGPipeline):
         """Clear the cache"""
         if self.cache:
             self.cache.clear()
+            if self.semantic_cache:
+                self.semantic_cache.clear()
             print("✓ Cache cleared")
+    
+    def close(self):
+        """Flush queued cache writes and release resources"""
+        if self.cache:
+            self.cache.close()
+        super().close()
 
 
 if __name__ == "__main__":
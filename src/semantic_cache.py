@@ -0,0 +1,150 @@
+"""
+Semantic response cache: reuse answers of near-identical past questions
+"""
+import re
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+import numpy as np
+
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+PRICE_BOUNDS = {
+    'under': '<', 'below': '<', 'less': '<', 'cheaper': '<',
+    'over': '>', 'above': '>', 'more': '>', 'least': '>'
+}
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def query_constraints(query: str) -> FrozenSet[str]:
+    """Numbers and price-bound directions in a query
+
+    Paraphrases must agree on these exactly: "laptops under $800" and
+    "laptops under $1000", or "under $800" and "over $800", embed almost
+    identically but need different answers. Numbers are compared without
+    thousands separators or trailing zero decimals, so "$1,000" matches
+    "1000 dollars".
+    """
+    numbers = set()
+    for match in NUMBER_PATTERN.findall(query):
+        number = match.replace(",", "")
+        if "." in number:
+            number = number.rstrip("0").rstrip(".")
+        numbers.add(number)
+    bounds = {PRICE_BOUNDS[word] for word in WORD_PATTERN.findall(query.lower()) if word in PRICE_BOUNDS}
+    return frozenset(numbers | bounds)
+
+
+class SemanticCache:
+    """Answers of past questions, looked up by query-embedding similarity
+
+    Normalized query embeddings live in a fixed-capacity matrix; a lookup
+    is one matrix-vector product over the entries with the same filter.
+    The best match is returned when its cosine similarity reaches
+    ``threshold`` and its numbers and price bounds equal the new query's.
+    When full, the oldest entry is overwritten.
+    """
+
+    def __init__(self, dimension: int, threshold: float = 0.9, max_entries: int = 10000,
+                 ttl_seconds: float = 86400):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        # Filter of each row as a small integer code (-1 = empty row)
+        self._filter_codes = np.full(max_entries, -1, dtype=np.int32)
+        self._codes: Dict[str, int] = {}
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._next = 0
+        self._size = 0
+        self.stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'guardrail_rejections': 0, 'expired': 0}
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, query: str, embedding: Sequence[float], filter_key: str = "") -> Optional[Dict[str, Any]]:
+        """Cached response for the most similar past query, or None
+
+        The returned dict is the stored response plus ``cached_query`` and
+        ``similarity``.
+        """
+        vector = self._normalize(embedding)
+        constraints = query_constraints(query)
+        now = time.time()
+
+        with self._lock:
+            self.stats['lookups'] += 1
+            code = self._codes.get(filter_key)
+            rows = np.flatnonzero(self._filter_codes == code) if code is not None else []
+            if len(rows) == 0:
+                self.stats['misses'] += 1
+                return None
+
+            scores = self._vectors[rows] @ vector
+            # Walk down the ranking so a guardrail rejection can fall back to the next match
+            for position in np.argsort(-scores):
+                if scores[position] < self.threshold:
+                    break
+                row = rows[position]
+                entry = self._entries[row]
+                if entry['expires_at'] <= now:
+                    self._evict(row)
+                    self.stats['expired'] += 1
+                    continue
+                if entry['constraints'] != constraints:
+                    self.stats['guardrail_rejections'] += 1
+                    continue
+                self.stats['hits'] += 1
+                return {
+                    **entry['response'],
+                    'cached_query': entry['query'],
+                    'similarity': round(float(scores[position]), 4)
+                }
+
+            self.stats['misses'] += 1
+            return None
+
+    def add(self, query: str, embedding: Sequence[float], response: Dict[str, Any], filter_key: str = ""):
+        """Remember the response to a query"""
+        with self._lock:
+            row = self._next
+            self._next = (self._next + 1) % self.max_entries
+            if self._entries[row] is None:
+                self._size += 1
+            self._vectors[row] = self._normalize(embedding)
+            self._filter_codes[row] = self._codes.setdefault(filter_key, len(self._codes))
+            self._entries[row] = {
+                'query': query,
+                'constraints': query_constraints(query),
+                'response': response,
+                'expires_at': time.time() + self.ttl_seconds
+            }
+
+    def _evict(self, row: int):
+        self._filter_codes[row] = -1
+        self._entries[row] = None
+        self._size -= 1
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._filter_codes.fill(-1)
+            self._codes.clear()
+            self._entries = [None] * self.max_entries
+            self._next = 0
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, guardrail rejections and entry count"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = self._size
+        stats['hit_rate_pct'] = round(stats['hits'] / stats['lookups'] * 100, 2) if stats['lookups'] else 0.0
+        stats['threshold'] = self.threshold
+        return stats
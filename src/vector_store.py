@@ -3,7 +3,9 @@ ChromaDB vector store integration
 """
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
+import json
+import math
 import yaml
 import os
 from tqdm import tqdm
@@ -11,6 +13,10 @@ from tqdm import tqdm
 from src.embeddings import EmbeddingGenerator
 from src.retriever import Retriever, RetrievedDocument
 from src.data_processor import Document
+from src.document_store import document_hash, iter_batches
+from src.metadata_index import category_levels, matches_filter, strip_category_levels, to_chroma_where
+from src.bm25_index import BM25Index
+from src.numpy_vector_store import NumpyVectorStore
 
 
 class ChromaVectorStore:
@@ -22,12 +28,14 @@ class ChromaVectorStore:
         
         persist_dir = self.config['vector_db']['persist_directory']
         collection_name = self.config['vector_db']['collection_name']
+        # doc_id -> content hash of everything indexed, for incremental sync
+        self.manifest_path = os.path.join(persist_dir, f"{collection_name}.manifest.json")
         
-        # Initialize ChromaDB client
-        self.client = chromadb.Client(Settings(
-            persist_directory=persist_dir,
-            anonymized_telemetry=False
-        ))
+        # Persistent client: the collection lives on disk next to its manifest
+        self.client = chromadb.PersistentClient(
+            path=persist_dir,
+            settings=Settings(anonymized_telemetry=False)
+        )
         
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
@@ -37,58 +45,175 @@ class ChromaVectorStore:
         
         self.embedding_generator = EmbeddingGenerator(config_path)
     
-    def add_documents(self, documents: List[Document], batch_size: int = 100):
-        """Add documents to vector store"""
+    def add_documents(self, documents: Sequence[Document], batch_size: int = 1000):
+        """Add documents to vector store
+        
+        ``documents`` may be a list or a DocumentStore; it is consumed one
+        batch at a time, so the full corpus is never held in memory. Each
+        batch is embedded with several concurrent API requests. Existing
+        ids are overwritten rather than duplicated.
+        """
         print(f"Adding {len(documents)} documents to vector store...")
         
-        for i in tqdm(range(0, len(documents), batch_size), desc="Indexing"):
-            batch = documents[i:i + batch_size]
-            
-            # Prepare batch data
-            ids = [doc.doc_id for doc in batch]
-            contents = [doc.content for doc in batch]
-            metadatas = [doc.metadata for doc in batch]
-            
-            # Generate embeddings
-            embeddings = self.embedding_generator.generate_embeddings_batch(contents)
-            
-            # Add to collection
-            self.collection.add(
-                ids=ids,
-                documents=contents,
-                embeddings=embeddings,
-                metadatas=metadatas
-            )
+        manifest = self.load_manifest()
+        num_batches = math.ceil(len(documents) / batch_size)
+        for batch in tqdm(iter_batches(documents, batch_size), total=num_batches, desc="Indexing"):
+            # Ids must be unique within one upsert call; the last one wins
+            batch = list({doc.doc_id: doc for doc in batch}.values())
+            self._upsert(batch)
+            manifest.update((doc.doc_id, document_hash(self._indexed(doc))) for doc in batch)
         
+        self.save_manifest(manifest)
         print(f"✓ Added {len(documents)} documents to vector store")
     
+    @staticmethod
+    def _indexed(doc: Document) -> Document:
+        """The document as stored: with the category path levels ``to_chroma_where`` filters on"""
+        metadata = {**doc.metadata, **category_levels(doc.metadata.get('category'))}
+        return Document(doc.content, metadata, doc.doc_type, doc.doc_id)
+    
+    def _upsert(self, batch: List[Document]):
+        """Embed and write one batch, replacing documents with the same ids"""
+        contents = [doc.content for doc in batch]
+        # doc_type must be in metadata for where={"doc_type": ...} filters
+        metadatas = [{**self._indexed(doc).metadata, 'doc_type': doc.doc_type} for doc in batch]
+        embeddings = self.embedding_generator.generate_embeddings_batch(contents)
+        
+        self.collection.upsert(
+            ids=[doc.doc_id for doc in batch],
+            documents=contents,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+    
+    def sync_documents(self, documents: Sequence[Document], batch_size: int = 1000) -> Dict[str, int]:
+        """Bring the collection in line with ``documents`` without a rebuild
+        
+        Documents are diffed by ``doc_id`` and content hash against the
+        manifest: only new or changed documents are embedded and upserted,
+        and ids no longer present are deleted. The collection stays
+        queryable throughout, since nothing is dropped or recreated.
+        """
+        manifest = self.load_manifest()
+        stats = {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'duplicate_ids': 0}
+        seen = set()
+        
+        num_batches = math.ceil(len(documents) / batch_size)
+        for batch in tqdm(iter_batches(documents, batch_size), total=num_batches, desc="Syncing"):
+            changed = []
+            for doc in batch:
+                if doc.doc_id in seen:
+                    stats['duplicate_ids'] += 1
+                    continue
+                seen.add(doc.doc_id)
+                
+                # Hashes cover the stored metadata, so a store indexed without
+                # category levels is re-upserted once
+                digest = document_hash(self._indexed(doc))
+                previous = manifest.get(doc.doc_id)
+                if previous == digest:
+                    stats['unchanged'] += 1
+                    continue
+                stats['added' if previous is None else 'updated'] += 1
+                changed.append((doc, digest))
+            
+            if changed:
+                self._upsert([doc for doc, _ in changed])
+                manifest.update((doc.doc_id, digest) for doc, digest in changed)
+        
+        removed = [doc_id for doc_id in manifest if doc_id not in seen]
+        for ids in iter_batches(removed, batch_size):
+            self.collection.delete(ids=ids)
+            for doc_id in ids:
+                del manifest[doc_id]
+        stats['deleted'] = len(removed)
+        
+        self.save_manifest(manifest)
+        return stats
+    
+    def load_manifest(self) -> Dict[str, str]:
+        """Load the doc_id -> hash manifest
+        
+        Rebuilt from the collection if missing or if it does not describe the
+        collection (e.g. the collection was lost while the manifest survived),
+        so sync never trusts entries that are not actually indexed.
+        """
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if len(manifest) == self.collection.count():
+                return manifest
+            print(f"Manifest lists {len(manifest)} documents but the collection holds "
+                  f"{self.collection.count()}; rebuilding it from the collection")
+        
+        # Collections built before manifests existed: hash what is stored
+        manifest = {}
+        page_size = 5000
+        for offset in range(0, self.collection.count(), page_size):
+            page = self.collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            for doc_id, content, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+                metadata = dict(metadata)
+                doc_type = metadata.get('doc_type', 'unknown')
+                manifest[doc_id] = document_hash(Document(content, metadata, doc_type, doc_id))
+        return manifest
+    
+    def save_manifest(self, manifest: Dict[str, str]):
+        """Write the manifest atomically"""
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+    
     def search(self, query: str, top_k: int = 5, filter_dict: Optional[Dict] = None) -> List[RetrievedDocument]:
         """Search for documents similar to query"""
         # Generate query embedding
-        query_embedding = self.embedding_generator.generate_embedding(query)
+        query_embedding = self.embedding_generator.embed_query(query)
+        return self.search_by_embedding(query_embedding, top_k, filter_dict)
+    
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> List[RetrievedDocument]:
+        """Search for documents similar to a precomputed query embedding"""
+        return self.search_by_embeddings([query_embedding], top_k, filter_dict)[0]
+    
+    def search_by_embeddings(
+        self,
+        query_embeddings: Sequence[List[float]],
+        top_k: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> List[List[RetrievedDocument]]:
+        """Search for several query embeddings in one ChromaDB query"""
+        if len(query_embeddings) == 0:
+            return []
         
         # Search in ChromaDB
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=[list(embedding) for embedding in query_embeddings],
             n_results=top_k,
-            where=filter_dict
+            where=to_chroma_where(filter_dict)
         )
         
-        # Convert to RetrievedDocument objects
-        retrieved_docs = []
+        # Convert to RetrievedDocument objects, one list per query
+        all_docs = []
+        for q in range(len(query_embeddings)):
+            retrieved_docs = []
+            if results['ids'] and len(results['ids'][q]) > 0:
+                for i in range(len(results['ids'][q])):
+                    doc = RetrievedDocument(
+                        content=results['documents'][q][i],
+                        metadata=strip_category_levels(results['metadatas'][q][i]),
+                        doc_type=results['metadatas'][q][i].get('doc_type', 'unknown'),
+                        doc_id=results['ids'][q][i],
+                        score=1 - results['distances'][q][i]  # Convert distance to similarity
+                    )
+                    retrieved_docs.append(doc)
+            all_docs.append(retrieved_docs)
         
-        if results['ids'] and len(results['ids'][0]) > 0:
-            for i in range(len(results['ids'][0])):
-                doc = RetrievedDocument(
-                    content=results['documents'][0][i],
-                    metadata=results['metadatas'][0][i],
-                    doc_type=results['metadatas'][0][i].get('doc_type', 'unknown'),
-                    doc_id=results['ids'][0][i],
-                    score=1 - results['distances'][0][i]  # Convert distance to similarity
-                )
-                retrieved_docs.append(doc)
-        
-        return retrieved_docs
+        return all_docs
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the collection"""
@@ -100,6 +225,8 @@ class ChromaVectorStore:
     
     def clear_collection(self):
         """Clear all documents from collection"""
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
         self.client.delete_collection(self.config['vector_db']['collection_name'])
         self.collection = self.client.create_collection(
             name=self.config['vector_db']['collection_name'],
@@ -107,8 +234,21 @@ class ChromaVectorStore:
         )
 
 
+def create_vector_store(config_path: str = "config/config.yaml"):
+    """Build the vector store selected by ``vector_db.backend`` in config.yaml"""
+    with open(config_path, 'r') as f:
+        backend = yaml.safe_load(f)['vector_db'].get('backend', 'chroma')
+    
+    if backend == 'chroma':
+        return ChromaVectorStore(config_path)
+    if backend == 'numpy':
+        return NumpyVectorStore(config_path)
+    
+    raise ValueError(f"Unknown vector_db backend: {backend}")
+
+
 class ChromaRetriever(Retriever):
-    """Retriever using ChromaDB backend"""
+    """Retriever over a vector store (ChromaDB or NumPy backend)"""
     
     def __init__(self, vector_store: ChromaVectorStore, top_k: int = 5):
         super().__init__(top_k)
@@ -120,9 +260,150 @@ class ChromaRetriever(Retriever):
     
     def retrieve_by_type(self, query: str, doc_type: str) -> List[RetrievedDocument]:
         """Retrieve documents of a specific type"""
-        # Note: ChromaDB filtering syntax
-        filter_dict = {"doc_type": doc_type}
-        return self.vector_store.search(query, top_k=self.top_k, filter_dict=filter_dict)
+        return self.retrieve_filtered(query, {"doc_type": doc_type})
+    
+    def retrieve_filtered(
+        self,
+        query: str,
+        filter_dict: Optional[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None
+    ) -> List[RetrievedDocument]:
+        """Retrieve documents matching a ChromaDB-style ``where`` filter
+        
+        e.g. {"doc_type": "product", "price_value": {"$lte": 100}}. Pass
+        ``query_embedding`` when the query was already embedded (the async
+        pipeline embeds on the event loop).
+        """
+        return self._vector_search(query, self.top_k, filter_dict, query_embedding)
+    
+    def _vector_search(self, query: str, top_k: int, filter_dict: Optional[Dict[str, Any]],
+                       query_embedding: Optional[List[float]]) -> List[RetrievedDocument]:
+        if query_embedding is None:
+            return self.vector_store.search(query, top_k=top_k, filter_dict=filter_dict)
+        return self.vector_store.search_by_embedding(query_embedding, top_k, filter_dict)
+    
+    def retrieve_batch(
+        self,
+        queries: Sequence[str],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_embeddings: Optional[Sequence[List[float]]] = None
+    ) -> List[List[RetrievedDocument]]:
+        """Retrieve for many queries with one batched embedding pass and one
+        multi-query vector search; results are in query order"""
+        return self._vector_search_batch(queries, self.top_k, filter_dict, query_embeddings)
+    
+    def _vector_search_batch(self, queries: Sequence[str], top_k: int, filter_dict: Optional[Dict[str, Any]],
+                             query_embeddings: Optional[Sequence[List[float]]]) -> List[List[RetrievedDocument]]:
+        if query_embeddings is None:
+            query_embeddings = self.vector_store.embedding_generator.embed_queries(queries)
+        return self.vector_store.search_by_embeddings(query_embeddings, top_k, filter_dict)
+
+
+class HybridRetriever(ChromaRetriever):
+    """Vector + BM25 retrieval fused with reciprocal rank fusion
+    
+    Each retriever contributes its top ``candidates``; a document scores
+    sum(1 / (rrf_k + rank)) over the lists it appears in, so exact tokens
+    such as model numbers and ASINs surface even when they are missing
+    from the vector top-k.
+    """
+    
+    def __init__(self, vector_store, bm25_index: BM25Index, top_k: int = 5,
+                 candidates: int = 50, rrf_k: int = 60):
+        super().__init__(vector_store, top_k)
+        self.bm25_index = bm25_index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+    
+    def _lexical(self, query: str, filter_dict: Optional[Dict[str, Any]]) -> List[RetrievedDocument]:
+        """BM25 candidates as documents, post-filtered when a filter is given"""
+        fetch = self.candidates * 4 if filter_dict else self.candidates
+        docs = []
+        for row, score in self.bm25_index.search(query, fetch):
+            doc = self.bm25_index.documents[row]
+            if filter_dict and not matches_filter({**doc.metadata, 'doc_type': doc.doc_type}, filter_dict):
+                continue
+            docs.append(RetrievedDocument(
+                content=doc.content,
+                metadata=doc.metadata,
+                doc_type=doc.doc_type,
+                doc_id=doc.doc_id,
+                score=score
+            ))
+            if len(docs) == self.candidates:
+                break
+        return docs
+    
+    def retrieve_filtered(
+        self,
+        query: str,
+        filter_dict: Optional[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None
+    ) -> List[RetrievedDocument]:
+        """Fuse vector and BM25 candidate lists by reciprocal rank"""
+        vector_docs = self._vector_search(query, self.candidates, filter_dict, query_embedding)
+        return self._fuse(vector_docs, self._lexical(query, filter_dict))
+    
+    def retrieve_batch(
+        self,
+        queries: Sequence[str],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_embeddings: Optional[Sequence[List[float]]] = None
+    ) -> List[List[RetrievedDocument]]:
+        """Batched vector candidates, per-query BM25, fused per query"""
+        vector_lists = self._vector_search_batch(queries, self.candidates, filter_dict, query_embeddings)
+        return [
+            self._fuse(vector_docs, self._lexical(query, filter_dict))
+            for query, vector_docs in zip(queries, vector_lists)
+        ]
+    
+    def _fuse(self, vector_docs: List[RetrievedDocument],
+              lexical_docs: List[RetrievedDocument]) -> List[RetrievedDocument]:
+        """Top-k by reciprocal rank fusion of the two candidate lists"""
+        fused: Dict[str, float] = {}
+        by_id: Dict[str, RetrievedDocument] = {}
+        for ranked in (vector_docs, lexical_docs):
+            for rank, doc in enumerate(ranked, 1):
+                fused[doc.doc_id] = fused.get(doc.doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+                by_id.setdefault(doc.doc_id, doc)
+        
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:self.top_k]
+        results = []
+        for doc_id in top_ids:
+            doc = by_id[doc_id]
+            doc.score = fused[doc_id]
+            results.append(doc)
+        return results
+    
+    def retrieve(self, query: str) -> List[RetrievedDocument]:
+        """Retrieve documents for a query"""
+        return self.retrieve_filtered(query, None)
+
+
+def create_retriever(vector_store, config_path: str = "config/config.yaml") -> ChromaRetriever:
+    """Build the retriever selected by ``retrieval.search_type`` in config.yaml"""
+    with open(config_path, 'r') as f:
+        retrieval = yaml.safe_load(f)['retrieval']
+    
+    search_type = retrieval.get('search_type', 'similarity')
+    if search_type == 'similarity':
+        return ChromaRetriever(vector_store, top_k=retrieval['top_k'])
+    if search_type == 'hybrid':
+        bm25_index = BM25Index(config_path)
+        if not bm25_index.exists():
+            raise FileNotFoundError(
+                f"No BM25 index at {bm25_index.directory}; run scripts/build_vector_store.py first"
+            )
+        hybrid = retrieval.get('hybrid', {})
+        return HybridRetriever(
+            vector_store,
+            bm25_index,
+            top_k=retrieval['top_k'],
+            candidates=hybrid.get('candidates', 50),
+            rrf_k=hybrid.get('rrf_k', 60)
+        )
+    
+    raise ValueError(f"Unknown retrieval search_type: {search_type}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""
+BM25 postings: varint encoding and on-disk round-trip
+"""
+import sys
+
+sys.path.append('.')
+
+import numpy as np
+import yaml
+
+from src.bm25_index import BM25Index, decode_varints, encode_varints, varint_lengths
+from src.data_processor import Document
+from src.document_store import DocumentStore
+
+
+def test_varints_round_trip_across_byte_boundaries():
+    values = np.array([0, 1, 127, 128, 255, 300, 16383, 16384, 2 ** 21, 2 ** 35 - 1, 2 ** 35, 2 ** 42 - 1],
+                      dtype=np.uint64)
+    encoded = encode_varints(values)
+
+    assert encoded.dtype == np.uint8
+    assert varint_lengths(values).tolist() == [1, 1, 1, 2, 2, 2, 2, 3, 4, 5, 6, 6]
+    assert len(encoded) == varint_lengths(values).sum()
+    assert decode_varints(encoded).tolist() == values.tolist()
+    assert encode_varints(np.array([300])).tolist() == [0xAC, 0x02]
+
+
+def test_empty_varints():
+    assert len(encode_varints(np.zeros(0, dtype=np.uint64))) == 0
+    assert len(decode_varints(np.zeros(0, dtype=np.uint8))) == 0
+
+
+def test_postings_round_trip_through_disk(tmp_path):
+    documents = [
+        Document(content="wireless mouse" + (" rare" if row in (0, 200, 299) else ""),
+                 metadata={}, doc_type="product", doc_id=f"p{row}")
+        for row in range(300)
+    ]
+    documents[200].content += " rare rare"
+    store_directory = str(tmp_path / "documents")
+    DocumentStore(store_directory).write(documents)
+
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump({'retrieval': {'bm25': {'directory': str(tmp_path / "bm25")}}}))
+    BM25Index(str(config_path)).build(documents, store_directory)
+
+    index = BM25Index(str(config_path))
+    rows, tfs = index.postings_for("rare")
+    assert rows.tolist() == [0, 200, 299]
+    assert tfs.tolist() == [1, 3, 1]
+    assert index.postings_for("mouse")[0].tolist() == list(range(300))
+    assert index.postings_for("keyboard")[0].tolist() == []
+    assert index.search("rare", top_k=1)[0][0] == 200
@@ -0,0 +1,144 @@
+"""
+Response cache backends: eviction, SQLite counters, tier promotion and write-behind
+"""
+import json
+import sys
+import threading
+import time
+
+sys.path.append('.')
+
+from src.cache import MemoryCache, SQLiteCache, TieredCache, WriteBehindCache, make_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = MemoryCache(60, max_entries=2, policy="lru")
+    cache.set("a", {"answer": 1})
+    cache.set("b", {"answer": 2})
+    assert cache.get("a") == {"answer": 1}
+
+    cache.set("c", {"answer": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"answer": 1}
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_lfu_evicts_least_frequently_used_then_oldest():
+    cache = MemoryCache(60, max_entries=3, policy="lfu")
+    for query in ("a", "b", "c"):
+        cache.set(query, {"q": query})
+    cache.get("a")
+    cache.get("a")
+    cache.get("c")
+
+    cache.set("d", {"q": "d"})
+    assert cache.get("b") is None
+
+    # "c" and "d" were both read once since being set; "c" is older
+    cache.get("d")
+    cache.set("e", {"q": "e"})
+    assert cache.get("c") is None
+    assert cache.get("a") == {"q": "a"}
+
+
+def test_memory_cache_stays_within_max_bytes():
+    value = {"answer": "x" * 100}
+    cache = MemoryCache(60, max_entries=100, max_bytes=len(json.dumps(value)) * 3)
+    for i in range(10):
+        cache.set(f"q{i}", value)
+
+    stats = cache.get_stats()
+    assert stats['total_entries'] == 3
+    assert stats['evictions'] == 7
+
+
+def test_sqlite_counters_follow_writes_evictions_and_expiry(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = SQLiteCache(path, 60, max_entries=3)
+    for i in range(5):
+        cache.set(f"q{i}", {"answer": "x" * i})
+    cache.set("q4", {"answer": "longer answer"})
+    assert cache.get_stats()['evictions'] == 2
+    assert cache.get("q0") is None
+
+    cache.max_entries = None
+    cache.set_serialized(make_key("stale"), '{"answer": 0}', expires_at=time.time() - 1)
+    assert cache.get_stats()['total_entries'] == 4
+    assert cache.expire() == 1
+
+    reopened = SQLiteCache(path, 60)
+    assert (cache._entries, cache._bytes) == (reopened._entries, reopened._bytes)
+    assert cache._entries == 3
+    assert cache.get("q4") == {"answer": "longer answer"}
+
+
+def test_tiered_promotion_keeps_remaining_ttl(tmp_path):
+    memory = MemoryCache(3600)
+    persistent = SQLiteCache(str(tmp_path / "responses.sqlite3"), 3600)
+    expires_at = time.time() + 5
+    persistent.set_serialized(make_key("q"), '{"answer": 1}', expires_at=expires_at)
+    cache = TieredCache(memory, persistent)
+
+    assert cache.get("q") == {"answer": 1}
+    assert memory.get_serialized(make_key("q")) == ('{"answer": 1}', expires_at)
+    assert cache.get("q") == {"answer": 1}
+    assert cache.get_stats()['memory_hits'] == 1
+
+
+class BlockingBackend(MemoryCache):
+    """Memory backend whose writes wait until ``release`` is set"""
+
+    def __init__(self):
+        super().__init__(60)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def set_many(self, items):
+        self.writing.set()
+        self.release.wait(5)
+        self.batches.append(list(items))
+        super().set_many(items)
+
+
+def test_write_behind_coalesces_pending_writes_and_flushes():
+    backend = BlockingBackend()
+    cache = WriteBehindCache(backend)
+    cache.set("busy", {"answer": 0})
+    assert backend.writing.wait(5)
+
+    for i in range(3):
+        cache.set("q", {"answer": i})
+    assert cache.get("q") == {"answer": 2}
+    assert backend.get("q") is None
+
+    backend.release.set()
+    assert cache.flush(timeout=5)
+    assert backend.get("q") == {"answer": 2}
+    assert sum(len(batch) for batch in backend.batches) == 2
+
+    stats = cache.get_stats()['write_behind']
+    assert (stats['queued'], stats['coalesced'], stats['written'], stats['pending']) == (2, 2, 2, 0)
+    cache.close()
+
+
+def test_write_behind_retries_a_failed_batch_once():
+    backend = MemoryCache(60)
+    failures = [OSError("disk full")]
+    write = backend.set_many
+
+    def flaky(items):
+        if failures:
+            raise failures.pop()
+        write(items)
+
+    backend.set_many = flaky
+    cache = WriteBehindCache(backend)
+    cache.set("q", {"answer": 1})
+    assert cache.flush(timeout=5)
+
+    assert backend.get("q") == {"answer": 1}
+    stats = cache.get_stats()['write_behind']
+    assert (stats['written'], stats['write_errors'], stats['write_retries']) == (1, 0, 1)
+    cache.close()
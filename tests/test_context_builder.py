@@ -0,0 +1,64 @@
+"""
+Context packing: token budget, truncation of the overflowing source, drops and duplicates
+"""
+import sys
+
+sys.path.append('.')
+
+from src.context_builder import ContextBuilder
+from src.retriever import RetrievedDocument
+
+
+class WordCounter:
+    """One token per whitespace-separated word, independent of tiktoken"""
+
+    exact = True
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+
+def product(doc_id: str, name: str, sentences: int, score: float) -> RetrievedDocument:
+    content = f"Product {name}\n" + " ".join(f"{name} fact {i}." for i in range(sentences))
+    return RetrievedDocument(content=content, metadata={}, doc_type="product", doc_id=doc_id, score=score)
+
+
+def test_packs_best_first_then_truncates_and_drops():
+    best = product("p1", "Alpha", 5, 0.9)
+    docs = [
+        product("p3", "Delta", 3, 0.6),
+        product("p2", "Gamma", 10, 0.7),
+        best,
+        RetrievedDocument(best.content, {}, "product", "p1_chunk_1", 0.8),
+        RetrievedDocument(best.content, {}, "review", "r9", 0.5),
+    ]
+    builder = ContextBuilder(max_tokens=40, min_source_tokens=5, token_counter=WordCounter())
+
+    context, sources, stats = builder.build(docs)
+
+    assert [source['content_preview'].split("\n")[0] for source in sources] == ["Product Alpha", "Product Gamma"]
+    assert stats['context_tokens'] <= 40
+    assert context.rstrip().endswith(" ...")
+    assert "Delta" not in context
+    assert (stats['sources_truncated'], stats['sources_dropped'], stats['duplicates_removed']) == (1, 1, 2)
+    assert stats['saved_tokens'] == stats['original_tokens'] - stats['context_tokens']
+
+
+def test_overflowing_source_below_minimum_is_dropped():
+    builder = ContextBuilder(max_tokens=30, min_source_tokens=20, token_counter=WordCounter())
+
+    context, sources, stats = builder.build([product("p1", "Alpha", 5, 0.9), product("p2", "Gamma", 10, 0.7)])
+
+    assert len(sources) == 1
+    assert "Gamma" not in context
+    assert (stats['sources_truncated'], stats['sources_dropped']) == (0, 1)
+
+
+def test_everything_fits_within_budget():
+    builder = ContextBuilder(max_tokens=1000, token_counter=WordCounter())
+
+    context, sources, stats = builder.build([product("p1", "Alpha", 5, 0.9), product("p2", "Gamma", 10, 0.7)])
+
+    assert [source['id'] for source in sources] == [1, 2]
+    assert context.startswith("[SOURCE 1 - PRODUCT]\nProduct Alpha")
+    assert (stats['sources_truncated'], stats['sources_dropped'], stats['duplicates_removed']) == (0, 0, 0)
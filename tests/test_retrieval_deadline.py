@@ -0,0 +1,68 @@
+"""
+Retrieval deadlines must not fail other requests coalesced onto the same query embedding
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.append('.')
+
+import pytest
+
+from src.embedding_cache import QueryEmbeddingCache
+from src.llm_backends import DeadlineExceeded
+from src.metrics import LatencyRecorder
+from src.rag_pipeline import RAGPipeline
+
+
+def make_pipeline(embed_seconds: float, deadline: float):
+    """RAGPipeline with only what ``_aretrieve`` uses, embedding through a query cache"""
+    cache = QueryEmbeddingCache()
+    calls = []
+
+    async def embed(text):
+        calls.append(text)
+        await asyncio.sleep(embed_seconds)
+        return [1.0, 0.0]
+
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.vector_store = SimpleNamespace(
+        embedding_generator=SimpleNamespace(aembed_query=lambda query: cache.aget_or_compute(query, embed))
+    )
+    pipeline.retriever = SimpleNamespace(retrieve_filtered=lambda query, filter_dict, embedding: [embedding])
+    pipeline.retrieval_executor = ThreadPoolExecutor(1)
+    pipeline.retrieval_deadline = deadline
+    pipeline.latency = LatencyRecorder()
+    return pipeline, calls
+
+
+def test_waiter_outlives_timed_out_leader():
+    # The leader's deadline passes at 0.3s, the embedding is ready at 0.4s
+    # and the waiter, started at 0.2s, has until 0.5s
+    pipeline, calls = make_pipeline(embed_seconds=0.4, deadline=0.3)
+
+    async def run():
+        leader = asyncio.create_task(pipeline._aretrieve("laptops for students", None, None))
+        await asyncio.sleep(0.2)
+        waiter = asyncio.create_task(pipeline._aretrieve("laptops  for students", None, None))
+        with pytest.raises(DeadlineExceeded):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == [[1.0, 0.0]]
+    assert len(calls) == 1
+
+
+def test_retry_after_timeout_hits_cache():
+    pipeline, calls = make_pipeline(embed_seconds=0.2, deadline=0.1)
+
+    async def run():
+        with pytest.raises(DeadlineExceeded):
+            await pipeline._aretrieve("wireless headphones", None, None)
+        await asyncio.sleep(0.2)
+        pipeline.retrieval_deadline = 0.05
+        return await pipeline._aretrieve("wireless headphones", None, None)
+
+    assert asyncio.run(run()) == [[1.0, 0.0]]
+    assert len(calls) == 1
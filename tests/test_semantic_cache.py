@@ -0,0 +1,48 @@
+"""
+Semantic cache: paraphrase hits, number and price-bound guardrails, filter isolation
+"""
+import sys
+
+sys.path.append('.')
+
+from src.semantic_cache import SemanticCache, query_constraints
+
+
+def test_constraints_normalize_numbers_and_bounds():
+    assert query_constraints("laptops under $1,000") == query_constraints("laptops below 1000.00 dollars")
+    assert query_constraints("laptops under $800") != query_constraints("laptops over $800")
+    assert query_constraints("laptops under $800") != query_constraints("laptops under $1000")
+    assert query_constraints("good gaming laptop") == frozenset()
+
+
+def test_paraphrase_hits_and_different_price_is_rejected():
+    cache = SemanticCache(dimension=2, threshold=0.9)
+    cache.add("best laptop under $1,000", [1.0, 0.0], {'answer': "A"})
+
+    hit = cache.lookup("which laptop is best below 1000 dollars", [0.99, 0.05])
+    assert hit['answer'] == "A"
+    assert hit['cached_query'] == "best laptop under $1,000"
+
+    # Embeds identically, but the answer depends on the number and the bound
+    assert cache.lookup("best laptop under $800", [1.0, 0.0]) is None
+    assert cache.lookup("best laptop over $1,000", [1.0, 0.0]) is None
+    assert cache.stats['guardrail_rejections'] == 2
+
+
+def test_rejection_falls_back_to_next_match():
+    cache = SemanticCache(dimension=2, threshold=0.9)
+    cache.add("laptops under $500", [1.0, 0.0], {'answer': "cheap"})
+    cache.add("laptops under $800", [0.98, 0.2], {'answer': "mid"})
+
+    assert cache.lookup("laptops under $800", [1.0, 0.0])['answer'] == "mid"
+
+
+def test_filters_and_threshold_isolate_entries():
+    cache = SemanticCache(dimension=2, threshold=0.9)
+    cache.add("wireless headphones", [1.0, 0.0], {'answer': "A"}, filter_key='{"category": "Audio"}')
+
+    assert cache.lookup("wireless headphones", [1.0, 0.0]) is None
+    assert cache.lookup("wireless headphones", [0.0, 1.0], filter_key='{"category": "Audio"}') is None
+    assert cache.lookup("wireless headphones", [1.0, 0.0], filter_key='{"category": "Audio"}')['answer'] == "A"
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 2